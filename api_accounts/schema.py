@@ -4,16 +4,38 @@ from graphene_django import DjangoObjectType
 from graphene_django.filter import DjangoFilterConnectionField
 
 from api_accounts.models import User
+from api_projects.connections import BatchedConnectionField, load_related
+from api_projects.loaders import get_loaders
 
 
 class UserNode(DjangoObjectType):
     pk = graphene.Int(source="pk")
+    own_projects = BatchedConnectionField("api_projects.schema.ProjectNode")
+    projects = BatchedConnectionField("api_projects.schema.ProjectNode")
+    created_issues = BatchedConnectionField("api_projects.schema.IssueNode")
+    own_issues = BatchedConnectionField("api_projects.schema.IssueNode")
 
     class Meta:
         model = User
         filter_fields = "__all__"
         interfaces = (Node,)
 
+    def resolve_own_projects(parent, info, **kwargs):
+        loader = get_loaders(info.context).user_own_projects
+        return load_related(loader, parent, "own_projects", kwargs)
+
+    def resolve_projects(parent, info, **kwargs):
+        loader = get_loaders(info.context).user_projects
+        return load_related(loader, parent, "projects", kwargs)
+
+    def resolve_created_issues(parent, info, **kwargs):
+        loader = get_loaders(info.context).user_created_issues
+        return load_related(loader, parent, "created_issues", kwargs)
+
+    def resolve_own_issues(parent, info, **kwargs):
+        loader = get_loaders(info.context).user_own_issues
+        return load_related(loader, parent, "own_issues", kwargs)
+
 
 class Query(graphene.ObjectType):
     user = Node.Field(UserNode)
@@ -30,6 +30,10 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ["id", "email"]
 
 
+class ResendVerificationSerializer(serializers.Serializer):
+    email = serializers.EmailField()
+
+
 class ActivateAccountSerializer(serializers.Serializer):
     uid = serializers.CharField()
     token = serializers.CharField()
@@ -0,0 +1,37 @@
+import logging
+
+from celery import shared_task
+from celery.utils.time import get_exponential_backoff_interval
+
+from api_accounts import utils
+from api_accounts.models import User
+from stx_training_program import mail
+
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True, max_retries=8)
+def deliver_verification_email(
+    self, user_pk: int, activation_url: str, subject: str, message: str
+) -> bool:
+    """
+    Sends the verification email, transient failures are retried with
+    exponential backoff, permanent ones (e.g. a refused address) are logged
+    and dropped. Returns False if the email was not sent, e.g. the user was
+    activated or removed meanwhile.
+    """
+    user = User.objects.filter(pk=user_pk, is_active=False).first()
+    if user is None:
+        return False
+    try:
+        utils.send_verification_email(user, activation_url, subject, message)
+    except Exception as exc:
+        if not mail.is_transient_error(exc):
+            logger.exception("Verification email of user %s was rejected", user_pk)
+            return False
+        countdown = get_exponential_backoff_interval(
+            factor=1, retries=self.request.retries, maximum=600, full_jitter=True
+        )
+        raise self.retry(exc=exc, countdown=countdown)
+    return True
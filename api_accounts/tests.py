@@ -1,24 +1,41 @@
+from smtplib import (
+    SMTPRecipientsRefused,
+    SMTPResponseException,
+    SMTPSenderRefused,
+    SMTPServerDisconnected,
+)
 from typing import Dict
+from unittest import mock
 
 from django.contrib.auth import get_user_model
 from django.core import mail
+from django.core.cache import cache
 from rest_framework import status
 from rest_framework.reverse import reverse_lazy
 from rest_framework.test import APITestCase
 from rest_framework.response import Response
 
+from api_accounts.tasks import deliver_verification_email
+from stx_training_program.mail import is_transient_error
+
 
 User = get_user_model()
 
 
+# verification emails are sent after the commit by a task, run in place here
+@mock.patch("django.db.transaction.on_commit", lambda func, using=None: func())
+@mock.patch.object(deliver_verification_email, "delay", deliver_verification_email)
 class UserAccountTest(APITestCase):
 
     REGISTER_URL = reverse_lazy("api_accounts:register")
     OBTAIN_TOKEN_URL = reverse_lazy("api_accounts:token_obtain_pair")
     USER_DETAILS_URL = reverse_lazy("api_accounts:user_details")
     ACCOUNT_ACTIVATE_URL = reverse_lazy("api_accounts:activate")
+    RESEND_URL = reverse_lazy("api_accounts:resend")
 
     def setUp(self):
+        # resend requests are throttled
+        cache.clear()
 
         self.user_data = {
             "email": "user@example.com",
@@ -114,3 +131,94 @@ class UserAccountTest(APITestCase):
         )
 
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_resend_verification(self):
+        self._register_user(self.user_data)
+        response = self.client.post(
+            self.RESEND_URL, {"email": self.user_data["email"]}, format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(len(mail.outbox), 2)
+        activation_url = mail.outbox[1].body.splitlines()[-1]
+        response = self.client.get(activation_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # active and unknown users get the same response and no email
+        for email in [self.user_data["email"], "unknown@example.com"]:
+            response = self.client.post(self.RESEND_URL, {"email": email})
+            self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_resend_verification_throttled(self):
+        for _ in range(5):
+            response = self.client.post(self.RESEND_URL, {"email": "a@example.com"})
+            self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        response = self.client.post(self.RESEND_URL, {"email": "a@example.com"})
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+
+class VerificationEmailTaskTest(APITestCase):
+    ACTIVATION_URL = "http://testserver/api/accounts/register/activate/"
+
+    def setUp(self):
+        self.user = User.objects.create_user("user@example.com", "password123")
+
+    def test_retried_with_backoff(self):
+        with mock.patch(
+            "django.core.mail.backends.locmem.EmailBackend.send_messages",
+            side_effect=[ConnectionError, ConnectionError, 1],
+        ) as send_mock:
+            result = deliver_verification_email.apply(
+                (self.user.pk, self.ACTIVATION_URL, "Subject", "Message\n")
+            )
+
+        self.assertTrue(result.get())
+        self.assertEqual(send_mock.call_count, 3)
+
+    def test_rejected_is_not_retried(self):
+        refused = SMTPRecipientsRefused({self.user.email: (550, b"No such user")})
+        with mock.patch(
+            "django.core.mail.backends.locmem.EmailBackend.send_messages",
+            side_effect=refused,
+        ) as send_mock, self.assertLogs("api_accounts.tasks", "ERROR"):
+            result = deliver_verification_email.apply(
+                (self.user.pk, self.ACTIVATION_URL, "Subject", "Message\n")
+            )
+
+        self.assertFalse(result.get())
+        send_mock.assert_called_once()
+
+    def test_transient_errors(self):
+        class APIError(Exception):
+            def __init__(self, status_code):
+                self.status_code = status_code
+
+        transient = [
+            ConnectionResetError(),
+            SMTPServerDisconnected(),
+            SMTPResponseException(421, b"Try again later"),
+            APIError(429),
+            APIError(503),
+        ]
+        permanent = [
+            SMTPRecipientsRefused({}),
+            SMTPSenderRefused(550, b"Rejected", "sender@example.com"),
+            APIError(400),
+            ValueError(),
+        ]
+        for exc in transient:
+            self.assertTrue(is_transient_error(exc), exc)
+        for exc in permanent:
+            self.assertFalse(is_transient_error(exc), exc)
+
+    def test_skipped_for_active_user(self):
+        self.user.is_active = True
+        self.user.save(update_fields=["is_active"])
+
+        self.assertFalse(
+            deliver_verification_email(
+                self.user.pk, self.ACTIVATION_URL, "Subject", "Message\n"
+            )
+        )
+        self.assertEqual(mail.outbox, [])
@@ -9,6 +9,7 @@ from api_accounts.views import (
     UserRegistrationView,
     UserDetailsView,
     ActivateAccountView,
+    ResendVerificationView,
 )
 
 app_name = "api_accounts"
@@ -16,6 +17,7 @@ app_name = "api_accounts"
 urlpatterns = [
     path("register/", UserRegistrationView.as_view(), name="register"),
     path("register/activate/", ActivateAccountView.as_view(), name="activate"),
+    path("register/resend/", ResendVerificationView.as_view(), name="resend"),
     path("user/", UserDetailsView.as_view(), name="user_details"),
     path("token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
     path("token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
@@ -5,12 +5,19 @@ from django.utils.encoding import force_bytes
 from django.conf import settings
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
 from django.contrib.auth import get_user_model
-from django.core.mail import send_mail
+from django.core.mail import EmailMessage
+from django.db import transaction
 from rest_framework.request import Request
 from rest_framework.reverse import reverse
 
+from stx_training_program import mail
 
-__all__ = ["VerificationTokenGenerator", "send_verification_email"]
+
+__all__ = [
+    "VerificationTokenGenerator",
+    "send_verification_email",
+    "queue_verification_email",
+]
 
 
 User = get_user_model()
@@ -23,7 +30,7 @@ class VerificationTokenGenerator(PasswordResetTokenGenerator):
 
 def send_verification_email(
     user: User,
-    request: Request,
+    activation_url: str,
     subject: str = "Verify your email",
     message: str = "",
     sender: Optional[str] = None,
@@ -32,14 +39,35 @@ def send_verification_email(
     token = token_generator.make_token(user)
     uid = urlsafe_base64_encode(force_bytes(user.pk))
 
-    message += create_activation_url(uid, token, request)
+    message += f"{activation_url}?uid={uid}&token={token}"
     # The sender is set in DEFAULT_FROM_EMAIL in settings.py
-    send_mail(subject, message, None, recipient_list=[user.email], fail_silently=False)
+    mail.send_messages([EmailMessage(subject, message, sender, [user.email])])
+
+
+def queue_verification_email(
+    user: User,
+    request: Request,
+    subject: str = "Verify your email",
+    message: str = "",
+) -> None:
+    """
+    Sends the verification email from a Celery task after the current
+    transaction commits.
+    """
+    # to prevent circular imports
+    from api_accounts.tasks import deliver_verification_email
+
+    activation_url = _create_activation_url(request)
+    transaction.on_commit(
+        lambda: deliver_verification_email.delay(
+            user.pk, activation_url, subject, message
+        )
+    )
 
 
-def _create_activation_url(uid: str, token: str, request: Request) -> str:
+def _create_activation_url(request: Request) -> str:
     endpoint = reverse("api_accounts:activate")
     protocol = "https" if request.is_secure() else "http"
     host = request.get_host()
 
-    return f"{protocol}://{host}{endpoint}?uid={uid}&token={token}"
+    return f"{protocol}://{host}{endpoint}"
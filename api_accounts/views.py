@@ -1,18 +1,23 @@
 from django.contrib.auth import get_user_model
 from django.db import transaction
 from rest_framework import status
-from rest_framework.generics import CreateAPIView, RetrieveAPIView
+from rest_framework.generics import CreateAPIView, GenericAPIView, RetrieveAPIView
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
-from smtplib import SMTPException
+from rest_framework.throttling import ScopedRateThrottle
 
 from api_accounts.models import User
 from api_accounts.serializers import (
     UserRegistrationSerializer,
     UserSerializer,
     ActivateAccountSerializer,
+    ResendVerificationSerializer,
 )
-from api_accounts.utils import send_verification_email
+from api_accounts.utils import queue_verification_email
+
+
+VERIFICATION_SUBJECT = "Training course"
+VERIFICATION_MESSAGE = "Hello! Activate your account here:\n"
 
 
 class UserRegistrationView(CreateAPIView):
@@ -29,15 +34,10 @@ class UserRegistrationView(CreateAPIView):
         serializer = UserRegistrationSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         user = serializer.save()
-        try:
-            send_verification_email(
-                user,
-                request,
-                subject="Training course",
-                message="Hello! Activate your account here:\n",
-            )
-        except (SMTPException):
-            return Response(status=status.HTTP_400_BAD_REQUEST)
+        # sent by a Celery task once the user is committed
+        queue_verification_email(
+            user, request, VERIFICATION_SUBJECT, VERIFICATION_MESSAGE
+        )
 
         return Response(
             {"message": f"Registration successful, check your email: {user}"},
@@ -45,6 +45,33 @@ class UserRegistrationView(CreateAPIView):
         )
 
 
+class ResendVerificationView(GenericAPIView):
+    """
+    An endpoint for sending the verification email again.
+    Responds the same whether the email belongs to an inactive user or not.
+    """
+
+    serializer_class = ResendVerificationSerializer
+    permission_classes = [AllowAny]
+    throttle_classes = [ScopedRateThrottle]
+    throttle_scope = "verification_email"
+
+    def post(self, request, format=None):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        email = serializer.validated_data["email"]
+        user = User.objects.filter(email=email, is_active=False).first()
+        if user is not None:
+            queue_verification_email(
+                user, request, VERIFICATION_SUBJECT, VERIFICATION_MESSAGE
+            )
+
+        return Response(
+            {"message": f"Unless already active, check your email: {email}"},
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+
 class UserDetailsView(RetrieveAPIView):
     """
     An endpoint for user details.
@@ -1,9 +1,16 @@
 from django.contrib import admin
 
-from api_projects.models import Project, Issue, DateUpdateTask, IssueAttachment
+from api_projects.models import (
+    Project,
+    Issue,
+    IssueAttachment,
+    Notification,
+    ProjectAccess,
+)
 
 
 admin.site.register(Project)
 admin.site.register(Issue)
 admin.site.register(IssueAttachment)
-admin.site.register(DateUpdateTask)
+admin.site.register(ProjectAccess)
+admin.site.register(Notification)
@@ -1,5 +1,12 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class ApiProjectsConfig(AppConfig):
     name = "api_projects"
+
+    def ready(self):
+        from api_projects import search
+
+        # the search index is not a model, its table is created separately
+        post_migrate.connect(search.create_index, sender=self)
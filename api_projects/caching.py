@@ -0,0 +1,64 @@
+"""
+Response cache for project and issue reads.
+
+Entries are keyed by the request's ETag (see `conditional`), which covers
+versions of all projects visible for the user, the URL, host and Accept header.
+`post_save`, `post_delete` and `m2m_changed` receivers bump versions
+of the affected projects on every write, so a stale entry is never reached
+again and is evicted by the bounded cache backend in time.
+"""
+from functools import wraps
+
+from django.core.cache import caches
+from django.http import HttpResponse
+
+
+RESPONSE_CACHE_ALIAS = "responses"
+KEY_PREFIX = "api_projects:response:"
+# larger responses (e.g. long unpaginated lists) are not worth keeping
+MAX_ENTRY_SIZE = 512 * 1024
+
+
+def get_response_cache():
+    return caches[RESPONSE_CACHE_ALIAS]
+
+
+def cache_response(etag_func):
+    """
+    View decorator serving successful responses from the response cache.
+    Requests for which `etag_func` returns None are never cached.
+    """
+
+    def decorator(view_func):
+        @wraps(view_func)
+        def inner(request, *args, **kwargs):
+            etag = etag_func(request, *args, **kwargs)
+            if etag is None:
+                return view_func(request, *args, **kwargs)
+
+            cache = get_response_cache()
+            key = KEY_PREFIX + etag.strip('"')
+            entry = cache.get(key)
+            if entry is not None:
+                content, content_type = entry
+                return HttpResponse(content, content_type=content_type)
+
+            response = view_func(request, *args, **kwargs)
+            if response.status_code == 200 and not response.streaming:
+                if getattr(response, "is_rendered", True):
+                    store_response(cache, key, response)
+                else:
+                    # DRF responses are rendered after the view returns
+                    response.add_post_render_callback(
+                        lambda rendered: store_response(cache, key, rendered)
+                    )
+            return response
+
+        return inner
+
+    return decorator
+
+
+def store_response(cache, key: str, response) -> None:
+    if len(response.content) <= MAX_ENTRY_SIZE:
+        cache.set(key, (response.content, response["Content-Type"]))
@@ -0,0 +1,267 @@
+"""
+Read-only fast path for serializing lists of projects and issues.
+
+Compiled serializers work on `.values()` rows instead of model instances.
+Columns (including `owner.email`-like sources) are selected by the database,
+related data is loaded once per batch of rows into plain maps.
+The output is identical to the one of the serializer they are compiled from.
+"""
+import os
+from collections import OrderedDict, defaultdict
+from itertools import islice
+from typing import Dict, List
+
+from django.core.exceptions import FieldDoesNotExist
+from django.http import StreamingHttpResponse
+from rest_framework import fields as drf_fields, relations
+from rest_framework.fields import empty
+from rest_framework.response import Response
+
+from api_projects.models import Project, Issue, IssueAttachment
+from api_projects.streaming import stream_json_array
+
+
+# Fields whose `to_representation` returns a valid database value unchanged.
+IDENTITY_FIELDS = (
+    drf_fields.ReadOnlyField,
+    drf_fields.CharField,
+    drf_fields.ChoiceField,
+    drf_fields.IntegerField,
+    drf_fields.BooleanField,
+    relations.PrimaryKeyRelatedField,
+)
+
+
+class NotCompilable(Exception):
+    """
+    Raised for serializers which use fields not supported by the fast path.
+    """
+
+
+class CompiledSerializer:
+    """
+    Base class of compiled serializers, built from a serializer instance,
+    so sparse fieldsets and the request context are respected.
+    """
+
+    model = None
+    # field name -> name of the method loading `{pk: value}` for a batch of pks
+    related_loaders = {}
+
+    def __init__(self, serializer):
+        self.serializer = serializer
+        self.context = serializer.context
+        self.pk_name = self.model._meta.pk.attname
+        self.columns = [self.pk_name]
+        # (field name, kind, payload) in the order of serializer fields
+        self.plan = []
+
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if name in self.related_loaders:
+                self.plan.append(
+                    (name, "related", getattr(self, self.related_loaders[name]))
+                )
+            else:
+                self.plan.append((name, "column", self._compile_column(field)))
+
+    def _compile_column(self, field):
+        if isinstance(
+            field, (drf_fields.SerializerMethodField, relations.ManyRelatedField)
+        ):
+            raise NotCompilable(field.field_name)
+        if len(field.source_attrs) not in (1, 2):
+            raise NotCompilable(field.field_name)
+
+        try:
+            model_field = self.model._meta.get_field(field.source_attrs[0])
+        except FieldDoesNotExist:
+            raise NotCompilable(field.field_name)
+
+        nullable_relation = None
+        if len(field.source_attrs) == 2:
+            if not model_field.many_to_one:
+                raise NotCompilable(field.field_name)
+            column = "__".join(field.source_attrs)
+            if model_field.null:
+                missing_allowed = field.default is not empty or (
+                    field.allow_null or not field.required
+                )
+                if not missing_allowed:
+                    raise NotCompilable(field.field_name)
+                nullable_relation = self._add_column(model_field.attname)
+        elif model_field.is_relation:
+            # raw `<relation>_id` source or pk-only related field
+            if not (
+                field.source_attrs[0] == model_field.attname
+                or isinstance(field, relations.PrimaryKeyRelatedField)
+            ):
+                raise NotCompilable(field.field_name)
+            column = model_field.attname
+        elif model_field.concrete:
+            column = model_field.name
+        else:
+            raise NotCompilable(field.field_name)
+
+        convert = (
+            None if isinstance(field, IDENTITY_FIELDS) else field.to_representation
+        )
+        return self._add_column(column), nullable_relation, convert, field
+
+    def _add_column(self, column: str) -> str:
+        if column not in self.columns:
+            self.columns.append(column)
+        return column
+
+    def get_queryset(self, queryset, extra_columns=()):
+        """
+        Returns `values()` queryset with all columns needed to serialize rows.
+        """
+        columns = list(self.columns)
+        columns += [column for column in extra_columns if column not in columns]
+        return queryset.prefetch_related(None).values(*columns)
+
+    def serialize(self, rows: List[dict]) -> List[OrderedDict]:
+        pks = [row[self.pk_name] for row in rows]
+        related = {
+            name: loader(pks) for name, kind, loader in self.plan if kind == "related"
+        }
+        return [self._serialize_row(row, related) for row in rows]
+
+    def _serialize_row(self, row: dict, related: Dict[str, dict]) -> OrderedDict:
+        data = OrderedDict()
+        for name, kind, payload in self.plan:
+            if kind == "related":
+                data[name] = related[name].get(row[self.pk_name], [])
+                continue
+
+            column, nullable_relation, convert, field = payload
+            if nullable_relation is not None and row[nullable_relation] is None:
+                # same rules as `Field.get_attribute` for missing relations,
+                # otherwise the field is skipped
+                if field.default is not empty:
+                    data[name] = field.get_default()
+                elif field.allow_null:
+                    data[name] = None
+                continue
+
+            value = row[column]
+            if value is not None and convert is not None:
+                value = convert(value)
+            data[name] = value
+        return data
+
+
+class CompiledIssueSerializer(CompiledSerializer):
+    model = Issue
+    related_loaders = {"attachments": "load_attachments"}
+
+    def load_attachments(self, pks) -> Dict[int, list]:
+        request_meta = self.context["request"].META
+        hostname = request_meta.get("HTTP_HOST", "localhost")
+        storage = IssueAttachment._meta.get_field("file_attachment").storage
+
+        attachments = defaultdict(list)
+        rows = (
+            IssueAttachment.objects.filter(issue_id__in=pks)
+            .order_by("pk")
+            .values_list("issue_id", "pk", "file_attachment")
+        )
+        for issue_id, pk, file_name in rows:
+            attachments[issue_id].append(
+                {
+                    "id": pk,
+                    "name": os.path.basename(file_name),
+                    "url": f"{hostname}{storage.url(file_name)}",
+                }
+            )
+        return attachments
+
+
+class CompiledProjectSerializer(CompiledSerializer):
+    model = Project
+    related_loaders = {
+        "issues": "load_issues",
+        "members_emails": "load_members_emails",
+    }
+
+    def __init__(self, serializer):
+        super().__init__(serializer)
+        if "issues" in serializer.fields:
+            self.issues_compiled = CompiledIssueSerializer(
+                serializer.fields["issues"].child
+            )
+
+    def load_issues(self, pks) -> Dict[int, list]:
+        compiled = self.issues_compiled
+        queryset = Issue.objects.filter(project_id__in=pks).order_by("pk")
+        rows = list(compiled.get_queryset(queryset, extra_columns=["project_id"]))
+
+        issues = defaultdict(list)
+        for row, data in zip(rows, compiled.serialize(rows)):
+            issues[row["project_id"]].append(data)
+        return issues
+
+    def load_members_emails(self, pks) -> Dict[int, list]:
+        members = defaultdict(list)
+        rows = (
+            Project.members.through.objects.filter(project_id__in=pks)
+            .order_by("user_id")
+            .values_list("project_id", "user_id", "user__email")
+        )
+        for project_id, user_id, email in rows:
+            members[project_id].append({"id": user_id, "email": email})
+        return members
+
+
+class CompiledListMixin:
+    """
+    Serves the list action (paginated or streamed)
+    with `compiled_serializer_class` whenever the serializer can be compiled.
+    """
+
+    compiled_serializer_class = None
+
+    def get_compiled_serializer(self):
+        if self.compiled_serializer_class is None:
+            return None
+        try:
+            return self.compiled_serializer_class(self.get_serializer())
+        except NotCompilable:
+            return None
+
+    def list(self, request, *args, **kwargs):
+        compiled = self.get_compiled_serializer()
+        if compiled is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        ordering_columns = ()
+        if hasattr(self.paginator, "get_ordering_fields"):
+            ordering_columns = self.paginator.get_ordering_fields(queryset)
+        queryset = compiled.get_queryset(queryset, extra_columns=ordering_columns)
+
+        if self.should_stream(request):
+            return StreamingHttpResponse(
+                stream_json_array(
+                    data
+                    for rows in iterate_rows_in_chunks(queryset, self.stream_chunk_size)
+                    for data in compiled.serialize(rows)
+                ),
+                content_type="application/json",
+            )
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(compiled.serialize(page))
+        return Response(compiled.serialize(list(queryset)))
+
+
+def iterate_rows_in_chunks(queryset, chunk_size: int):
+    iterator = queryset.iterator(chunk_size=chunk_size)
+    while True:
+        rows = list(islice(iterator, chunk_size))
+        if not rows:
+            return
+        yield rows
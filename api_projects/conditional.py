@@ -0,0 +1,95 @@
+"""
+ETag and Last-Modified values for conditional requests.
+
+Values are computed from project version counters only, so a request
+answered with 304 Not Modified never loads or serializes the data.
+Last-Modified is sent for single projects only: the latest modification
+of a set of projects (a list, or the project of an issue, which may be
+moved) can move backwards when a project leaves the set.
+"""
+import hashlib
+from datetime import datetime
+from typing import Optional, Tuple
+
+from api_projects.models import ProjectAccess, ProjectVersion
+
+
+State = Tuple[Optional[str], Optional[datetime]]
+
+
+def get_projects_state(request, **lookup) -> State:
+    """
+    Returns (etag, last modified) of projects visible for the current user,
+    optionally narrowed by `lookup` on the access table, e.g. `project_id=1`.
+    The result is memoized on the request, as both values are needed.
+
+    `(None, None)` is returned if a narrowed lookup matches nothing
+    or some project had no version counter yet.
+    """
+    key = tuple(sorted(lookup.items()))
+    memo = getattr(request, "_projects_state", None)
+    if memo is None:
+        memo = request._projects_state = {}
+    if key not in memo:
+        memo[key] = _compute_projects_state(request, **lookup)
+    return memo[key]
+
+
+def _compute_projects_state(request, **lookup) -> State:
+    if not request.user.is_authenticated:
+        return None, None
+    try:
+        rows = list(
+            ProjectAccess.objects.filter(user=request.user, **lookup)
+            .order_by("project_id")
+            .values_list(
+                "project_id",
+                "project__version_counter__version",
+                "project__version_counter__modification_date",
+            )
+        )
+    except ValueError:
+        # e.g. non-numeric pk given in the URL
+        return None, None
+
+    if lookup and not rows:
+        return None, None
+    missing = [pk for pk, version, _ in rows if version is None]
+    if missing:
+        # counting starts now, changes are tracked from the next request
+        ProjectVersion.objects.bulk_create(
+            [ProjectVersion(project_id=pk) for pk in missing], ignore_conflicts=True
+        )
+        return None, None
+
+    # counters restart with a recreated database, modification dates do not
+    versions = ",".join(
+        f"{pk}:{version}:{date.isoformat()}" for pk, version, date in rows
+    )
+    # the representation depends on the URL (pk, query params),
+    # host (attachment urls) and negotiated content type
+    parts = [
+        versions,
+        request.get_full_path(),
+        request.get_host(),
+        request.META.get("HTTP_ACCEPT", ""),
+    ]
+    digest = hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+    last_modified = max((date for _, _, date in rows), default=None)
+    return f'"{digest}"', last_modified
+
+
+def project_list_etag(request, *args, **kwargs) -> Optional[str]:
+    return get_projects_state(request)[0]
+
+
+def project_etag(request, pk=None, *args, **kwargs) -> Optional[str]:
+    return get_projects_state(request, project_id=pk)[0]
+
+
+def project_last_modified(request, pk=None, *args, **kwargs) -> Optional[datetime]:
+    return get_projects_state(request, project_id=pk)[1]
+
+
+def issue_etag(request, pk=None, *args, **kwargs) -> Optional[str]:
+    return get_projects_state(request, project__issues=pk)[0]
@@ -0,0 +1,375 @@
+"""
+Connection fields of GraphQL nodes and loading of their relations.
+
+Top level connections shape their queryset after the selection set
+(`only`, `select_related`, `prefetch_related`), nested relations
+which were not loaded that way are batched by per-request DataLoaders.
+Queries may opt in to keyset pagination (`keyset: true`) of nodes
+with a KeysetConnection, for cursors without OFFSET.
+"""
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from typing import Dict, List, Optional
+
+import graphene
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Prefetch, Q, QuerySet
+from graphene.relay import Connection, PageInfo
+from graphene.utils.str_converters import to_snake_case
+from graphene_django.filter import DjangoFilterConnectionField
+from graphene_django.registry import get_global_registry
+from graphene_django.utils import maybe_queryset
+from graphql import GraphQLError
+from graphql.language import ast
+from promise import Promise
+
+
+PAGINATION_ARGS = {"first", "last", "before", "after", "offset", "keyset"}
+# fields which never need columns besides the primary key
+PK_FIELDS = {"id", "pk", "__typename"}
+
+
+class KeysetConnection(Connection):
+    """
+    Connection (`Meta.connection_class`) of nodes with a `keyset_sort_key`.
+    Fields page it by offset cursors like other connections, unless
+    the query opts in with `keyset: true`. Keyset cursors encode
+    `(sort key, pk)` of the row, so pages are fetched with indexed range
+    predicates instead of OFFSET, `totalCount` is then counted only when
+    selected and `offset` is not supported.
+    """
+
+    class Meta:
+        abstract = True
+
+    total_count = graphene.Int()
+
+    def resolve_total_count(root, info):
+        length = getattr(root, "length", None)
+        if length is not None:
+            # counted by the offset pagination
+            return length
+        if isinstance(root.iterable, list):
+            return len(root.iterable)
+        return root.iterable.count()
+
+
+def get_sort_key(node_type) -> Optional[str]:
+    connection = node_type._meta.connection
+    if connection is not None and issubclass(connection, KeysetConnection):
+        return node_type.keyset_sort_key
+    return None
+
+
+def encode_cursor(instance, sort_key: str) -> str:
+    position = getattr(instance, sort_key)
+    if hasattr(position, "isoformat"):
+        position = position.isoformat()
+    data = json.dumps([position, instance.pk]).encode("utf-8")
+    return urlsafe_b64encode(data).decode("ascii")
+
+
+def decode_cursor(cursor: Optional[str], model, sort_key: str):
+    """
+    Returns `(sort key value, pk)` of the cursor, or None.
+    """
+    if cursor is None:
+        return None
+    try:
+        position, pk = json.loads(urlsafe_b64decode(cursor.encode("ascii")))
+        field = model._meta.pk if sort_key in ("pk", "id") else None
+        field = field or model._meta.get_field(sort_key)
+        return field.to_python(position), int(pk)
+    except (TypeError, ValueError, ValidationError):
+        raise GraphQLError("Invalid cursor.")
+
+
+class KeysetPaginationMixin:
+    """
+    Adds the `keyset` argument to fields of KeysetConnection nodes, which
+    pages querysets and loaded lists by keyset cursors. Other queries keep
+    the default offset based pagination.
+    """
+
+    @property
+    def args(self):
+        args = super().args
+        if get_sort_key(self.node_type) is not None:
+            args["keyset"] = graphene.Argument(
+                graphene.Boolean,
+                description="Page by cursors of the sort key instead of offsets.",
+            )
+        return args
+
+    @args.setter
+    def args(self, args):
+        DjangoFilterConnectionField.args.fset(self, args)
+
+    @classmethod
+    def resolve_connection(cls, connection, args, iterable, max_limit=None):
+        if not args.get("keyset") or not issubclass(connection, KeysetConnection):
+            return super().resolve_connection(
+                connection, args, iterable, max_limit=max_limit
+            )
+        if args.get("offset"):
+            raise GraphQLError("Keyset connections do not support offset.")
+
+        iterable = maybe_queryset(iterable)
+        node_type = connection._meta.node
+        sort_key = node_type.keyset_sort_key
+        model = node_type._meta.model
+        after = decode_cursor(args.get("after"), model, sort_key)
+        before = decode_cursor(args.get("before"), model, sort_key)
+        first, last = args.get("first"), args.get("last")
+        if first is None and last is None:
+            first = max_limit
+        # only `last` pages backwards from the end (or `before`)
+        backwards = first is None
+        size = last if backwards else first
+
+        if isinstance(iterable, QuerySet):
+            rows = cls._slice_queryset(
+                iterable, sort_key, after, before, backwards, size
+            )
+        else:
+            rows = cls._slice_list(iterable, sort_key, after, before, backwards, size)
+
+        has_more = size is not None and len(rows) > size
+        rows = rows[:size]
+        if backwards:
+            rows.reverse()
+            has_previous, has_next = has_more, before is not None
+        else:
+            has_previous, has_next = after is not None, has_more
+            if last is not None and len(rows) > last:
+                rows = rows[-last:]
+                has_previous = True
+
+        edges = [
+            connection.Edge(node=row, cursor=encode_cursor(row, sort_key))
+            for row in rows
+        ]
+        page = connection(
+            edges=edges,
+            page_info=PageInfo(
+                start_cursor=edges[0].cursor if edges else None,
+                end_cursor=edges[-1].cursor if edges else None,
+                has_previous_page=has_previous,
+                has_next_page=has_next,
+            ),
+        )
+        # for `totalCount`, not evaluated unless selected
+        page.iterable = iterable
+        return page
+
+    @staticmethod
+    def _slice_queryset(queryset, sort_key, after, before, backwards, size) -> list:
+        for cursor, lookup in ((after, "gt"), (before, "lt")):
+            if cursor is not None:
+                position, pk = cursor
+                queryset = queryset.filter(
+                    Q(**{f"{sort_key}__{lookup}": position})
+                    | Q(**{sort_key: position, f"pk__{lookup}": pk})
+                )
+        prefix = "-" if backwards else ""
+        queryset = queryset.order_by(f"{prefix}{sort_key}", f"{prefix}pk")
+        if size is not None:
+            # one more row tells whether there is a following page
+            queryset = queryset[: size + 1]
+        return list(queryset)
+
+    @staticmethod
+    def _slice_list(instances, sort_key, after, before, backwards, size) -> list:
+        def key(instance):
+            return getattr(instance, sort_key), instance.pk
+
+        rows = sorted(instances, key=key, reverse=backwards)
+        rows = [
+            row
+            for row in rows
+            if (after is None or key(row) > after)
+            and (before is None or key(row) < before)
+        ]
+        return rows if size is None else rows[: size + 1]
+
+
+class BatchedConnectionField(KeysetPaginationMixin, DjangoFilterConnectionField):
+    """
+    Connection of a relation whose resolver may return a promise
+    of a list loaded in a batch for all parents of a query level.
+    """
+
+    @classmethod
+    def resolve_queryset(
+        cls, connection, iterable, info, args, filtering_args, filterset_class
+    ):
+        if Promise.is_thenable(iterable):
+            return iterable
+        return super().resolve_queryset(
+            connection, iterable, info, args, filtering_args, filterset_class
+        )
+
+
+class OptimizedConnectionField(KeysetPaginationMixin, DjangoFilterConnectionField):
+    """
+    Connection loading only columns and relations of the selected fields.
+    """
+
+    @classmethod
+    def resolve_queryset(
+        cls, connection, iterable, info, args, filtering_args, filterset_class
+    ):
+        queryset = super().resolve_queryset(
+            connection, iterable, info, args, filtering_args, filterset_class
+        )
+        optimizer = QueryOptimizer(info.fragments)
+        selections = optimizer.get_node_selections(info.field_asts)
+        return optimizer.optimize(queryset, connection._meta.node, selections)
+
+
+def load_related(loader, parent, name: str, args):
+    """
+    Loads a related list with the loader, unless it was prefetched.
+    Filtered connections query the parent's objects separately.
+    """
+    related_manager = getattr(parent, name)
+    if set(args) - PAGINATION_ARGS:
+        return related_manager.all()
+    if name in getattr(parent, "_prefetched_objects_cache", {}):
+        return Promise.resolve(list(related_manager.all()))
+    return loader.load(parent.pk)
+
+
+def load_related_object(loader, parent, name: str):
+    """
+    Loads a forward relation with the loader, unless it was joined.
+    """
+    descriptor = getattr(type(parent), name)
+    if descriptor.is_cached(parent):
+        return getattr(parent, name)
+    pk = getattr(parent, descriptor.field.attname)
+    if pk is None:
+        return None
+    return loader.load(pk)
+
+
+class QueryOptimizer:
+    """
+    Translates selections of a node into `only`, `select_related`
+    and `prefetch_related` of its queryset.
+
+    Forward relations are joined, relations exposed as BatchedConnectionField
+    are prefetched unless filtered. Columns are restricted only if every
+    selected field maps to a model field or to `field_columns` of the node.
+    """
+
+    def __init__(self, fragments: Dict[str, ast.FragmentDefinition]):
+        self.fragments = fragments
+
+    def get_node_selections(self, connection_asts) -> List[ast.Field]:
+        selections = []
+        for edges in self._get_fields(connection_asts).get("edges", []):
+            for node in self._get_fields([edges]).get("node", []):
+                selections.append(node)
+        return selections
+
+    def optimize(self, queryset, node_type, field_asts, extra_columns=()):
+        only, select_related, prefetch_related = self._plan(node_type, field_asts)
+        sort_key = get_sort_key(node_type)
+        if sort_key is not None:
+            # keyset cursors are built from the sort key
+            only.append(sort_key)
+        queryset = queryset.only(*only, *extra_columns)
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        return queryset
+
+    def _plan(self, node_type, field_asts: List[ast.Field], prefix: str = ""):
+        model = node_type._meta.model
+        field_columns = getattr(node_type, "field_columns", {})
+        only = [prefix + model._meta.pk.name]
+        select_related, prefetch_related = [], []
+        complete = True
+
+        for name, asts in self._get_fields(field_asts).items():
+            name = to_snake_case(name)
+            if name in PK_FIELDS:
+                continue
+            if name in field_columns:
+                only += [prefix + column for column in field_columns[name]]
+                continue
+            try:
+                model_field = model._meta.get_field(name)
+            except FieldDoesNotExist:
+                complete = False
+                continue
+
+            related_node = None
+            if model_field.is_relation:
+                related_node = get_global_registry().get_type_for_model(
+                    model_field.related_model
+                )
+
+            if model_field.concrete and not model_field.many_to_many:
+                only.append(prefix + name)
+                if model_field.is_relation and related_node is not None:
+                    # forward relation, joined with its selected columns
+                    select_related.append(prefix + name)
+                    sub_plan = self._plan(related_node, asts, f"{prefix}{name}__")
+                    only += sub_plan[0]
+                    select_related += sub_plan[1]
+                    prefetch_related += sub_plan[2]
+            elif related_node is not None:
+                prefetch = self._plan_prefetch(
+                    node_type, related_node, model_field, name, asts, prefix
+                )
+                if prefetch is not None:
+                    prefetch_related.append(prefetch)
+
+        if not complete:
+            only += [prefix + field.name for field in model._meta.concrete_fields]
+        return only, select_related, prefetch_related
+
+    def _plan_prefetch(
+        self, node_type, related_node, model_field, name, asts, prefix
+    ) -> Optional[Prefetch]:
+        graphql_field = node_type._meta.fields.get(name)
+        if not isinstance(graphql_field, BatchedConnectionField):
+            # other resolvers do not read prefetched objects
+            return None
+        for field_ast in asts:
+            arguments = {argument.name.value for argument in field_ast.arguments}
+            if arguments - PAGINATION_ARGS:
+                return None
+
+        # prefetched objects of a reverse relation are matched by the foreign key
+        extra_columns = [model_field.field.name] if model_field.one_to_many else []
+        queryset = self.optimize(
+            related_node._meta.model._default_manager.order_by("pk"),
+            related_node,
+            self.get_node_selections(asts),
+            extra_columns,
+        )
+        return Prefetch(prefix + name, queryset=queryset)
+
+    def _get_fields(self, field_asts) -> Dict[str, List[ast.Field]]:
+        """
+        Returns sub-fields of the fields by name, fragments are expanded.
+        """
+        fields = {}
+        for field_ast in field_asts:
+            if field_ast.selection_set is not None:
+                self._collect_fields(field_ast.selection_set.selections, fields)
+        return fields
+
+    def _collect_fields(self, selections, fields: Dict[str, List[ast.Field]]):
+        for selection in selections:
+            if isinstance(selection, ast.Field):
+                fields.setdefault(selection.name.value, []).append(selection)
+            elif isinstance(selection, ast.InlineFragment):
+                self._collect_fields(selection.selection_set.selections, fields)
+            elif isinstance(selection, ast.FragmentSpread):
+                fragment = self.fragments[selection.name.value]
+                self._collect_fields(fragment.selection_set.selections, fields)
@@ -0,0 +1,79 @@
+"""
+Change events of projects, served by GraphQL subscriptions.
+
+Model signals (and bulk operations, which do not send them) publish events
+to the channel layer group of the project once the transaction commits,
+so subscribers always load committed rows. Events of a transaction are
+merged per object (e.g. an issue created and then updated is only
+created), one message carries all objects of a project changed
+by the same action.
+"""
+from collections import defaultdict
+from typing import Iterable, List, Tuple
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+from stx_training_program.batches import commit_batch
+
+
+ISSUE = "issue"
+ATTACHMENT = "attachment"
+
+CREATED = "created"
+UPDATED = "updated"
+DELETED = "deleted"
+
+
+def project_group(project_id) -> str:
+    return f"project_{project_id}"
+
+
+def merge_actions(previous: str, action: str) -> str:
+    if previous == CREATED and action == UPDATED:
+        return CREATED
+    return action
+
+
+def publish(project_id, model: str, action: str, pks: Iterable[int], using=None):
+    """
+    Sends an event about objects of the project after the transaction commits.
+    """
+    pks = list(pks)
+    if get_channel_layer() is None or project_id is None or not pks:
+        return
+
+    with commit_batch("project_events", send_events, using) as batch:
+        for pk in pks:
+            key = (project_id, model, pk)
+            batch[key] = merge_actions(batch.get(key), action)
+
+
+def get_event_messages(batch: dict) -> List[Tuple[str, dict]]:
+    """
+    Returns `(group, message)` of merged `{(project id, model, pk): action}`
+    events, one per project, model and action.
+    """
+    grouped = defaultdict(list)
+    for (project_id, model, pk), action in batch.items():
+        grouped[project_id, model, action].append(pk)
+
+    return [
+        (
+            project_group(project_id),
+            {
+                "type": "project.events",
+                "project": project_id,
+                "model": model,
+                "action": action,
+                "pks": pks,
+            },
+        )
+        for (project_id, model, action), pks in grouped.items()
+    ]
+
+
+def send_events(batch: dict) -> None:
+    send = async_to_sync(get_channel_layer().group_send)
+    for group, message in get_event_messages(batch):
+        send(group, message)
@@ -0,0 +1,97 @@
+"""
+Per-request DataLoaders batching relations of GraphQL nodes.
+
+Resolvers of one level of a query ask a loader for single keys,
+the loader runs one query for all keys collected on that level.
+"""
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from promise import Promise
+from promise.dataloader import DataLoader
+
+from api_projects.models import Project, Issue, IssueAttachment
+
+
+User = get_user_model()
+
+
+class ModelLoader(DataLoader):
+    """
+    Loads instances of `model` by primary key.
+    """
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def batch_load_fn(self, keys):
+        instances = self.model._default_manager.in_bulk(keys)
+        return Promise.resolve([instances.get(key) for key in keys])
+
+
+class RelatedListLoader(DataLoader):
+    """
+    Loads lists of objects by the value of their `key_field`, ordered by pk.
+    """
+
+    def __init__(self, queryset, key_field: str):
+        super().__init__()
+        self.queryset = queryset
+        self.key_field = key_field
+
+    def batch_load_fn(self, keys):
+        groups = defaultdict(list)
+        queryset = self.queryset.filter(**{f"{self.key_field}__in": keys})
+        for instance in queryset.order_by("pk"):
+            groups[getattr(instance, self.key_field)].append(instance)
+        return Promise.resolve([groups[key] for key in keys])
+
+
+class ProjectMembersLoader(DataLoader):
+    """
+    Loads one side of the project members relation by keys of the other
+    one (`project` or `user`), ordered by pk, with a single join.
+    """
+
+    def __init__(self, key_field: str, related_field: str):
+        super().__init__()
+        self.key_field = key_field
+        self.related_field = related_field
+
+    def batch_load_fn(self, keys):
+        groups = defaultdict(list)
+        rows = (
+            Project.members.through.objects.filter(**{f"{self.key_field}_id__in": keys})
+            .select_related(self.related_field)
+            .order_by(f"{self.related_field}_id")
+        )
+        for row in rows:
+            key = getattr(row, f"{self.key_field}_id")
+            groups[key].append(getattr(row, self.related_field))
+        return Promise.resolve([groups[key] for key in keys])
+
+
+class Loaders:
+    def __init__(self):
+        self.users = ModelLoader(User)
+        self.projects = ModelLoader(Project)
+        self.issues = ModelLoader(Issue)
+        self.project_issues = RelatedListLoader(Issue.objects.all(), "project_id")
+        self.project_members = ProjectMembersLoader("project", "user")
+        self.issue_files = RelatedListLoader(IssueAttachment.objects.all(), "issue_id")
+        self.user_own_projects = RelatedListLoader(Project.objects.all(), "owner_id")
+        self.user_projects = ProjectMembersLoader("user", "project")
+        self.user_created_issues = RelatedListLoader(Issue.objects.all(), "owner_id")
+        self.user_own_issues = RelatedListLoader(Issue.objects.all(), "assigne_id")
+
+
+def get_loaders(request) -> Loaders:
+    """
+    Returns loaders of the request, so loaded objects are shared
+    by all resolvers of a query, but never between requests.
+    """
+    loaders = getattr(request, "_graphql_loaders", None)
+    if loaders is None:
+        loaders = request._graphql_loaders = Loaders()
+    return loaders
@@ -0,0 +1,68 @@
+import time
+
+from django.core.mail import EmailMessage, send_mail
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from stx_training_program import mail
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares throughput of sending email with a new connection per message, "
+        "with the pooled connection and in batches over the pooled connection. "
+        "For a local SMTP stand-in run "
+        "`python -m smtpd -n -c DebuggingServer localhost:1025` and pass "
+        "`--backend django.core.mail.backends.smtp.EmailBackend --port 1025`."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--messages", type=int, default=200)
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument(
+            "--backend", default="django.core.mail.backends.console.EmailBackend"
+        )
+        parser.add_argument("--host", default="localhost")
+        parser.add_argument("--port", type=int, default=1025)
+
+    def handle(self, *args, **options):
+        count, batch_size = options["messages"], options["batch_size"]
+        messages = [
+            EmailMessage(f"Subject {i}", "Message", None, [f"user{i}@example.com"])
+            for i in range(count)
+        ]
+
+        def per_message():
+            for message in messages:
+                send_mail(message.subject, message.body, None, message.to)
+
+        def pooled():
+            for message in messages:
+                mail.send_messages([message])
+
+        def batched():
+            for start in range(0, count, batch_size):
+                mail.send_messages(messages[start : start + batch_size])
+
+        with override_settings(
+            EMAIL_BACKEND=options["backend"],
+            EMAIL_HOST=options["host"],
+            EMAIL_PORT=options["port"],
+        ):
+            results = [
+                (name, self._measure(send))
+                for name, send in (
+                    ("new connection", per_message),
+                    ("pooled", pooled),
+                    ("batched", batched),
+                )
+            ]
+            mail.pool.close()
+
+        for name, duration in results:
+            self.stderr.write(f"{name}: {count / duration:.0f} messages/s")
+
+    def _measure(self, func) -> float:
+        start = time.perf_counter()
+        func()
+        return time.perf_counter() - start
@@ -0,0 +1,78 @@
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from api_projects.models import Project, Issue
+
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures throughput of loading Issue instances, with all and with "
+        "deferred fields, against loading the raw rows. All generated rows "
+        "are rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--issues", type=int, default=5000)
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self._generate_data(options["issues"])
+            queryset = Issue.objects.order_by("pk")
+            rows = queryset.count()
+            raw = self._measure(options["repeat"], lambda: list(queryset.values_list()))
+            self.stdout.write(f"rows: {rows} rows, {rows / raw:.0f} rows/s")
+
+            for name, load in (
+                ("instances", lambda: list(queryset.all())),
+                ("deferred", lambda: list(queryset.only("title"))),
+            ):
+                with CaptureQueriesContext(connection) as context:
+                    load()
+                elapsed = self._measure(options["repeat"], load)
+                self.stdout.write(
+                    f"{name}: {rows} rows, {rows / elapsed:.0f} rows/s, "
+                    f"{elapsed / raw:.1f}x rows time, "
+                    f"{len(context.captured_queries)} queries"
+                )
+            transaction.set_rollback(True)
+
+    def _generate_data(self, issues_count: int) -> None:
+        owner = User.objects.create_user("benchmark@example.com", "benchmark")
+        assignees = [
+            User.objects.create_user(f"benchmark{i}@example.com", "benchmark")
+            for i in range(5)
+        ]
+        project = Project.objects.create(name="Project", owner=owner)
+        due_date = timezone.now() + timedelta(days=30)
+        Issue.objects.bulk_create(
+            Issue(
+                title=f"Issue {i}",
+                owner=owner,
+                assigne=assignees[i % len(assignees)] if i % 2 else None,
+                project=project,
+                due_date=due_date,
+            )
+            for i in range(issues_count)
+        )
+
+    @staticmethod
+    def _measure(repeat: int, load) -> float:
+        """
+        Returns the best time of loading all rows.
+        """
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            load()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
@@ -0,0 +1,101 @@
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api_projects.compiled import CompiledIssueSerializer, CompiledProjectSerializer
+from api_projects.models import Project, Issue
+from api_projects.serializers import IssueSerializer, ProjectSerializer
+
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares throughput of stock and compiled list serializers "
+        "on generated data. All generated rows are rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--projects", type=int, default=20)
+        parser.add_argument("--issues", type=int, default=100, help="per project")
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self._generate_data(options["projects"], options["issues"])
+            request = Request(APIRequestFactory().get("/"))
+            context = {"request": request}
+
+            for name, serializer_class, compiled_class, queryset in (
+                ("issues", IssueSerializer, CompiledIssueSerializer, Issue.objects),
+                (
+                    "projects",
+                    ProjectSerializer,
+                    CompiledProjectSerializer,
+                    Project.objects,
+                ),
+            ):
+                queryset = queryset.order_by("pk")
+                serializer = serializer_class(context=context)
+                stock = self._measure(
+                    options["repeat"],
+                    lambda: serializer_class(
+                        serializer.setup_eager_loading(queryset),
+                        many=True,
+                        context=context,
+                    ).data,
+                )
+                compiled = compiled_class(serializer)
+                fast = self._measure(
+                    options["repeat"],
+                    lambda: compiled.serialize(list(compiled.get_queryset(queryset))),
+                )
+                rows = queryset.count()
+                self.stdout.write(
+                    f"{name}: {rows} rows, stock {rows / stock:.0f} rows/s, "
+                    f"compiled {rows / fast:.0f} rows/s, speedup {stock / fast:.1f}x"
+                )
+            transaction.set_rollback(True)
+
+    def _generate_data(self, projects_count: int, issues_count: int) -> None:
+        owner = User.objects.create_user("benchmark@example.com", "benchmark")
+        members = [
+            User.objects.create_user(f"benchmark{i}@example.com", "benchmark")
+            for i in range(5)
+        ]
+        due_date = timezone.now() + timedelta(days=30)
+        for i in range(projects_count):
+            project = Project.objects.create(name=f"Project {i}", owner=owner)
+            project.members.add(*members)
+            Issue.objects.bulk_create(
+                Issue(
+                    title=f"Issue {i}-{j}",
+                    description="Description " * 10,
+                    owner=owner,
+                    assigne=members[j % len(members)] if j % 2 else None,
+                    project=project,
+                    due_date=due_date,
+                )
+                for j in range(issues_count)
+            )
+
+    @staticmethod
+    def _measure(repeat: int, serialize) -> float:
+        """
+        Returns the best time of serializing and rendering all rows.
+        """
+        renderer = JSONRenderer()
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            renderer.render(serialize())
+            timings.append(time.perf_counter() - start)
+        return min(timings)
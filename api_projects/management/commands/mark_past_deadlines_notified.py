@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api_projects.models import Issue
+
+
+class Command(BaseCommand):
+    help = (
+        "Marks deadlines which already passed as notified, so the deadline "
+        "sweep does not notify them again after the upgrade from ETA tasks."
+    )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        count = Issue.objects.filter(
+            due_date__lte=now, deadline_notified_date=None
+        ).set_deadline_notified(now)
+        self.stdout.write(self.style.SUCCESS(f"Marked {count} past deadlines."))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from api_projects.models import ProjectAccess
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the project access table from project owners and members."
+
+    def handle(self, *args, **options):
+        ProjectAccess.rebuild()
+        count = ProjectAccess.objects.count()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} access rows."))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from api_projects import search
+from api_projects.models import Issue
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the full-text search index of issues."
+
+    def handle(self, *args, **options):
+        count = search.rebuild_index(Issue.objects.all())
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} issues."))
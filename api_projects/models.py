@@ -1,12 +1,15 @@
 import os
+from collections import defaultdict
 
-from django.db import models
-from django.db.models.signals import post_delete, pre_delete
+from django.db import connections, models, router, transaction
+from django.db.models.signals import post_delete, post_save, m2m_changed
 from django.contrib.auth import get_user_model
 from django.dispatch import receiver
+from django.utils import timezone
 
-from stx_training_program.celery import app
-from api_projects.tasks import send_issue_notification, notify_issue_deadline
+from stx_training_program.batches import commit_batch
+from stx_training_program.results import bump_table_versions
+from api_projects import events, search
 
 
 User = get_user_model()
@@ -20,16 +23,233 @@ class Project(models.Model):
     creation_date = models.DateTimeField(auto_now_add=True)
     members = models.ManyToManyField(User, related_name="projects", blank=True)
 
+    class Meta:
+        # keys used by the cursor pagination
+        indexes = [models.Index(fields=["creation_date", "id"])]
+
     def __str__(self):
         return self.name
 
 
+class ProjectAccessQuerySet(models.QuerySet):
+    def project_ids(self, user):
+        """
+        Returns subquery of project ids visible for the user.
+        """
+        return self.filter(user=user).values("project_id")
+
+
+class ProjectAccess(models.Model):
+    """
+    Denormalized project visibility, one row per user with access to a project.
+    Kept in sync with `Project.owner` and `Project.members` by signals.
+    """
+
+    class Role(models.TextChoices):
+        OWNER = "owner"
+        MEMBER = "member"
+
+    user = models.ForeignKey(
+        User, related_name="project_access", on_delete=models.CASCADE
+    )
+    project = models.ForeignKey(
+        Project, related_name="access", on_delete=models.CASCADE
+    )
+    role = models.CharField(max_length=10, choices=Role.choices)
+
+    objects = ProjectAccessQuerySet.as_manager()
+
+    class Meta:
+        unique_together = ["user", "project"]
+
+    def __str__(self):
+        return f"{self.user_id} -> {self.project_id} ({self.role})"
+
+    @classmethod
+    def rebuild(cls, projects=None) -> None:
+        """
+        Recreates access rows of given projects (all by default)
+        from the owner and members, e.g. after bulk updates
+        which do not send signals.
+        """
+        if projects is None:
+            projects = Project.objects.all()
+        projects = projects.prefetch_related(
+            models.Prefetch("members", queryset=User.objects.only("pk"))
+        )
+        with transaction.atomic():
+            rows = {}
+            for project in projects:
+                for member in project.members.all():
+                    rows[member.pk, project.pk] = cls.Role.MEMBER
+                rows[project.owner_id, project.pk] = cls.Role.OWNER
+            cls.objects.filter(project__in=projects).delete()
+            cls.objects.bulk_create(
+                cls(user_id=user_id, project_id=project_id, role=role)
+                for (user_id, project_id), role in rows.items()
+            )
+
+
+class ProjectVersionQuerySet(models.QuerySet):
+    def bump(self) -> int:
+        return self.update(
+            version=models.F("version") + 1, modification_date=timezone.now()
+        )
+
+    bump.alters_data = True
+
+
+class ProjectVersion(models.Model):
+    """
+    Version of a project and everything nested in it (issues, attachments,
+    members), used to answer conditional requests without serializing data.
+    Kept in a separate table, so saving a stale `Project` instance
+    can never overwrite the counter. Counters missing for older projects
+    are created when they are read for the first time.
+    """
+
+    project = models.OneToOneField(
+        Project,
+        primary_key=True,
+        related_name="version_counter",
+        on_delete=models.CASCADE,
+    )
+    version = models.PositiveIntegerField(default=1)
+    modification_date = models.DateTimeField(default=timezone.now)
+
+    objects = ProjectVersionQuerySet.as_manager()
+
+    def __str__(self):
+        return f"{self.project_id} v{self.version}"
+
+
+class IssueQuerySet(models.QuerySet):
+    """
+    Keeps Issue change notifications working for bulk operations,
+    which do not call `Issue.save()`.
+    """
+
+    def update(self, **kwargs):
+        attnames = {self.model._meta.get_field(name).attname for name in kwargs}
+        tracked = [name for name in Issue.TRACKED_FIELDS if name in attnames]
+        if not tracked:
+            return self._update_untracked(kwargs, attnames)
+
+        with transaction.atomic(using=self.db):
+            previous = {
+                issue.pk: issue for issue in self.only("pk", "project_id", *tracked)
+            }
+            updated = super().update(**kwargs)
+            issues = list(Issue.objects.using(self.db).filter(pk__in=previous))
+            project_ids = {issue.project_id for issue in previous.values()}
+            for issue in issues:
+                issue._original_values = previous[issue.pk]._original_values
+                project_ids.add(issue.project_id)
+            publish_issue_events(issues, events.UPDATED, using=self.db)
+            Issue._notify_bulk_changes(issues, tracked, using=self.db)
+            if attnames & SEARCH_FIELDS:
+                search.index_issues(issues, using=self.db)
+            bump_table_versions(Issue, using=self.db)
+            ProjectVersion.objects.using(self.db).filter(
+                project_id__in=project_ids
+            ).bump()
+        return updated
+
+    update.alters_data = True
+
+    def _update_untracked(self, kwargs, attnames) -> int:
+        """
+        Updates fields which are not tracked (e.g. the status),
+        only keys and projects of the rows are read.
+        """
+        with transaction.atomic(using=self.db):
+            rows = list(self.values_list("pk", "project_id"))
+            updated = super().update(**kwargs)
+            pks = defaultdict(list)
+            for pk, project_id in rows:
+                pks[project_id].append(pk)
+            for project_id, project_pks in pks.items():
+                events.publish(
+                    project_id, events.ISSUE, events.UPDATED, project_pks, using=self.db
+                )
+            if attnames & SEARCH_FIELDS:
+                search.index_issues(
+                    Issue.objects.using(self.db)
+                    .filter(pk__in=[pk for pk, _ in rows])
+                    .only("pk", "title", "description"),
+                    using=self.db,
+                )
+            bump_table_versions(Issue, using=self.db)
+            ProjectVersion.objects.using(self.db).filter(project_id__in=pks).bump()
+        return updated
+
+    def bulk_create(self, objs, batch_size=None, ignore_conflicts=False):
+        objs = list(objs)
+        if not ignore_conflicts and not can_get_created_pks(self.db):
+            # keys of new rows are needed by notifications, events and the
+            # search index, `save()` takes care of them row by row
+            with transaction.atomic(using=self.db, savepoint=False):
+                for issue in objs:
+                    # every value of a new row is a change
+                    issue._original_values = {}
+                    issue.save(force_insert=True, using=self.db)
+            return objs
+
+        with transaction.atomic(using=self.db, savepoint=False):
+            created = super().bulk_create(
+                objs, batch_size=batch_size, ignore_conflicts=ignore_conflicts
+            )
+            if not ignore_conflicts:
+                set_created_pks(self, objs)
+                publish_issue_events(objs, events.CREATED, using=self.db)
+                for issue in objs:
+                    # every value of a new row is a change
+                    issue._original_values = {}
+                Issue._notify_bulk_changes(objs, Issue.TRACKED_FIELDS, using=self.db)
+                search.index_issues(objs, using=self.db)
+            ProjectVersion.objects.using(self.db).filter(
+                project_id__in={issue.project_id for issue in objs}
+            ).bump()
+            bump_table_versions(Issue, using=self.db)
+        return created
+
+    bulk_create.alters_data = True
+
+    def bulk_update(self, objs, fields, batch_size=None):
+        # `bulk_update` runs `update` internally, which sends notifications,
+        # so only the snapshots of given objects have to be refreshed.
+        updated = super().bulk_update(objs, fields, batch_size=batch_size)
+        attnames = {self.model._meta.get_field(name).attname for name in fields}
+        tracked = [name for name in Issue.TRACKED_FIELDS if name in attnames]
+        for issue in objs:
+            issue._snapshot_tracked_fields(tracked)
+        return updated
+
+    bulk_update.alters_data = True
+
+    def overdue(self, now):
+        """
+        Returns assigned issues whose deadline passed and was not notified yet.
+        """
+        return self.filter(
+            due_date__lte=now, deadline_notified_date=None, assigne__isnull=False
+        ).exclude(status=Issue.Status.DONE)
+
+    def set_deadline_notified(self, date) -> int:
+        # the watermark is not exposed, change notifications are skipped
+        return super().update(deadline_notified_date=date)
+
+    set_deadline_notified.alters_data = True
+
+
 class Issue(models.Model):
+    # Raw column values compared on save to detect changes.
+    TRACKED_FIELDS = ("assigne_id", "due_date", "project_id")
+
     def __init__(self, *args, **kwargs):
         super(Issue, self).__init__(*args, **kwargs)
         # save these values before update
-        self._original_due_date = self.due_date
-        self._original_assigne = self.assigne
+        self._snapshot_tracked_fields()
 
     class Status(models.TextChoices):
         TODO = "todo"
@@ -57,55 +277,214 @@ class Issue(models.Model):
     project = models.ForeignKey(
         Project, related_name="issues", on_delete=models.CASCADE
     )
+    # watermark of the deadline sweep, reset when the due date changes
+    deadline_notified_date = models.DateTimeField(blank=True, null=True)
+
+    objects = IssueQuerySet.as_manager()
+
+    class Meta:
+        # keys used by the cursor pagination
+        indexes = [
+            models.Index(fields=["created_date", "id"]),
+            models.Index(fields=["due_date", "id"]),
+            # only deadlines which were not notified yet are swept
+            models.Index(
+                fields=["due_date", "status"],
+                name="issue_deadline_sweep_idx",
+                condition=models.Q(deadline_notified_date=None),
+            ),
+        ]
 
     def __str__(self):
         return self.title
 
+    def _snapshot_tracked_fields(self, fields=None) -> None:
+        """
+        Remembers raw values of tracked fields.
+        Deferred fields are skipped, reading them would cause a query.
+        """
+        if fields is None:
+            self._original_values = {}
+            fields = self.TRACKED_FIELDS
+        for attname in fields:
+            if attname in self.__dict__:
+                self._original_values[attname] = self.__dict__[attname]
+
+    def _tracked_field_changed(self, attname: str) -> bool:
+        if attname not in self.__dict__:
+            # deferred and never touched, so it could not change
+            return False
+        if attname not in self._original_values:
+            # value was set without loading the original one
+            return True
+        return self._original_values[attname] != self.__dict__[attname]
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using=using, fields=fields)
+        # loaded values (e.g. deferred fields) are the current database state
+        if fields is None:
+            self._snapshot_tracked_fields()
+        else:
+            attnames = {self._meta.get_field(name).attname for name in fields}
+            self._snapshot_tracked_fields(
+                [name for name in self.TRACKED_FIELDS if name in attnames]
+            )
+
     def save(self, *args, **kwargs):
-        super(Issue, self).save(*args, **kwargs)
+        update_fields = kwargs.get("update_fields")
+        if self._tracked_field_changed("due_date") and (
+            update_fields is None or "due_date" in update_fields
+        ):
+            # the new deadline is notified by the sweep again
+            self.deadline_notified_date = None
+            if update_fields is not None:
+                kwargs["update_fields"] = [*update_fields, "deadline_notified_date"]
 
-        if self._original_assigne != self.assigne:
+        using = kwargs.get("using") or router.db_for_write(Issue, instance=self)
+        # notifications are written to the outbox together with the change
+        with transaction.atomic(using=using, savepoint=False):
+            super(Issue, self).save(*args, **kwargs)
+
+            tracked = self.TRACKED_FIELDS
+            if update_fields is not None:
+                attnames = {
+                    self._meta.get_field(name).attname for name in update_fields
+                }
+                tracked = [name for name in tracked if name in attnames]
+            self._notify_changes(tracked)
+
+    def _notify_changes(self, fields) -> None:
+        changed = [name for name in fields if self._tracked_field_changed(name)]
+
+        if "assigne_id" in changed:
             self._perform_assigne_notification()
 
-        if self._original_due_date != self.due_date:
-            self._perform_deadline_notification()
+        self._snapshot_tracked_fields(fields)
 
-    def _perform_assigne_notification(self) -> str:
-        if self.assigne is not None:
-            send_issue_notification.delay(
-                self.assigne.email,
-                "New assignment",
-                f"You are assigned to the task {self.title}",
-            )
+    @classmethod
+    def _notify_bulk_changes(cls, issues, fields, using=None) -> None:
+        """
+        Notifies about changed tracked fields of many saved issues,
+        assignments are written to the outbox in one query and watermarks
+        of changed deadlines are reset in another one.
+        """
+        assignments, rescheduled = [], []
+        for issue in issues:
+            if "assigne_id" in fields and issue._tracked_field_changed("assigne_id"):
+                assignments.append(
+                    (issue, issue.assigne_id, issue._original_values.get("assigne_id"))
+                )
+            if "due_date" in fields and issue._tracked_field_changed("due_date"):
+                # new rows have no watermark yet
+                if "due_date" in issue._original_values:
+                    rescheduled.append(issue)
+            issue._snapshot_tracked_fields(fields)
+
+        cls._enqueue_assignment_notifications(assignments, using=using)
+        if rescheduled:
+            for issue in rescheduled:
+                issue.deadline_notified_date = None
+            Issue.objects.using(using).filter(
+                pk__in=[issue.pk for issue in rescheduled]
+            ).set_deadline_notified(None)
+
+    def _perform_assigne_notification(self) -> None:
+        self._enqueue_assignment_notifications(
+            [(self, self.assigne_id, self._original_values.get("assigne_id"))],
+            using=self._state.db,
+        )
 
-        if self._original_assigne is not None:
-            send_issue_notification.delay(
-                self.assigne.email,
-                "Assigment is removed",
-                f"You were removed from task {self.title}",
+    @staticmethod
+    def _enqueue_assignment_notifications(assignments, using=None) -> None:
+        """
+        Writes notifications of `(issue, assignee id, former assignee id)`
+        changes to the outbox, recipients are loaded with one query.
+        Changes of an issue in one transaction are merged, only the former
+        assignee of the first change and the last assignee are notified.
+        """
+        with commit_batch("assignments", using=using) as batch:
+            changes = []
+            for issue, assigne_id, original_assigne_id in assignments:
+                # pks of rows written by the previous changes of the transaction
+                original_assigne_id, written = batch.get(
+                    issue.pk, (original_assigne_id, {})
+                )
+                changes.append((issue, assigne_id, original_assigne_id, written))
+
+            user_ids = {
+                pk
+                for _, assigne_id, original_assigne_id, _ in changes
+                for pk in (assigne_id, original_assigne_id)
+                if pk is not None
+            }
+            emails = {}
+            if user_ids:
+                emails = dict(
+                    User.objects.using(using)
+                    .filter(pk__in=user_ids)
+                    .values_list("pk", "email")
+                )
+
+            created, obsolete = [], []
+            for issue, assigne_id, original_assigne_id, written in changes:
+                rows = []
+                if assigne_id != original_assigne_id and assigne_id in emails:
+                    rows.append(
+                        (
+                            emails[assigne_id],
+                            "New assignment",
+                            f"You are assigned to the task {issue.title}",
+                        )
+                    )
+                if assigne_id != original_assigne_id and original_assigne_id in emails:
+                    rows.append(
+                        (
+                            emails[original_assigne_id],
+                            "Assigment is removed",
+                            f"You were removed from task {issue.title}",
+                        )
+                    )
+                pks = {row: pk for row, pk in written.items() if row in rows}
+                batch[issue.pk] = (original_assigne_id, pks)
+                obsolete += [pk for row, pk in written.items() if row not in rows]
+                created += [(pks, row) for row in rows if row not in written]
+
+            outbox = Notification.objects.using(
+                using or router.db_for_write(Notification)
             )
+            if obsolete:
+                outbox.filter(pk__in=obsolete).delete()
+            notifications = [
+                Notification(email=email, subject=subject, message=message)
+                for _, (email, subject, message) in created
+            ]
+            if can_get_created_pks(outbox.db):
+                outbox.bulk_create(notifications)
+                set_created_pks(outbox, notifications)
+            else:
+                for notification in notifications:
+                    notification.save(using=outbox.db)
+            for (pks, row), notification in zip(created, notifications):
+                pks[row] = notification.pk
 
-    def _perform_deadline_notification(self):
-        if self.assigne:
-            current_task, _ = DateUpdateTask.objects.get_or_create(issue=self)
-            if current_task.task_id is not None:
-                # remove previous task due to date change
-                app.control.revoke(task_id=current_task.task_id, terminate=True)
-
-            subject = "Your task is not completed!"
-            message = f"The time for the task {self.title} is over :("
-            current_task.task_id = notify_issue_deadline.s(
-                self.pk, self.assigne.email, subject, message
-            ).apply_async(eta=self.due_date)
-            current_task.save()
-
-
-# Can be extended / changed as more tasks are needed
-class DateUpdateTask(models.Model):
-    issue = models.OneToOneField(
-        Issue, on_delete=models.CASCADE, primary_key=True, related_name="issue_task"
-    )
-    task_id = models.CharField(max_length=50, unique=True, blank=True)
+
+class Notification(models.Model):
+    """
+    Outbox of emails, written in the transaction of the change
+    and sent in digests by the `send_notification_digests` task.
+    """
+
+    email = models.EmailField()
+    subject = models.CharField(max_length=200)
+    message = models.TextField()
+    created_date = models.DateTimeField(auto_now_add=True)
+    # failed sends, see MAX_NOTIFICATION_ATTEMPTS
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # claimed by a worker, or waiting for a retry, until then
+    claimed_until = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.subject} ({self.email})"
 
 
 class IssueAttachment(models.Model):
@@ -116,14 +495,228 @@ class IssueAttachment(models.Model):
         return os.path.basename(self.file_attachment.name)
 
 
-# Note: custom fields in Issue init causes infinite loop during cascade deletion
-# Empty pre_delete signal fixes this issue...
-# source: https://code.djangoproject.com/ticket/31475
-@receiver(pre_delete, sender=Issue)
-def clean_custom_fields(sender, instance, **kwargs):
-    pass
+def can_get_created_pks(using) -> bool:
+    connection = connections[using]
+    return (
+        connection.features.can_return_rows_from_bulk_insert
+        or connection.vendor == "sqlite"
+    )
+
+
+def set_created_pks(queryset, objs) -> None:
+    """
+    Sets keys of objects created by `bulk_create`, if the backend
+    did not return them, see `can_get_created_pks`.
+    """
+    if not objs or objs[0].pk is not None:
+        return
+    # SQLite does not return inserted rows, but it assigns increasing
+    # keys and lets only one transaction write, which now holds the lock,
+    # so the created rows are the last ones.
+    pks = (
+        queryset.model.objects.using(queryset.db)
+        .order_by("-pk")
+        .values_list("pk", flat=True)
+    )
+    for obj, pk in zip(objs, reversed(pks[: len(objs)])):
+        obj.pk = pk
+
+
+def publish_issue_events(issues, action: str, using=None) -> None:
+    """
+    Publishes events of saved or deleted issues grouped by project,
+    issues moved to another project are deleted from the former one.
+    """
+    changed, moved = defaultdict(list), defaultdict(list)
+    for issue in issues:
+        changed[issue.project_id].append(issue.pk)
+        former_project_id = issue._original_values.get("project_id")
+        is_moved = former_project_id not in (None, issue.project_id)
+        if action == events.UPDATED and is_moved:
+            moved[former_project_id].append(issue.pk)
+
+    for project_id, pks in changed.items():
+        events.publish(project_id, events.ISSUE, action, pks, using=using)
+    for project_id, pks in moved.items():
+        events.publish(project_id, events.ISSUE, events.DELETED, pks, using=using)
 
 
 @receiver(post_delete, sender=IssueAttachment)
 def issue_attachment_delete(sender, instance, **kwargs):
     instance.file_attachment.delete(save=False)
+
+
+@receiver(post_save, sender=Project)
+def bump_project_version(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        ProjectVersion.objects.create(project=instance)
+    else:
+        ProjectVersion.objects.filter(project=instance).bump()
+
+
+@receiver(post_save, sender=Issue)
+@receiver(post_delete, sender=Issue)
+def bump_issue_project_version(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # the issue could be moved from another project
+    former_project_id = instance._original_values.get("project_id")
+    ProjectVersion.objects.filter(
+        project_id__in=[instance.project_id, former_project_id]
+    ).bump()
+
+
+@receiver(post_save, sender=Issue)
+def publish_issue_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    action = events.CREATED if created else events.UPDATED
+    publish_issue_events([instance], action)
+
+
+@receiver(post_delete, sender=Issue)
+def publish_issue_delete(sender, instance, **kwargs):
+    publish_issue_events([instance], events.DELETED)
+
+
+# indexed columns, saves of other fields leave the index entry as it is
+SEARCH_FIELDS = {"title", "description"}
+
+
+@receiver(post_save, sender=Issue)
+def index_issue(sender, instance, using, update_fields=None, **kwargs):
+    if update_fields is not None and not SEARCH_FIELDS & set(update_fields):
+        return
+    search.index_issues([instance], using=using)
+
+
+@receiver(post_delete, sender=Issue)
+def remove_issue_from_index(sender, instance, using, **kwargs):
+    search.remove_issues([instance.pk], using=using)
+
+
+@receiver(post_save, sender=IssueAttachment)
+def publish_attachment_create(sender, instance, created, raw=False, **kwargs):
+    if raw or not created:
+        return
+    project_id = (
+        Issue.objects.filter(pk=instance.issue_id)
+        .values_list("project_id", flat=True)
+        .first()
+    )
+    events.publish(project_id, events.ATTACHMENT, events.CREATED, [instance.pk])
+
+
+@receiver(post_save, sender=IssueAttachment)
+@receiver(post_delete, sender=IssueAttachment)
+def bump_attachment_project_version(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    ProjectVersion.objects.filter(project__issues=instance.issue_id).bump()
+
+
+@receiver(post_save, sender=User)
+def bump_user_projects_version(
+    sender, instance, created, raw=False, update_fields=None, **kwargs
+):
+    if raw or created:
+        return
+    if update_fields is not None and "email" not in update_fields:
+        return
+    # emails of owners, members and assignees are shown in projects and issues
+    ProjectVersion.objects.filter(
+        models.Q(project__access__user=instance)
+        | models.Q(project__issues__owner=instance)
+        | models.Q(project__issues__assigne=instance)
+    ).bump()
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+@receiver(post_save, sender=Issue)
+@receiver(post_delete, sender=Issue)
+@receiver(post_save, sender=IssueAttachment)
+@receiver(post_delete, sender=IssueAttachment)
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def bump_graphql_table_version(sender, **kwargs):
+    # cached GraphQL results which read the table become stale
+    bump_table_versions(sender)
+
+
+@receiver(post_save, sender=Project)
+def update_owner_access(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if not created:
+        former_owners = set(
+            ProjectAccess.objects.filter(
+                project=instance, role=ProjectAccess.Role.OWNER
+            )
+            .exclude(user_id=instance.owner_id)
+            .values_list("user_id", flat=True)
+        )
+        if former_owners:
+            # former owners keep access only if they are members
+            members = set(
+                instance.members.filter(pk__in=former_owners).values_list(
+                    "pk", flat=True
+                )
+            )
+            former_access = ProjectAccess.objects.filter(project=instance)
+            former_access.filter(user_id__in=members).update(
+                role=ProjectAccess.Role.MEMBER
+            )
+            former_access.filter(user_id__in=former_owners - members).delete()
+
+    ProjectAccess.objects.update_or_create(
+        project=instance,
+        user_id=instance.owner_id,
+        defaults={"role": ProjectAccess.Role.OWNER},
+    )
+
+
+@receiver(m2m_changed, sender=Project.members.through)
+def update_members_access(sender, instance, action, reverse, pk_set, **kwargs):
+    # `reverse` means the relation was changed from the user side
+    own_field, related_field = ("user", "project") if reverse else ("project", "user")
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    bump_table_versions(Project, User)
+
+    if action == "post_add":
+        ProjectAccess.objects.bulk_create(
+            [
+                ProjectAccess(
+                    **{own_field: instance, f"{related_field}_id": pk},
+                    role=ProjectAccess.Role.MEMBER,
+                )
+                for pk in pk_set
+            ],
+            # owners already have access
+            ignore_conflicts=True,
+        )
+        changed_access = None
+    else:
+        changed_access = ProjectAccess.objects.filter(
+            role=ProjectAccess.Role.MEMBER, **{own_field: instance}
+        )
+        if action == "post_remove":
+            changed_access = changed_access.filter(
+                **{f"{related_field}_id__in": pk_set}
+            )
+
+    if not reverse:
+        versions = ProjectVersion.objects.filter(project=instance)
+    elif pk_set is not None:
+        versions = ProjectVersion.objects.filter(project_id__in=pk_set)
+    else:
+        # projects of a cleared relation are known only from the access table
+        project_ids = list(changed_access.values_list("project_id", flat=True))
+        versions = ProjectVersion.objects.filter(project_id__in=project_ids)
+    versions.bump()
+
+    if changed_access is not None:
+        changed_access.delete()
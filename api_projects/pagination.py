@@ -0,0 +1,178 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict, namedtuple
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from api_projects import search
+
+
+Cursor = namedtuple("Cursor", ["position", "pk", "reverse"])
+
+
+class KeysetCursorPagination(BasePagination):
+    """
+    Cursor pagination based on a `(ordering field, pk)` key.
+
+    Unlike DRF's CursorPagination, the cursor always points to an exact row,
+    so each page is fetched with an indexed range predicate,
+    without OFFSET, no matter how deep the client pages.
+    """
+
+    cursor_query_param = "cursor"
+    ordering_query_param = "ordering"
+    page_size_query_param = "page_size"
+    page_size = 50
+    max_page_size = 500
+    # fields allowed in `?ordering=`, the first one is the default
+    ordering_fields = ()
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering_field, self.descending = self.get_ordering(request, queryset)
+        self.cursor = self.decode_cursor(request, queryset)
+        self.pk_name = queryset.model._meta.pk.attname
+
+        reverse = self.cursor is not None and self.cursor.reverse
+        descending = self.descending != reverse
+        prefix = "-" if descending else ""
+        queryset = queryset.order_by(f"{prefix}{self.ordering_field}", f"{prefix}pk")
+
+        if self.cursor is not None:
+            lookup = "lt" if descending else "gt"
+            position, pk = self.cursor.position, self.cursor.pk
+            queryset = queryset.filter(
+                Q(**{f"{self.ordering_field}__{lookup}": position})
+                | Q(**{self.ordering_field: position, f"pk__{lookup}": pk})
+            )
+
+        # fetch one more row to check whether there is a following page
+        results = list(queryset[: self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[: self.page_size]
+
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response(
+            OrderedDict(
+                [
+                    ("next", self.get_next_link()),
+                    ("previous", self.get_previous_link()),
+                    ("results", data),
+                ]
+            )
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "next": {"type": "string", "nullable": True},
+                "previous": {"type": "string", "nullable": True},
+                "results": schema,
+            },
+        }
+
+    def get_page_size(self, request) -> int:
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def get_ordering_fields(self, queryset):
+        """
+        Returns fields allowed in `?ordering=` of the queryset.
+        """
+        return self.ordering_fields
+
+    def get_ordering(self, request, queryset):
+        ordering_fields = self.get_ordering_fields(queryset)
+        ordering = request.query_params.get(
+            self.ordering_query_param, ordering_fields[0]
+        )
+        field = ordering.lstrip("-")
+        if field not in ordering_fields:
+            raise ValidationError(
+                {self.ordering_query_param: f"Allowed fields: {ordering_fields}"}
+            )
+        return field, ordering.startswith("-")
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            # e.g. the cursor points behind the last row
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def encode_cursor(self, instance, reverse: bool) -> str:
+        # instances may be model objects or `values()` rows
+        if isinstance(instance, dict):
+            position = instance[self.ordering_field]
+            pk = instance[self.pk_name]
+        else:
+            position = getattr(instance, self.ordering_field)
+            pk = instance.pk
+        if hasattr(position, "isoformat"):
+            position = position.isoformat()
+        data = json.dumps([position, pk, reverse]).encode("utf-8")
+        encoded = urlsafe_b64encode(data).decode("ascii")
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def decode_cursor(self, request, queryset):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        # annotations (e.g. the search rank) are not model fields
+        field = queryset.query.annotations.get(self.ordering_field)
+        if field is not None:
+            field = field.output_field
+        else:
+            field = queryset.model._meta.get_field(self.ordering_field)
+        try:
+            position, pk, reverse = json.loads(
+                urlsafe_b64decode(encoded.encode("ascii"))
+            )
+            position = field.to_python(position)
+            if position is None:
+                raise ValueError("Ordering fields are not nullable.")
+            return Cursor(position=position, pk=int(pk), reverse=bool(reverse))
+        except (TypeError, ValueError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+
+class ProjectCursorPagination(KeysetCursorPagination):
+    ordering_fields = ("creation_date",)
+
+
+class IssueCursorPagination(KeysetCursorPagination):
+    ordering_fields = ("created_date", "due_date")
+
+    def get_ordering_fields(self, queryset):
+        if search.RANK_FIELD in queryset.query.annotations:
+            # Ranks depend on all indexed issues (e.g. BM25), a write between
+            # requests may move rows across cursors, so pages of
+            # `?ordering=search_rank` may skip or repeat rows. Searched issues
+            # are paged by the stable creation date by default.
+            return (*self.ordering_fields, search.RANK_FIELD)
+        return self.ordering_fields
@@ -1,6 +1,36 @@
+from typing import Dict
+
 from rest_framework.permissions import BasePermission, SAFE_METHODS
 
-from api_projects.models import Project, Issue, IssueAttachment
+from api_projects.models import Project, Issue, IssueAttachment, ProjectAccess
+
+
+def get_project_roles(request) -> Dict[int, str]:
+    """
+    Returns roles of the current user in projects, as {project id: role}.
+    Loaded with a single query and memoized for the rest of the request.
+    """
+    roles = getattr(request, "_project_roles", None)
+    if roles is None:
+        if request.user.is_authenticated:
+            roles = dict(
+                ProjectAccess.objects.filter(user=request.user).values_list(
+                    "project_id", "role"
+                )
+            )
+        else:
+            roles = {}
+        request._project_roles = roles
+    return roles
+
+
+def _get_project_id(obj) -> int:
+    if isinstance(obj, Project):
+        return obj.pk
+    if isinstance(obj, Issue):
+        return obj.project_id
+    if isinstance(obj, IssueAttachment):
+        return obj.issue.project_id
 
 
 class IsOwner(BasePermission):
@@ -12,11 +42,14 @@ class IsOwner(BasePermission):
         # Instance must have an attribute named `owner`.
         user = request.user
         if isinstance(obj, Project):
-            return obj.owner == user
+            return obj.owner_id == user.pk
+
+        role = get_project_roles(request).get(_get_project_id(obj))
+        is_project_owner = role == ProjectAccess.Role.OWNER
         if isinstance(obj, Issue):
-            return obj.owner == user or obj.project.owner == user
+            return obj.owner_id == user.pk or is_project_owner
         if isinstance(obj, IssueAttachment):
-            return obj.issue.owner == user or obj.issue.project.owner == user
+            return obj.issue.owner_id == user.pk or is_project_owner
 
 
 class MemberReadOnly(BasePermission):
@@ -25,8 +58,9 @@ class MemberReadOnly(BasePermission):
     """
 
     def has_object_permission(self, request, view, obj):
-        # Instance must have an attribute named `members`.
-        return request.method in SAFE_METHODS and request.user in obj.members.all()
+        # Instance must be a project.
+        roles = get_project_roles(request)
+        return request.method in SAFE_METHODS and obj.pk in roles
 
 
 class IsProjectMember(BasePermission):
@@ -36,9 +70,4 @@ class IsProjectMember(BasePermission):
 
     def has_object_permission(self, request, view, obj):
         # Instance must have an attribute named `project`.
-        if isinstance(obj, Issue):
-            return obj.project in request.user.projects.all()
-        if isinstance(obj, Project):
-            return obj in request.user.projects.all()
-        if isinstance(obj, IssueAttachment):
-            return obj.issue.project in request.user.projects.all()
+        return _get_project_id(obj) in get_project_roles(request)
@@ -1,19 +1,40 @@
 import graphene
+from django.http import Http404
 from django.shortcuts import get_object_or_404
-from django.forms.models import model_to_dict
 from graphene.relay import Node
 from graphene_django import DjangoObjectType
-from graphene_django.filter import DjangoFilterConnectionField
+from graphql import GraphQLError
 
 from api_accounts.schema import UserNode
-from api_projects.models import Project, Issue, IssueAttachment
+from api_projects import events, search
+from api_projects.connections import (
+    BatchedConnectionField,
+    KeysetConnection,
+    OptimizedConnectionField,
+    QueryOptimizer,
+    load_related,
+    load_related_object,
+)
+from api_projects.loaders import get_loaders
+from api_projects.models import (
+    Project,
+    Issue,
+    IssueAttachment,
+    ProjectAccess,
+    ProjectVersion,
+)
 from api_projects.serializers import (
     ProjectSerializer,
     IssueSerializer,
     IssueAttachmentSerializer,
+    IssueBulkSerializer,
 )
+from stx_training_program.results import bump_table_versions
 # Note: because of the large number of classes, consider separated files in future.
 
+SEARCH_RESULTS = 20
+MAX_SEARCH_RESULTS = 100
+
 
 class ProjectNode(DjangoObjectType):
     class Meta:
@@ -23,13 +44,30 @@ class ProjectNode(DjangoObjectType):
             "creation_date": ["exact", "gt", "lt"],
         }
         interfaces = (Node,)
+        connection_class = KeysetConnection
+
+    keyset_sort_key = "creation_date"
 
     pk = graphene.Int(source="pk")
+    issues = BatchedConnectionField(lambda: IssueNode)
+    members = BatchedConnectionField(UserNode)
+
+    def resolve_owner(parent, info):
+        return load_related_object(get_loaders(info.context).users, parent, "owner")
+
+    def resolve_issues(parent, info, **kwargs):
+        loader = get_loaders(info.context).project_issues
+        return load_related(loader, parent, "issues", kwargs)
+
+    def resolve_members(parent, info, **kwargs):
+        loader = get_loaders(info.context).project_members
+        return load_related(loader, parent, "members", kwargs)
 
 
 class IssueNode(DjangoObjectType):
     class Meta:
         model = Issue
+        exclude = ["deadline_notified_date"]
         filter_fields = {
             "title": ["exact", "icontains", "istartswith"],
             "description": ["icontains"],
@@ -37,8 +75,27 @@ class IssueNode(DjangoObjectType):
             "owner": ["exact"],
         }
         interfaces = (Node,)
+        connection_class = KeysetConnection
+
+    keyset_sort_key = "created_date"
 
     pk = graphene.Int(source="pk")
+    files = BatchedConnectionField(lambda: IssueAttachmentNode)
+
+    def resolve_owner(parent, info):
+        return load_related_object(get_loaders(info.context).users, parent, "owner")
+
+    def resolve_assigne(parent, info):
+        loader = get_loaders(info.context).users
+        return load_related_object(loader, parent, "assigne")
+
+    def resolve_project(parent, info):
+        loader = get_loaders(info.context).projects
+        return load_related_object(loader, parent, "project")
+
+    def resolve_files(parent, info, **kwargs):
+        loader = get_loaders(info.context).issue_files
+        return load_related(loader, parent, "files", kwargs)
 
 
 class IssueAttachmentNode(DjangoObjectType):
@@ -47,6 +104,12 @@ class IssueAttachmentNode(DjangoObjectType):
         model = IssueAttachment
         filter_fields = ["issue"]
         interfaces = (Node,)
+        connection_class = KeysetConnection
+
+    keyset_sort_key = "id"
+
+    # model columns of fields which are not model fields
+    field_columns = {"url": ["file_attachment"], "filename": ["file_attachment"]}
 
     pk = graphene.Int(source="pk")
     url = graphene.String()
@@ -61,16 +124,41 @@ class IssueAttachmentNode(DjangoObjectType):
     def resolve_filename(parent, info):
         return str(parent)
 
+    def resolve_issue(parent, info):
+        return load_related_object(get_loaders(info.context).issues, parent, "issue")
+
 
 class Query(graphene.ObjectType):
     project = Node.Field(ProjectNode)
-    all_projects = DjangoFilterConnectionField(ProjectNode)
+    all_projects = OptimizedConnectionField(ProjectNode)
 
     issue = Node.Field(IssueNode)
-    all_issues = DjangoFilterConnectionField(IssueNode)
+    all_issues = OptimizedConnectionField(IssueNode)
 
     issue_attachment = Node.Field(IssueAttachmentNode)
-    all_issue_attachments = DjangoFilterConnectionField(IssueAttachmentNode)
+    all_issue_attachments = OptimizedConnectionField(IssueAttachmentNode)
+
+    search_issues = graphene.List(
+        graphene.NonNull(IssueNode),
+        text=graphene.String(required=True),
+        first=graphene.Int(default_value=SEARCH_RESULTS),
+        description="Issues of the user's projects ordered by relevance.",
+    )
+
+    def resolve_search_issues(root, info, text, first):
+        user = info.context.user
+        if not user.is_authenticated:
+            return []
+        first = max(0, min(first, MAX_SEARCH_RESULTS))
+        queryset = search.search_issues(
+            Issue.objects.filter(
+                project_id__in=ProjectAccess.objects.project_ids(user)
+            ),
+            text,
+        )
+        optimizer = QueryOptimizer(info.fragments)
+        queryset = optimizer.optimize(queryset, IssueNode, info.field_asts)
+        return queryset.order_by(search.RANK_FIELD, "pk")[:first]
 
 
 class DeleteObjectInput(graphene.InputObjectType):
@@ -115,7 +203,8 @@ class UpdateProjectMutation(CreateProjectMutation):
     def mutate(cls, root, info, project_data=None, **kwargs):
         project = get_object_or_404(Project, pk=project_data.pk)
 
-        serializer = ProjectSerializer(project, data=project_data)
+        # only the given fields are validated and written
+        serializer = ProjectSerializer(project, data=project_data, partial=True)
         serializer.is_valid(raise_exception=True)
         obj = serializer.save()
 
@@ -177,13 +266,9 @@ class UpdateIssueMutation(CreateIssueMutation):
     @classmethod
     def mutate(cls, root, info, issue_data=None, **kwargs):
         issue = get_object_or_404(Issue, pk=issue_data.pk)
-        # Serializer always requires `required` fields,
-        # so if these are not given in request,
-        # we can still get them from instance.
-        instance_dict = model_to_dict(issue)
-        instance_dict.update(issue_data)
 
-        serializer = IssueSerializer(issue, data=instance_dict)
+        # only the given fields are validated and written
+        serializer = IssueSerializer(issue, data=issue_data, partial=True)
         serializer.is_valid(raise_exception=True)
         obj = serializer.save()
 
@@ -199,6 +284,54 @@ class UpdateIssueMutation(CreateIssueMutation):
         )
 
 
+class CreateIssuesMutation(graphene.Mutation):
+    """
+    Creates many issues at once, e.g. when a sprint is imported.
+    """
+
+    class Arguments:
+        issues_data = graphene.List(graphene.NonNull(CreateIssueInput), required=True)
+
+    issues = graphene.List(IssueNode)
+
+    @classmethod
+    def mutate(cls, root, info, issues_data=None, **kwargs):
+        serializer = IssueBulkSerializer(data=issues_data, many=True)
+        serializer.is_valid(raise_exception=True)
+        return cls(issues=serializer.save(owner=info.context.user))
+
+
+class UpdateIssuesMutation(CreateIssuesMutation):
+    """
+    Updates given fields of many issues at once.
+    """
+
+    class Arguments:
+        issues_data = graphene.List(graphene.NonNull(UpdateIssueInput), required=True)
+
+    @classmethod
+    def mutate(cls, root, info, issues_data=None, **kwargs):
+        try:
+            pks = [int(issue_data.pk) for issue_data in issues_data]
+        except ValueError:
+            raise Http404("No Issue matches the given query.")
+        if len(set(pks)) != len(pks):
+            raise GraphQLError("Every issue can be updated only once.")
+        issues = Issue.objects.in_bulk(pks)
+        if len(issues) != len(pks):
+            raise Http404("No Issue matches the given query.")
+
+        data = [
+            {name: value for name, value in issue_data.items() if name != "pk"}
+            for issue_data in issues_data
+        ]
+        serializer = IssueBulkSerializer(
+            [issues[pk] for pk in pks], data=data, many=True, partial=True
+        )
+        serializer.is_valid(raise_exception=True)
+        return cls(issues=serializer.save())
+
+
 class UploadAttachmentInput(graphene.InputObjectType):
     issue = graphene.ID(required=True)
 
@@ -220,6 +353,16 @@ class CreateIssueAttachmentMutation(graphene.Mutation):
             for attachment in files.values()
         ]
         created = IssueAttachment.objects.bulk_create(attachments)
+        # bulk_create does not send signals
+        ProjectVersion.objects.filter(project=issue.project_id).bump()
+        bump_table_versions(IssueAttachment)
+        events.publish(
+            issue.project_id,
+            events.ATTACHMENT,
+            events.CREATED,
+            # keys are not returned by every database backend
+            [attachment.pk for attachment in created if attachment.pk is not None],
+        )
         return cls(attachment=created)
 
 
@@ -266,7 +409,94 @@ class Mutation(graphene.ObjectType):
 
     create_issue = CreateIssueMutation.Field()
     update_issue = UpdateIssueMutation.Field()
+    create_issues = CreateIssuesMutation.Field()
+    update_issues = UpdateIssuesMutation.Field()
     delete_issue = DeleteIssueMutation.Field()
 
     upload_attachment = CreateIssueAttachmentMutation.Field()
     delete_attachment = DeleteAttachmentMutation.Field()
+
+
+class IssueEventAction(graphene.Enum):
+    CREATED = events.CREATED
+    UPDATED = events.UPDATED
+    DELETED = events.DELETED
+
+
+class IssuesChangedEvent(graphene.ObjectType):
+    action = graphene.Field(IssueEventAction)
+    pks = graphene.List(graphene.Int)
+    # deleted issues are not returned
+    issues = graphene.List(IssueNode)
+
+
+class AttachmentsAddedEvent(graphene.ObjectType):
+    pks = graphene.List(graphene.Int)
+    attachments = graphene.List(IssueAttachmentNode)
+
+
+def subscribe_project(root, info, project, model: str):
+    """
+    Returns the stream of events of the model in a project
+    accessible for the user, whose group is joined by the connection.
+    """
+    user = info.context.user
+    try:
+        project_id = int(project)
+    except ValueError:
+        raise GraphQLError("Invalid project.")
+
+    def has_access() -> bool:
+        return (
+            user is not None
+            and user.is_authenticated
+            and ProjectAccess.objects.filter(user=user, project_id=project_id).exists()
+        )
+
+    if not has_access():
+        raise GraphQLError("Project does not exist.")
+    info.context.join_group(events.project_group(project_id))
+    # access may be revoked while subscribed
+    return root.filter(
+        lambda event: event["project"] == project_id
+        and event["model"] == model
+        and has_access()
+    )
+
+
+class Subscription(graphene.ObjectType):
+    """
+    Changes of projects, served over WebSocket (see stx_training_program.consumers).
+    """
+
+    issues_changed = graphene.Field(
+        IssuesChangedEvent, project=graphene.ID(required=True)
+    )
+    attachments_added = graphene.Field(
+        AttachmentsAddedEvent, project=graphene.ID(required=True)
+    )
+
+    def resolve_issues_changed(root, info, project):
+        def load(event):
+            issues = []
+            if event["action"] != events.DELETED:
+                issues = (
+                    Issue.objects.filter(pk__in=event["pks"])
+                    .select_related("owner", "assigne", "project")
+                    .order_by("pk")
+                )
+            return IssuesChangedEvent(
+                action=event["action"], pks=event["pks"], issues=issues
+            )
+
+        return subscribe_project(root, info, project, events.ISSUE).map(load)
+
+    def resolve_attachments_added(root, info, project):
+        def load(event):
+            attachments = IssueAttachment.objects.filter(pk__in=event["pks"])
+            return AttachmentsAddedEvent(
+                pks=event["pks"],
+                attachments=attachments.select_related("issue").order_by("pk"),
+            )
+
+        return subscribe_project(root, info, project, events.ATTACHMENT).map(load)
@@ -0,0 +1,242 @@
+"""
+Full-text search of issues.
+
+Titles and descriptions are kept in an inverted index, which is updated
+in the transaction of every change of an issue (see the receivers and
+IssueQuerySet in `models`). The index is an FTS5 table on SQLite
+and a `tsvector` table with a GIN index on PostgreSQL, other engines fall
+back to `icontains` lookups. Index tables are created after `migrate`,
+`rebuild_search_index` fills them with existing issues.
+
+Searched querysets are annotated with `search_rank`, lower is better.
+"""
+import re
+from typing import Iterable, List
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+
+INDEX_TABLE = "api_projects_issuesearch"
+RANK_FIELD = "search_rank"
+# terms of longer queries are ignored
+MAX_TERMS = 10
+
+
+def get_terms(text: str) -> List[str]:
+    """
+    Returns searched words, every one is matched as a prefix.
+    """
+    return re.findall(r"\w+", text.lower())[:MAX_TERMS]
+
+
+class FallbackBackend:
+    """
+    Scans the issue table, for engines without a full-text index.
+    """
+
+    def create_index(self, cursor) -> None:
+        pass
+
+    def clear_index(self, cursor) -> None:
+        pass
+
+    def index(self, cursor, rows) -> None:
+        pass
+
+    def remove(self, cursor, pks) -> None:
+        pass
+
+    def search(self, queryset, terms: List[str]):
+        for term in terms:
+            queryset = queryset.filter(
+                Q(title__icontains=term) | Q(description__icontains=term)
+            )
+        return queryset.annotate(**{RANK_FIELD: Value(0.0, output_field=FloatField())})
+
+
+class SQLiteBackend:
+    """
+    FTS5 table whose rowids are the issue keys, ranked by BM25.
+    """
+
+    # relative weights of the indexed columns
+    rank_function = f"bm25({INDEX_TABLE}, 2.0, 1.0)"
+
+    def create_index(self, cursor) -> None:
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {INDEX_TABLE} "
+            f"USING fts5(title, description)"
+        )
+
+    def clear_index(self, cursor) -> None:
+        cursor.execute(f"DELETE FROM {INDEX_TABLE}")
+
+    def index(self, cursor, rows) -> None:
+        self.remove(cursor, [pk for pk, title, description in rows])
+        cursor.executemany(
+            f"INSERT INTO {INDEX_TABLE} (rowid, title, description) "
+            f"VALUES (%s, %s, %s)",
+            rows,
+        )
+
+    def remove(self, cursor, pks) -> None:
+        if pks:
+            placeholders = ", ".join(["%s"] * len(pks))
+            cursor.execute(
+                f"DELETE FROM {INDEX_TABLE} WHERE rowid IN ({placeholders})", pks
+            )
+
+    def search(self, queryset, terms: List[str]):
+        match = " ".join(f'"{term}"*' for term in terms)
+        pk_column = f'"{queryset.model._meta.db_table}"."id"'
+        return queryset.filter(
+            pk__in=RawSQL(
+                f"SELECT rowid FROM {INDEX_TABLE} WHERE {INDEX_TABLE} MATCH %s",
+                [match],
+            )
+        ).annotate(
+            **{
+                RANK_FIELD: RawSQL(
+                    f"SELECT {self.rank_function} FROM {INDEX_TABLE} "
+                    f"WHERE {INDEX_TABLE} MATCH %s AND rowid = {pk_column}",
+                    [match],
+                    output_field=FloatField(),
+                )
+            }
+        )
+
+
+class PostgreSQLBackend:
+    """
+    `tsvector` documents with a GIN index, titles weigh more
+    than descriptions. Rows of deleted issues are removed by the database.
+    """
+
+    config = "simple"
+    document = (
+        "setweight(to_tsvector('{config}', %s), 'A') || "
+        "setweight(to_tsvector('{config}', %s), 'B')"
+    )
+
+    def create_index(self, cursor) -> None:
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {INDEX_TABLE} ("
+            f"issue_id integer PRIMARY KEY REFERENCES api_projects_issue (id) "
+            f"ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+            f"document tsvector NOT NULL)"
+        )
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS {INDEX_TABLE}_document "
+            f"ON {INDEX_TABLE} USING GIN (document)"
+        )
+
+    def clear_index(self, cursor) -> None:
+        cursor.execute(f"TRUNCATE {INDEX_TABLE}")
+
+    def index(self, cursor, rows) -> None:
+        document = self.document.format(config=self.config)
+        cursor.executemany(
+            f"INSERT INTO {INDEX_TABLE} (issue_id, document) "
+            f"VALUES (%s, {document}) "
+            f"ON CONFLICT (issue_id) DO UPDATE SET document = EXCLUDED.document",
+            rows,
+        )
+
+    def remove(self, cursor, pks) -> None:
+        if pks:
+            cursor.execute(
+                f"DELETE FROM {INDEX_TABLE} WHERE issue_id = ANY(%s)", [list(pks)]
+            )
+
+    def search(self, queryset, terms: List[str]):
+        query = " & ".join(f"{term}:*" for term in terms)
+        tsquery = f"to_tsquery('{self.config}', %s)"
+        pk_column = f'"{queryset.model._meta.db_table}"."id"'
+        return queryset.filter(
+            pk__in=RawSQL(
+                f"SELECT issue_id FROM {INDEX_TABLE} WHERE document @@ {tsquery}",
+                [query],
+            )
+        ).annotate(
+            **{
+                RANK_FIELD: RawSQL(
+                    f"SELECT -ts_rank(document, {tsquery}) FROM {INDEX_TABLE} "
+                    f"WHERE issue_id = {pk_column}",
+                    [query],
+                    output_field=FloatField(),
+                )
+            }
+        )
+
+
+BACKENDS = {
+    "sqlite": SQLiteBackend,
+    "postgresql": PostgreSQLBackend,
+}
+
+
+def get_backend(using=None):
+    connection = connections[using or DEFAULT_DB_ALIAS]
+    return BACKENDS.get(connection.vendor, FallbackBackend)()
+
+
+def create_index(using=None, **kwargs) -> None:
+    """
+    Creates the index table, connected to `post_migrate`.
+    """
+    using = using or DEFAULT_DB_ALIAS
+    with connections[using].cursor() as cursor:
+        get_backend(using).create_index(cursor)
+
+
+def index_issues(issues: Iterable, using=None) -> None:
+    """
+    Adds or replaces index entries of the issues.
+    """
+    rows = [(issue.pk, issue.title, issue.description) for issue in issues]
+    if rows:
+        with connections[using or DEFAULT_DB_ALIAS].cursor() as cursor:
+            get_backend(using).index(cursor, rows)
+
+
+def remove_issues(pks: Iterable[int], using=None) -> None:
+    pks = list(pks)
+    if pks:
+        with connections[using or DEFAULT_DB_ALIAS].cursor() as cursor:
+            get_backend(using).remove(cursor, pks)
+
+
+def rebuild_index(queryset, chunk_size: int = 1000) -> int:
+    """
+    Replaces the index with entries of all issues of the queryset.
+    """
+    backend = get_backend(queryset.db)
+    count = 0
+    connection = connections[queryset.db]
+    with transaction.atomic(using=queryset.db), connection.cursor() as cursor:
+        backend.create_index(cursor)
+        backend.clear_index(cursor)
+        rows = queryset.values_list("pk", "title", "description")
+        chunk = []
+        for row in rows.iterator(chunk_size=chunk_size):
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                backend.index(cursor, chunk)
+                count += len(chunk)
+                chunk = []
+        backend.index(cursor, chunk)
+        count += len(chunk)
+    return count
+
+
+def search_issues(queryset, text: str):
+    """
+    Filters the queryset by the text and annotates relevance as `search_rank`.
+    Texts without words match nothing.
+    """
+    terms = get_terms(text)
+    if not terms:
+        return queryset.none()
+    return get_backend(queryset.db).search(queryset, terms)
@@ -1,14 +1,153 @@
+from collections.abc import Mapping
+
+from django.db.models import Prefetch
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.serializers import raise_errors_on_nested_writes
+from rest_framework.utils import model_meta
 from rest_framework.validators import UniqueTogetherValidator
 
 from api_accounts.models import User
 from api_projects.models import Project, Issue, IssueAttachment
 
 
-class IssueSerializer(serializers.ModelSerializer):
+class EagerLoadingMixin:
+    """
+    Builds a queryset which loads everything needed by the serializer
+    in a constant number of queries, regardless of the number of rows.
+
+    Only readable fields of the serializer instance are taken into account,
+    nested serializers are prefetched recursively, ordered by pk.
+    """
+
+    # field name -> relations which should be joined with `select_related`
+    select_related_fields = {}
+    # field name -> lookups (or Prefetch objects) passed to `prefetch_related`
+    prefetch_related_fields = {}
+
+    def setup_eager_loading(self, queryset):
+        for name, field in self.fields.items():
+            if field.write_only:
+                continue
+            if name in self.select_related_fields:
+                queryset = queryset.select_related(*self.select_related_fields[name])
+            if name in self.prefetch_related_fields:
+                queryset = queryset.prefetch_related(
+                    *self.prefetch_related_fields[name]
+                )
+
+            nested = getattr(field, "child", field)
+            if isinstance(nested, EagerLoadingMixin):
+                related_model = queryset.model._meta.get_field(
+                    field.source
+                ).related_model
+                nested_queryset = nested.setup_eager_loading(
+                    related_model.objects.order_by("pk")
+                )
+                queryset = queryset.prefetch_related(
+                    Prefetch(field.source, queryset=nested_queryset)
+                )
+        return queryset
+
+
+class DynamicFieldsMixin:
+    """
+    Allows clients to choose serialized fields, e.g. `?fields=id,name`.
+
+    Fields listed in `expandable_fields` (nested or otherwise expensive)
+    are skipped whenever the client narrows the response,
+    unless requested explicitly, e.g. `?fields=id,name&expand=issues`.
+    Without any of these query parameters all fields are serialized.
+    Fields are removed before the queryset is built, so unrequested
+    relations are not loaded at all.
+    """
+
+    fields_query_param = "fields"
+    expand_query_param = "expand"
+    expandable_fields = ()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get("request")
+        if request is None or request.method not in SAFE_METHODS:
+            return
+
+        params = request.query_params
+        requested = self._split_param(params.get(self.fields_query_param))
+        expanded = self._split_param(params.get(self.expand_query_param))
+        if not requested and not expanded:
+            return
+
+        if requested:
+            allowed = requested | expanded
+        else:
+            allowed = {
+                name for name in self.fields if name not in self.expandable_fields
+            }
+            allowed |= expanded
+
+        for name in list(self.fields):
+            if name not in allowed:
+                self.fields.pop(name)
+
+    @staticmethod
+    def _split_param(value) -> set:
+        if not value:
+            return set()
+        return {name.strip() for name in value.split(",") if name.strip()}
+
+
+class PartialUpdateMixin:
+    """
+    Writes only the supplied fields of partial updates (e.g. PATCH),
+    with `save(update_fields=...)`, so unchanged columns are neither
+    rewritten nor compared by change tracking. Full updates are unchanged.
+    """
+
+    def update(self, instance, validated_data):
+        if not self.partial:
+            return super().update(instance, validated_data)
+
+        raise_errors_on_nested_writes("update", self, validated_data)
+        info = model_meta.get_field_info(instance)
+        update_fields, m2m_fields = [], []
+        for attr, value in validated_data.items():
+            if attr in info.relations and info.relations[attr].to_many:
+                m2m_fields.append((attr, value))
+            else:
+                setattr(instance, attr, value)
+                update_fields.append(attr)
+
+        if update_fields:
+            update_fields += [
+                field.name
+                for field in instance._meta.concrete_fields
+                if getattr(field, "auto_now", False)
+            ]
+            instance.save(update_fields=update_fields)
+        for attr, value in m2m_fields:
+            getattr(instance, attr).set(value)
+        return instance
+
+
+class IssueSerializer(
+    DynamicFieldsMixin,
+    EagerLoadingMixin,
+    PartialUpdateMixin,
+    serializers.ModelSerializer,
+):
     class Meta:
         model = Issue
-        fields = "__all__"
+        # the deadline watermark is internal
+        exclude = ["deadline_notified_date"]
+
+    expandable_fields = ("attachments",)
+    select_related_fields = {"owner": ["owner"], "assigne": ["assigne"]}
+    prefetch_related_fields = {
+        "attachments": [
+            Prefetch("files", queryset=IssueAttachment.objects.order_by("pk"))
+        ]
+    }
 
     owner = serializers.ReadOnlyField(source="owner.email")
     assigne = serializers.ReadOnlyField(source="assigne.email")
@@ -28,19 +167,38 @@ class IssueSerializer(serializers.ModelSerializer):
         )
 
 
-class ProjectSerializer(serializers.ModelSerializer):
+class ProjectSerializer(
+    DynamicFieldsMixin,
+    EagerLoadingMixin,
+    PartialUpdateMixin,
+    serializers.ModelSerializer,
+):
     class Meta:
         model = Project
         fields = "__all__"
         extra_kwargs = {"members": {"write_only": True}}
 
-    owner = serializers.ReadOnlyField(source="owner.pk")
+    expandable_fields = ("issues", "members_emails")
+    prefetch_related_fields = {
+        "members_emails": [
+            Prefetch(
+                "members", queryset=User.objects.only("id", "email").order_by("pk")
+            )
+        ]
+    }
+
+    owner = serializers.ReadOnlyField(source="owner_id")
     issues = IssueSerializer(many=True, required=False, read_only=True)
     members_emails = serializers.SerializerMethodField()
 
     def get_members_emails(self, project):
         # possibility to extend returned values
-        return project.members.values("id", "email")
+        # Note: iterating over `members.all()` uses prefetched objects,
+        # `values()` would always hit the database.
+        return [
+            {"id": member.pk, "email": member.email}
+            for member in project.members.all()
+        ]
 
 
 class IssueAttachmentSerializer(serializers.ModelSerializer):
@@ -48,3 +206,79 @@ class IssueAttachmentSerializer(serializers.ModelSerializer):
         model = IssueAttachment
         fields = "__all__"
         extra_kwargs = {"due_date": {"required": False}}
+
+
+class PrefetchedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    Looks up objects loaded for a whole batch by `prefetch`,
+    values which were not loaded are validated as usual.
+    """
+
+    instances = None
+
+    def prefetch(self, values) -> None:
+        pks = {str(value) for value in values if str(value).isdigit()}
+        self.instances = {
+            str(pk): instance
+            for pk, instance in self.get_queryset().in_bulk(pks).items()
+        }
+
+    def to_internal_value(self, data):
+        if self.instances is not None and str(data) in self.instances:
+            return self.instances[str(data)]
+        return super().to_internal_value(data)
+
+
+class IssueBulkListSerializer(serializers.ListSerializer):
+    """
+    Validates related objects of all items with one query per relation
+    and writes the issues with `bulk_create`/`bulk_update`.
+    """
+
+    def to_internal_value(self, data):
+        fields = [
+            field
+            for field in self.child.fields.values()
+            if isinstance(field, PrefetchedPrimaryKeyRelatedField)
+        ]
+        if isinstance(data, list):
+            for field in fields:
+                field.prefetch(
+                    item[field.field_name]
+                    for item in data
+                    if isinstance(item, Mapping) and field.field_name in item
+                )
+        try:
+            return super().to_internal_value(data)
+        finally:
+            for field in fields:
+                field.instances = None
+
+    def create(self, validated_data):
+        return Issue.objects.bulk_create(Issue(**attrs) for attrs in validated_data)
+
+    def update(self, instances, validated_data):
+        fields = set()
+        for issue, attrs in zip(instances, validated_data):
+            for name, value in attrs.items():
+                setattr(issue, name, value)
+            fields.update(attrs)
+        if fields:
+            Issue.objects.bulk_update(instances, fields)
+        return instances
+
+
+class IssueBulkSerializer(serializers.ModelSerializer):
+    """
+    Writable issue fields of the bulk GraphQL mutations, used with `many=True`.
+    """
+
+    class Meta:
+        model = Issue
+        fields = ["title", "description", "due_date", "status", "assigne", "project"]
+        list_serializer_class = IssueBulkListSerializer
+
+    assigne = PrefetchedPrimaryKeyRelatedField(
+        queryset=User.objects.all(), allow_null=True, required=False
+    )
+    project = PrefetchedPrimaryKeyRelatedField(queryset=Project.objects.all())
@@ -0,0 +1,63 @@
+from itertools import islice
+
+from django.db.models import prefetch_related_objects
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class StreamingListMixin:
+    """
+    Opt-in streaming for the list action, e.g. `?stream=true`.
+
+    Rows are read from the database in chunks, serialized one by one
+    and written to a StreamingHttpResponse as a JSON array,
+    so memory usage does not depend on the number of returned rows.
+    Pagination is skipped in this mode.
+    """
+
+    stream_query_param = "stream"
+    stream_chunk_size = 500
+
+    def list(self, request, *args, **kwargs):
+        if not self.should_stream(request):
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        serializer = self.get_serializer()
+        return StreamingHttpResponse(
+            stream_json_array(
+                serializer.to_representation(instance)
+                for instance in iterate_in_chunks(queryset, self.stream_chunk_size)
+            ),
+            content_type="application/json",
+        )
+
+    def should_stream(self, request) -> bool:
+        value = request.query_params.get(self.stream_query_param, "")
+        return value.lower() in ("1", "true", "yes")
+
+
+def iterate_in_chunks(queryset, chunk_size: int):
+    """
+    Iterates over the queryset with a server-side cursor.
+    `iterator()` ignores prefetched relations,
+    so these are loaded separately for every chunk.
+    """
+    lookups = queryset._prefetch_related_lookups
+    iterator = queryset.prefetch_related(None).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        prefetch_related_objects(chunk, *lookups)
+        yield from chunk
+
+
+def stream_json_array(items):
+    encoder = JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+    yield "["
+    for index, item in enumerate(items):
+        if index:
+            yield ","
+        yield encoder.encode(item)
+    yield "]"
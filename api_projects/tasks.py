@@ -1,24 +1,141 @@
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import List, Tuple
+
 from celery import shared_task
 
 from django.apps import apps
-from django.core.mail import send_mail
+from django.core.mail import EmailMessage
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from stx_training_program import mail
+
+
+logger = logging.getLogger(__name__)
+
+# notifications which failed this many times are kept, but not sent again
+MAX_NOTIFICATION_ATTEMPTS = 5
+# seconds a worker has to send the notifications it claimed
+NOTIFICATION_CLAIM_TIMEOUT = 10 * 60
+# seconds before the first retry of a failed digest, doubled by every attempt
+NOTIFICATION_RETRY_DELAY = 60
+
+
+def get_digests(notifications) -> List[Tuple[EmailMessage, list]]:
+    """
+    Returns messages of the notifications, one per recipient,
+    with the notifications they contain.
+    """
+    by_email = defaultdict(list)
+    for notification in notifications:
+        by_email[notification.email].append(notification)
+
+    digests = []
+    for email, group in by_email.items():
+        if len(group) == 1:
+            subject, message = group[0].subject, group[0].message
+        else:
+            subject = f"{len(group)} issue notifications"
+            message = "\n\n".join(f"{n.subject}\n{n.message}" for n in group)
+        digests.append((EmailMessage(subject, message, None, [email]), group))
+    return digests
+
+
+def claim_notifications(batch_size: int, now: datetime) -> list:
+    """
+    Returns pending notifications, claimed for `NOTIFICATION_CLAIM_TIMEOUT`
+    so other workers skip them. Rows are locked only while they are claimed,
+    notifications of a worker which died are sent once the claim expires.
+    """
+    # to prevent circular imports
+    from api_projects.models import Notification
+
+    with transaction.atomic():
+        notifications = list(
+            Notification.objects.filter(
+                Q(claimed_until__isnull=True) | Q(claimed_until__lte=now),
+                attempts__lt=MAX_NOTIFICATION_ATTEMPTS,
+            )
+            .select_for_update(skip_locked=True)
+            .order_by("pk")[:batch_size]
+        )
+        Notification.objects.filter(
+            pk__in=[notification.pk for notification in notifications]
+        ).update(claimed_until=now + timedelta(seconds=NOTIFICATION_CLAIM_TIMEOUT))
+    return notifications
 
 
 @shared_task
-def send_issue_notification(email: str, subject: str, message: str) -> None:
-    send_mail(subject, message, None, recipient_list=[
-              email], fail_silently=False)
+def send_notification_digests(batch_size: int = 1000) -> int:
+    """
+    Drains the notification outbox (scheduled by Celery beat), returns
+    the number of notifications sent. Every digest is sent on its own over
+    the pooled connection of the worker and its notifications are deleted
+    once it is sent. Failed digests are retried with exponential backoff
+    up to `MAX_NOTIFICATION_ATTEMPTS` times, others are sent meanwhile.
+    """
+    # to prevent circular imports
+    from api_projects.models import Notification
+
+    sent = 0
+    while True:
+        now = timezone.now()
+        notifications = claim_notifications(batch_size, now)
+        if not notifications:
+            return sent
+        for message, group in get_digests(notifications):
+            pks = [notification.pk for notification in group]
+            try:
+                mail.send_messages([message])
+            except Exception:
+                logger.exception("Sending notifications %s failed", pks)
+                attempts = max(notification.attempts for notification in group)
+                delay = NOTIFICATION_RETRY_DELAY * 2**attempts
+                Notification.objects.filter(pk__in=pks).update(
+                    attempts=F("attempts") + 1,
+                    claimed_until=now + timedelta(seconds=delay),
+                )
+                continue
+            Notification.objects.filter(pk__in=pks).delete()
+            sent += len(pks)
 
 
 @shared_task
-def notify_issue_deadline(pk: int, email: str, subject: str, message: str) -> None:
+def sweep_issue_deadlines(batch_size: int = 500) -> int:
+    """
+    Notifies assignees of overdue issues (scheduled by Celery beat).
+    `Issue.deadline_notified_date` is the watermark of notified deadlines,
+    every deadline is notified once however often the sweep runs.
+    """
     # to prevent circular imports
-    from api_projects.models import Issue
+    from api_projects.models import Issue, Notification
 
-    if issue := Issue.objects.filter(pk=pk).exclude(assigne=None, status=Issue.Status.DONE).first():
-        send_issue_notification(
-            email,
-            "Issue deadline",
-            f"The {issue.title} is not finished after deadline!",
-        )
-        issue.issue_task.delete()
+    now = timezone.now()
+    notified = 0
+    while True:
+        with transaction.atomic():
+            issues = list(
+                Issue.objects.overdue(now)
+                .select_for_update(skip_locked=True, of=("self",))
+                .select_related("assigne")
+                .only("pk", "title", "assigne__email")
+                .order_by("due_date", "pk")[:batch_size]
+            )
+            if not issues:
+                return notified
+            # sent with the next digests
+            Notification.objects.bulk_create(
+                Notification(
+                    email=issue.assigne.email,
+                    subject="Issue deadline",
+                    message=f"The {issue.title} is not finished after deadline!",
+                )
+                for issue in issues
+            )
+            Issue.objects.filter(
+                pk__in=[issue.pk for issue in issues]
+            ).set_deadline_notified(now)
+        notified += len(issues)
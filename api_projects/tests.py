@@ -1,23 +1,95 @@
+import asyncio
+import hashlib
+import io
+import json
+import smtplib
+import tempfile
+import time
+from base64 import urlsafe_b64encode
 from typing import Dict
-from datetime import datetime
+from datetime import datetime, timedelta
+from unittest import mock
+from urllib.parse import quote
 
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
 from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from graphql import parse as graphql_parse, validate as graphql_validate
+from graphql_relay import to_global_id
 from rest_framework.test import APITestCase
 from rest_framework.reverse import reverse_lazy, reverse
 from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken
 
-from api_projects.models import Project, Issue
+from api_projects import events, search
+from api_projects.caching import get_response_cache
+from api_projects.models import (
+    Project,
+    Issue,
+    IssueAttachment,
+    Notification,
+    ProjectAccess,
+)
+from api_projects.tasks import (
+    MAX_NOTIFICATION_ATTEMPTS,
+    send_notification_digests,
+    sweep_issue_deadlines,
+)
+from api_projects.views import ProjectViewSet, IssueViewSet
+from stx_training_program import mail as pooled_mail
+from stx_training_program.results import get_results_cache
+from stx_training_program.views import document_backend
 
 
 User = get_user_model()
 
 
+def create_active_user(email: str, password: str = "password000") -> User:
+    user = User.objects.create_user(email, password)
+    user.is_active = True
+    user.save()
+    return user
+
+
+class IssueAPITestCase(APITestCase):
+    """
+    Owner of a project with an issue, the client authenticated with the
+    owner's access token.
+    """
+
+    def setUp(self):
+        self.owner = create_active_user("owner@example.com")
+        self.project = Project.objects.create(name="Project", owner=self.owner)
+        self.issue = Issue.objects.create(
+            title="Issue",
+            owner=self.owner,
+            project=self.project,
+            due_date=datetime(2030, 10, 10, hour=12),
+        )
+        self._authenticate(self.owner)
+
+    def _authenticate(self, user: User) -> None:
+        access_token = AccessToken.for_user(user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access_token}")
+
+
 class ProjectsTest(APITestCase):
 
     OBTAIN_TOKEN_URL = reverse_lazy("api_accounts:token_obtain_pair")
 
     PROJECT_LIST = "api_projects:project-list"
     PROJECT_DETAILS = "api_projects:project-detail"
+    ISSUE_LIST = "api_projects:issue-list"
 
     def _init_db(self) -> None:
         # NOTE: It's better option to create some test fixtures in future
@@ -62,6 +134,7 @@ class ProjectsTest(APITestCase):
 
     def setUp(self):
         self._init_db()
+        get_response_cache().clear()
 
     def _login_user(self, user: Dict[str, str]) -> None:
         response = self.client.post(self.OBTAIN_TOKEN_URL, user, format="json")
@@ -80,7 +153,7 @@ class ProjectsTest(APITestCase):
         expected_count = Project.objects.filter(owner__email=user["email"]).count()
 
         response = self.client.get(url)
-        self.assertEqual(len(response.data), expected_count)
+        self.assertEqual(len(response.data["results"]), expected_count)
 
         # logged in as member
         user = self.members[0]
@@ -88,7 +161,7 @@ class ProjectsTest(APITestCase):
         expected_count = Project.objects.filter(members__email=user["email"]).count()
 
         response = self.client.get(url)
-        self.assertEqual(len(response.data), expected_count)
+        self.assertEqual(len(response.data["results"]), expected_count)
 
         # logged in as user without projects
         self._login_user(self.no_project_users[0])
@@ -96,7 +169,7 @@ class ProjectsTest(APITestCase):
         response = self.client.get(url)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), expected_count)
+        self.assertEqual(len(response.data["results"]), expected_count)
 
     def test_get_project_details(self):
         user_1 = self.owners[0]
@@ -169,3 +242,1770 @@ class ProjectsTest(APITestCase):
 
         self.assertEqual(projects_count_delete, projects_init_count - 1)
         self.assertEqual(response_ok.status_code, status.HTTP_204_NO_CONTENT)
+
+    def _count_list_queries(self, url: str) -> int:
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(context.captured_queries)
+
+    def _add_projects(self, owner: User, count: int) -> None:
+        example_date = datetime(2030, 10, 10, hour=12, minute=30)
+        members = list(User.objects.exclude(pk=owner.pk))
+        for i in range(count):
+            project = Project.objects.create(name=f"Extra project {i}", owner=owner)
+            project.members.add(*members)
+            for j in range(3):
+                Issue.objects.create(
+                    title=f"Extra issue {i}-{j}",
+                    owner=owner,
+                    project=project,
+                    due_date=example_date,
+                )
+
+    def test_list_queries_count_is_constant(self):
+        user = self.owners[0]
+        owner = User.objects.get(email=user["email"])
+        self._login_user(user)
+
+        for url_name in (self.PROJECT_LIST, self.ISSUE_LIST):
+            url = reverse(url_name)
+            initial_count = self._count_list_queries(url)
+            self._add_projects(owner, 5)
+            self.assertEqual(self._count_list_queries(url), initial_count)
+
+    def test_get_projects_sparse_fields(self):
+        self._login_user(self.owners[0])
+        url = reverse(self.PROJECT_LIST)
+        full_queries = self._count_list_queries(url)
+        self.assertLess(self._count_list_queries(f"{url}?fields=id,name"), full_queries)
+
+        response = self.client.get(url, {"fields": "id,name"})
+        for project in response.data["results"]:
+            self.assertEqual(set(project), {"id", "name"})
+
+        response = self.client.get(url, {"fields": "id", "expand": "issues"})
+        for project in response.data["results"]:
+            self.assertEqual(set(project), {"id", "issues"})
+
+        # nested and expensive fields are skipped unless expanded
+        response = self.client.get(url, {"expand": "members_emails"})
+        project = response.data["results"][0]
+        self.assertIn("members_emails", project)
+        self.assertIn("name", project)
+        self.assertNotIn("issues", project)
+
+    def test_stream_lists(self):
+        user = self.owners[0]
+        owner = User.objects.get(email=user["email"])
+        self._add_projects(owner, 3)
+        self._login_user(user)
+
+        for url_name in (self.PROJECT_LIST, self.ISSUE_LIST):
+            url = reverse(url_name)
+            expected = self.client.get(url, {"page_size": 100}).json()["results"]
+
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(url, {"stream": "true"})
+                content = b"".join(response.streaming_content)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(json.loads(content), expected)
+
+            # chunks are prefetched in bulk as well
+            streamed_queries = len(context.captured_queries)
+            self._add_projects(owner, 3)
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(url, {"stream": "true"})
+                b"".join(response.streaming_content)
+            self.assertEqual(len(context.captured_queries), streamed_queries)
+
+    @override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+    def test_compiled_lists_are_identical(self):
+        user = self.owners[0]
+        owner = User.objects.get(email=user["email"])
+        self._add_projects(owner, 2)
+        issue = Issue.objects.first()
+        issue.assigne = owner
+        issue.save()
+        for name in ("a.txt", "b.txt"):
+            IssueAttachment.objects.create(
+                issue=issue, file_attachment=SimpleUploadedFile(name, b"content")
+            )
+        self._login_user(user)
+
+        params = [
+            {},
+            {"fields": "id,name,owner"},
+            {"expand": "issues"},
+            {"fields": "id,title,assigne", "expand": "attachments"},
+            {"stream": "true"},
+        ]
+        for url_name, viewset in (
+            (self.PROJECT_LIST, ProjectViewSet),
+            (self.ISSUE_LIST, IssueViewSet),
+        ):
+            url = reverse(url_name)
+            for query in params:
+                compiled = self.client.get(url, query)
+                get_response_cache().clear()
+                with mock.patch.object(viewset, "compiled_serializer_class", None):
+                    stock = self.client.get(url, query)
+                if query.get("stream"):
+                    compiled = b"".join(compiled.streaming_content)
+                    stock = b"".join(stock.streaming_content)
+                else:
+                    compiled, stock = compiled.content, stock.content
+                self.assertEqual(compiled, stock)
+
+
+class IssueChangeTrackingTest(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user("owner@example.com", "password000")
+        self.assignees = [
+            User.objects.create_user(f"assignee{i}@example.com", "password111")
+            for i in range(2)
+        ]
+        self.project = Project.objects.create(name="Project", owner=self.owner)
+        self.due_date = datetime(2030, 10, 10, hour=12, minute=30)
+
+    def _create_issues(self, count: int) -> None:
+        for i in range(count):
+            Issue.objects.create(
+                title=f"Issue {i}",
+                owner=self.owner,
+                assigne=self.assignees[0],
+                project=self.project,
+                due_date=self.due_date,
+            )
+
+    def test_loading_issues_does_not_query_related(self):
+        # instantiation cost must not depend on the number of loaded rows
+        for count in (5, 50):
+            self._create_issues(count)
+            with self.assertNumQueries(1):
+                list(Issue.objects.all())
+            with self.assertNumQueries(1):
+                list(Issue.objects.only("title"))
+
+    def _get_recipients(self) -> list:
+        return sorted(Notification.objects.values_list("email", flat=True))
+
+    def test_save_notifies_changed_assignee(self):
+        self._create_issues(1)
+        Notification.objects.all().delete()
+        issue = Issue.objects.only("pk", "title").get()
+        issue.save(update_fields=["title"])
+        self.assertFalse(Notification.objects.exists())
+
+        issue = Issue.objects.get()
+        issue.assigne = self.assignees[1]
+        issue.save()
+        self.assertEqual(
+            self._get_recipients(), [self.assignees[0].email, self.assignees[1].email]
+        )
+
+        # the change is already saved, nothing to notify about
+        Notification.objects.all().delete()
+        issue.save()
+        self.assertFalse(Notification.objects.exists())
+
+    def test_bulk_operations_notify_changed_assignee(self):
+        self._create_issues(3)
+        Notification.objects.all().delete()
+        with CaptureQueriesContext(connection) as context:
+            Issue.objects.filter(title="Issue 0").update(assigne=self.assignees[1])
+        # the new and the former assignee, written with one query
+        self.assertEqual(len(self._get_recipients()), 2)
+        inserts = [
+            query
+            for query in context.captured_queries
+            if query["sql"].startswith('INSERT INTO "api_projects_notification"')
+        ]
+        self.assertEqual(len(inserts), 1)
+
+        Notification.objects.all().delete()
+        issues = list(Issue.objects.exclude(title="Issue 0"))
+        for issue in issues:
+            issue.assigne = None
+        Issue.objects.bulk_update(issues, ["assigne"])
+        self.assertEqual(self._get_recipients(), [self.assignees[0].email] * 2)
+
+        Notification.objects.all().delete()
+        Issue.objects.update(title="New title")
+        self.assertFalse(Notification.objects.exists())
+
+    def test_untracked_update_reads_only_keys(self):
+        self._create_issues(3)
+        with CaptureQueriesContext(connection) as context, mock.patch.object(
+            Issue, "_snapshot_tracked_fields"
+        ) as snapshot:
+            self.assertEqual(Issue.objects.update(status=Issue.Status.DONE), 3)
+        # no instances are built
+        snapshot.assert_not_called()
+        selects = [
+            query["sql"]
+            for query in context.captured_queries
+            if query["sql"].startswith("SELECT")
+        ]
+        self.assertEqual(
+            selects,
+            [
+                'SELECT "api_projects_issue"."id", "api_projects_issue"."project_id" '
+                'FROM "api_projects_issue"'
+            ],
+        )
+
+
+class DeadlineSweepTest(TestCase):
+    def setUp(self):
+        owner = User.objects.create_user("owner@example.com", "password000")
+        self.assignee = User.objects.create_user("assignee@example.com", "password1")
+        project = Project.objects.create(name="Project", owner=owner)
+        past = timezone.now() - timedelta(hours=1)
+        future = timezone.now() + timedelta(days=1)
+        self.issues = {}
+        for title, assigne, due_date, issue_status in (
+            ("Overdue", self.assignee, past, Issue.Status.TODO),
+            ("Done", self.assignee, past, Issue.Status.DONE),
+            ("Unassigned", None, past, Issue.Status.TODO),
+            ("Future", self.assignee, future, Issue.Status.TODO),
+        ):
+            self.issues[title] = Issue.objects.create(
+                title=title,
+                owner=owner,
+                assigne=assigne,
+                project=project,
+                due_date=due_date,
+                status=issue_status,
+            )
+        Notification.objects.all().delete()
+
+    def _get_notified(self) -> list:
+        return list(Notification.objects.values_list("message", flat=True))
+
+    def test_sweep_notifies_once(self):
+        self.assertEqual(sweep_issue_deadlines(), 1)
+        self.assertEqual(
+            self._get_notified(), ["The Overdue is not finished after deadline!"]
+        )
+        self.assertEqual(sweep_issue_deadlines(), 0)
+        self.assertEqual(len(self._get_notified()), 1)
+
+    def test_past_deadlines_marked_notified(self):
+        call_command("mark_past_deadlines_notified", stdout=io.StringIO())
+
+        self.assertEqual(sweep_issue_deadlines(), 0)
+        self.assertIsNone(
+            Issue.objects.get(pk=self.issues["Future"].pk).deadline_notified_date
+        )
+
+    def test_changed_deadline_is_swept_again(self):
+        sweep_issue_deadlines(batch_size=1)
+        Notification.objects.all().delete()
+
+        issue = self.issues["Overdue"]
+        issue.due_date = timezone.now() - timedelta(minutes=1)
+        issue.save(update_fields=["due_date"])
+        Issue.objects.filter(title="Future").update(
+            due_date=timezone.now() - timedelta(minutes=1)
+        )
+        self.assertEqual(sweep_issue_deadlines(batch_size=1), 2)
+        self.assertEqual(len(self._get_notified()), 2)
+
+        # the watermark is kept while the deadline does not change
+        issue.refresh_from_db()
+        issue.title = "Renamed"
+        issue.save()
+        self.assertEqual(sweep_issue_deadlines(), 0)
+
+
+class CommitBatchTest(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user("owner@example.com", "password000")
+        self.assignees = [
+            User.objects.create_user(f"assignee{i}@example.com", "password111")
+            for i in range(3)
+        ]
+        self.project = Project.objects.create(name="Project", owner=self.owner)
+        self._run_commit_callbacks()
+
+    def _run_commit_callbacks(self) -> None:
+        # the transaction of the test never commits
+        callbacks, connection.run_on_commit = connection.run_on_commit, []
+        for _, callback in callbacks:
+            callback()
+
+    def _get_notifications(self) -> list:
+        return sorted(Notification.objects.values_list("email", "subject"))
+
+    def test_issue_changes_are_merged(self):
+        layer = get_channel_layer()
+        with mock.patch.object(layer, "group_send", mock.AsyncMock()) as send:
+            issue = Issue.objects.create(
+                title="Issue",
+                owner=self.owner,
+                assigne=self.assignees[0],
+                project=self.project,
+                due_date=datetime(2030, 10, 10, hour=12),
+            )
+            Notification.objects.all().delete()
+            for assignee in self.assignees[1:]:
+                issue.assigne = assignee
+                issue.save()
+            Issue.objects.filter(pk=issue.pk).update(title="Renamed")
+            send.assert_not_called()
+            self._run_commit_callbacks()
+
+        # the new issue was only created
+        send.assert_called_once()
+        message = send.call_args.args[1]
+        self.assertEqual((message["action"], message["pks"]), ("created", [issue.pk]))
+        # the middle assignee is not notified at all
+        self.assertEqual(
+            self._get_notifications(),
+            [
+                ("assignee0@example.com", "Assigment is removed"),
+                ("assignee2@example.com", "New assignment"),
+            ],
+        )
+
+    def test_reverted_assignment(self):
+        issue = Issue.objects.create(
+            title="Issue",
+            owner=self.owner,
+            assigne=self.assignees[0],
+            project=self.project,
+            due_date=datetime(2030, 10, 10, hour=12),
+        )
+        self._run_commit_callbacks()
+        issue.assigne = self.assignees[1]
+        issue.save()
+        issue.assigne = self.assignees[0]
+        issue.save()
+        self.assertEqual(self._get_notifications(), [])
+
+    def test_rolled_back_savepoint(self):
+        layer = get_channel_layer()
+        issue = Issue.objects.create(
+            title="Issue",
+            owner=self.owner,
+            project=self.project,
+            due_date=datetime(2030, 10, 10, hour=12),
+        )
+        self._run_commit_callbacks()
+        with mock.patch.object(layer, "group_send", mock.AsyncMock()) as send:
+            issue.assigne = self.assignees[0]
+            issue.save()
+            try:
+                with transaction.atomic():
+                    issue.assigne = self.assignees[1]
+                    issue.save()
+                    Issue.objects.create(
+                        title="Other",
+                        owner=self.owner,
+                        project=self.project,
+                        due_date=datetime(2030, 10, 10, hour=12),
+                    )
+                    raise ValueError
+            except ValueError:
+                pass
+            issue.assigne = self.assignees[2]
+            issue.save()
+            self._run_commit_callbacks()
+
+        # the issue created in the savepoint is not published
+        send.assert_called_once()
+        message = send.call_args.args[1]
+        self.assertEqual((message["action"], message["pks"]), ("updated", [issue.pk]))
+        self.assertEqual(
+            self._get_notifications(), [("assignee2@example.com", "New assignment")]
+        )
+
+    def test_released_savepoint(self):
+        layer = get_channel_layer()
+        with mock.patch.object(layer, "group_send", mock.AsyncMock()) as send:
+            issue = Issue.objects.create(
+                title="Issue",
+                owner=self.owner,
+                project=self.project,
+                due_date=datetime(2030, 10, 10, hour=12),
+            )
+            with transaction.atomic():
+                issue.assigne = self.assignees[0]
+                issue.save()
+            issue.assigne = self.assignees[1]
+            issue.save()
+            self._run_commit_callbacks()
+
+        send.assert_called_once()
+        self.assertEqual(
+            self._get_notifications(), [("assignee1@example.com", "New assignment")]
+        )
+
+    def test_equal_pending_notifications_are_kept(self):
+        issue = Issue.objects.create(
+            title="Issue",
+            owner=self.owner,
+            project=self.project,
+            due_date=datetime(2030, 10, 10, hour=12),
+        )
+        self._run_commit_callbacks()
+        issue.assigne = self.assignees[0]
+        issue.save()
+        # e.g. written by another transaction
+        other = Notification.objects.create(
+            email="assignee0@example.com",
+            subject="New assignment",
+            message="You are assigned to the task Issue",
+        )
+        issue.assigne = None
+        issue.save()
+        self.assertEqual(
+            list(Notification.objects.values_list("pk", flat=True)), [other.pk]
+        )
+
+
+class NotificationDigestTest(TestCase):
+    def setUp(self):
+        pooled_mail.pool.close()
+
+    def _enqueue(self, email: str, count: int) -> None:
+        Notification.objects.bulk_create(
+            Notification(email=email, subject=f"Subject {i}", message=f"Message {i}")
+            for i in range(count)
+        )
+
+    def test_digests_per_recipient(self):
+        self._enqueue("first@example.com", 3)
+        self._enqueue("second@example.com", 1)
+        # the second batch is sent over the connection of the first one
+        with mock.patch(
+            "django.core.mail.backends.locmem.EmailBackend.open"
+        ) as open_mock:
+            sent = send_notification_digests(batch_size=3)
+
+        self.assertEqual(sent, 4)
+        open_mock.assert_called_once()
+        self.assertFalse(Notification.objects.exists())
+        messages = sorted(mail.outbox, key=lambda message: message.subject)
+        self.assertEqual(
+            [(message.to, message.subject) for message in messages],
+            [
+                (["first@example.com"], "3 issue notifications"),
+                (["second@example.com"], "Subject 0"),
+            ],
+        )
+        self.assertEqual(
+            messages[0].body.split("\n\n"),
+            [f"Subject {i}\nMessage {i}" for i in range(3)],
+        )
+
+    def test_failed_digest_is_retried(self):
+        self._enqueue("first@example.com", 2)
+        self._enqueue("second@example.com", 1)
+        send_messages = mail.get_connection().send_messages
+
+        def refuse_first(messages):
+            if messages[0].to == ["first@example.com"]:
+                raise ConnectionError
+            return send_messages(messages)
+
+        with mock.patch(
+            "django.core.mail.backends.locmem.EmailBackend.send_messages",
+            side_effect=refuse_first,
+        ), self.assertLogs("api_projects.tasks", "ERROR"):
+            self.assertEqual(send_notification_digests(), 1)
+            # the failed digest waits for its retry
+            self.assertEqual(send_notification_digests(), 0)
+
+        self.assertEqual(
+            [message.to for message in mail.outbox], [["second@example.com"]]
+        )
+        failed = Notification.objects.all()
+        self.assertEqual([notification.attempts for notification in failed], [1, 1])
+        self.assertTrue(all(n.claimed_until > timezone.now() for n in failed))
+
+        failed.update(claimed_until=timezone.now())
+        self.assertEqual(send_notification_digests(), 2)
+        self.assertFalse(Notification.objects.exists())
+
+    def test_failing_notifications_are_given_up(self):
+        self._enqueue("first@example.com", 1)
+        Notification.objects.update(attempts=MAX_NOTIFICATION_ATTEMPTS)
+        self._enqueue("second@example.com", 1)
+
+        self.assertEqual(send_notification_digests(), 1)
+        self.assertEqual(
+            [message.to for message in mail.outbox], [["second@example.com"]]
+        )
+        self.assertEqual(Notification.objects.get().email, "first@example.com")
+
+    def test_claimed_notifications_are_skipped(self):
+        self._enqueue("first@example.com", 1)
+        Notification.objects.update(claimed_until=timezone.now() + timedelta(minutes=1))
+
+        self.assertEqual(send_notification_digests(), 0)
+        self.assertEqual(mail.outbox, [])
+
+    def test_failed_reused_connection_is_replaced(self):
+        message = mail.EmailMessage("Subject", "Message", None, ["a@example.com"])
+        pooled_mail.send_messages([message])
+        with mock.patch(
+            "django.core.mail.backends.locmem.EmailBackend.send_messages",
+            side_effect=[ConnectionError, 1],
+        ), mock.patch(
+            "django.core.mail.backends.locmem.EmailBackend.open"
+        ) as open_mock:
+            self.assertEqual(pooled_mail.send_messages([message]), 1)
+        open_mock.assert_called_once()
+
+        # a failure of a new connection is raised
+        with mock.patch(
+            "django.core.mail.backends.locmem.EmailBackend.send_messages",
+            side_effect=ConnectionError,
+        ):
+            with self.assertRaises(ConnectionError):
+                pooled_mail.send_messages([message])
+
+        # a permanent failure of a reused connection is not sent again
+        pooled_mail.send_messages([message])
+        refused = smtplib.SMTPRecipientsRefused({"a@example.com": (550, b"")})
+        with mock.patch(
+            "django.core.mail.backends.locmem.EmailBackend.send_messages",
+            side_effect=refused,
+        ) as send_mock:
+            with self.assertRaises(smtplib.SMTPRecipientsRefused):
+                pooled_mail.send_messages([message])
+        send_mock.assert_called_once()
+
+
+@mock.patch("django.db.transaction.on_commit", lambda func, using=None: func())
+class IssueBulkMutationTest(TestCase):
+    CREATE = """
+    mutation($issues: [CreateIssueInput!]!) {
+      createIssues(issuesData: $issues) { issues { pk title assigne { email } } }
+    }
+    """
+    UPDATE = """
+    mutation($issues: [UpdateIssueInput!]!) {
+      updateIssues(issuesData: $issues) { issues { pk status assigne { email } } }
+    }
+    """
+
+    def setUp(self):
+        self.owner = create_active_user("owner@example.com")
+        self.assignee = User.objects.create_user("assignee@example.com", "password111")
+        self.project = Project.objects.create(name="Project", owner=self.owner)
+        self.client.force_login(self.owner)
+
+    def _execute(self, query: str, issues: list):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(
+                "/graphql/",
+                {"query": query, "variables": {"issues": issues}},
+                content_type="application/json",
+            )
+        return response.json(), context.captured_queries
+
+    def _issue_data(self, i: int) -> dict:
+        return {
+            "title": f"Issue {i}",
+            "dueDate": "2030-10-10T12:00:00",
+            "project": str(self.project.pk),
+            "assigne": str(self.assignee.pk) if i % 2 else None,
+        }
+
+    def test_create_issues(self):
+        query_counts = []
+        for count in (4, 40):
+            Notification.objects.all().delete()
+            data, queries = self._execute(
+                self.CREATE, [self._issue_data(i) for i in range(count)]
+            )
+            self.assertNotIn("errors", data)
+            issues = data["data"]["createIssues"]["issues"]
+            self.assertEqual(len(issues), count)
+            self.assertEqual(
+                [issue["pk"] for issue in issues],
+                list(
+                    Issue.objects.filter(title__in=[issue["title"] for issue in issues])
+                    .order_by("-pk")
+                    .values_list("pk", flat=True)[:count]
+                )[::-1],
+            )
+            query_counts.append(len(queries))
+
+            # notifications of all assigned issues
+            self.assertEqual(
+                list(Notification.objects.values_list("email", flat=True)),
+                [self.assignee.email] * (count // 2),
+            )
+        self.assertEqual(query_counts[0], query_counts[1])
+        self.assertEqual(Issue.objects.count(), 44)
+
+    def test_create_issues_without_returned_keys(self):
+        # e.g. MySQL, keys of concurrently inserted rows cannot be guessed
+        with mock.patch.object(connection, "vendor", "mysql"):
+            data, _ = self._execute(
+                self.CREATE, [self._issue_data(i) for i in range(4)]
+            )
+        self.assertNotIn("errors", data)
+        issues = data["data"]["createIssues"]["issues"]
+        self.assertEqual(
+            [issue["pk"] for issue in issues],
+            list(Issue.objects.order_by("pk").values_list("pk", flat=True)),
+        )
+        self.assertEqual(Notification.objects.count(), 2)
+
+    def test_create_issues_is_validated(self):
+        issues = [self._issue_data(0), {**self._issue_data(1), "project": "999"}]
+        data, _ = self._execute(self.CREATE, issues)
+        self.assertIn("object does not exist", data["errors"][0]["message"])
+        self.assertFalse(Issue.objects.exists())
+
+    def test_update_issues(self):
+        issues = [
+            Issue.objects.create(
+                title=f"Issue {i}",
+                owner=self.owner,
+                project=self.project,
+                due_date=datetime(2030, 10, 10, hour=12),
+                deadline_notified_date=timezone.now(),
+            )
+            for i in range(3)
+        ]
+        data, _ = self._execute(
+            self.UPDATE,
+            [
+                {
+                    "pk": str(issue.pk),
+                    "status": "done",
+                    "assigne": str(self.assignee.pk),
+                    "dueDate": "2031-10-10T12:00:00",
+                }
+                for issue in issues
+            ],
+        )
+        self.assertNotIn("errors", data)
+        self.assertEqual(
+            Issue.objects.filter(
+                status=Issue.Status.DONE, assigne=self.assignee, due_date__year=2031
+            ).count(),
+            3,
+        )
+        # titles are kept
+        self.assertEqual(Issue.objects.filter(title__startswith="Issue").count(), 3)
+        self.assertEqual(Notification.objects.count(), 3)
+        # new deadlines are swept again
+        self.assertFalse(Issue.objects.exclude(deadline_notified_date=None).exists())
+
+        data, _ = self._execute(self.UPDATE, [{"pk": "999", "status": "done"}])
+        self.assertEqual(
+            data["errors"][0]["message"], "No Issue matches the given query."
+        )
+
+
+class PartialUpdateTest(IssueAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.member = User.objects.create_user("member@example.com", "password111")
+
+    def _get_issue_updates(self, queries) -> list:
+        return [
+            query["sql"]
+            for query in queries
+            if query["sql"].startswith('UPDATE "api_projects_issue"')
+        ]
+
+    def _assert_status_is_updated(self, queries) -> None:
+        # only the given column is written
+        (sql,) = self._get_issue_updates(queries)
+        self.assertIn('"status"', sql)
+        self.assertNotIn('"title"', sql)
+        self.assertNotIn('"due_date"', sql)
+        self.issue.refresh_from_db()
+        self.assertEqual(self.issue.status, Issue.Status.DONE)
+        self.assertEqual(self.issue.title, "Issue")
+
+    def test_patch_issue(self):
+        url = reverse("api_projects:issue-detail", kwargs={"pk": self.issue.pk})
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.patch(url, {"status": "done"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self._assert_status_is_updated(context.captured_queries)
+
+    def test_update_mutations(self):
+        self.client.force_login(self.owner)
+        query = """
+        mutation($pk: ID!) {
+          updateIssue(issueData: {pk: $pk, status: "done"}) { status }
+        }
+        """
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(
+                "/graphql/",
+                {"query": query, "variables": {"pk": self.issue.pk}},
+                format="json",
+            )
+        self.assertNotIn("errors", response.json())
+        self._assert_status_is_updated(context.captured_queries)
+
+        query = """
+        mutation($pk: ID!, $members: [ID]) {
+          updateProject(projectData: {pk: $pk, members: $members}) { name }
+        }
+        """
+        variables = {"pk": self.project.pk, "members": [self.member.pk]}
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(
+                "/graphql/",
+                {"query": query, "variables": variables},
+                format="json",
+            )
+        self.assertEqual(response.json()["data"]["updateProject"]["name"], "Project")
+        self.assertEqual(list(self.project.members.all()), [self.member])
+        # the project row itself is not written
+        self.assertFalse(
+            any(
+                query["sql"].startswith('UPDATE "api_projects_project"')
+                for query in context.captured_queries
+            )
+        )
+
+
+class IssuePaginationTest(IssueAPITestCase):
+
+    ISSUE_LIST = reverse_lazy("api_projects:issue-list")
+
+    def setUp(self):
+        self.owner = create_active_user("owner@example.com")
+        project = Project.objects.create(name="Project", owner=self.owner)
+        for i in range(7):
+            Issue.objects.create(
+                title=f"Issue {i}",
+                owner=self.owner,
+                project=project,
+                # a few issues share the same deadline
+                due_date=datetime(2030, 10, 10 - i // 3, hour=12),
+            )
+        self._authenticate(self.owner)
+
+    def _get_all_pages(self, url: str, link: str = "next") -> list:
+        results = []
+        while url is not None:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            results.extend(issue["id"] for issue in response.data["results"])
+            url = response.data[link]
+        return results
+
+    def test_paginate_issues(self):
+        for ordering in ("created_date", "-created_date", "due_date", "-due_date"):
+            pk_ordering = "-pk" if ordering.startswith("-") else "pk"
+            expected = list(
+                Issue.objects.order_by(ordering, pk_ordering).values_list(
+                    "pk", flat=True
+                )
+            )
+            url = f"{self.ISSUE_LIST}?ordering={ordering}&page_size=2"
+            self.assertEqual(self._get_all_pages(url), expected)
+
+    def test_paginate_issues_backwards(self):
+        url = f"{self.ISSUE_LIST}?page_size=3"
+        last_page_url = self.client.get(url).data["next"]
+        last_page_url = self.client.get(last_page_url).data["next"]
+        response = self.client.get(last_page_url)
+        previous = self._get_all_pages(response.data["previous"], link="previous")
+
+        self.assertIsNone(response.data["next"])
+        self.assertEqual(len(previous), 6)
+        self.assertEqual(
+            sorted(previous + [issue["id"] for issue in response.data["results"]]),
+            list(Issue.objects.order_by("pk").values_list("pk", flat=True)),
+        )
+
+    def test_invalid_parameters(self):
+        response = self.client.get(f"{self.ISSUE_LIST}?cursor=invalid")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        for position in ["abc", None, [1]]:
+            cursor = urlsafe_b64encode(json.dumps([position, 1, False]).encode())
+            for query in ["", "&search=issue&ordering=search_rank"]:
+                response = self.client.get(
+                    f"{self.ISSUE_LIST}?cursor={cursor.decode()}{query}"
+                )
+                self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        response = self.client.get(f"{self.ISSUE_LIST}?ordering=title")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class IssueSearchTest(APITestCase):
+
+    ISSUE_LIST = reverse_lazy("api_projects:issue-list")
+
+    def setUp(self):
+        self.owner = create_active_user("owner@example.com")
+        other = User.objects.create_user("other@example.com", "password111")
+        project = Project.objects.create(name="Project", owner=self.owner)
+        foreign_project = Project.objects.create(name="Foreign", owner=other)
+        self.issues = {}
+        for title, description, issue_project in (
+            ("Login fails", "Users cannot log in with email", project),
+            ("Update docs", "Describe the login flow", project),
+            ("Export CSV", "Add export of issues", project),
+            ("Login page", "Foreign issue", foreign_project),
+        ):
+            self.issues[title] = Issue.objects.create(
+                title=title,
+                description=description,
+                owner=issue_project.owner,
+                project=issue_project,
+                due_date=datetime(2030, 10, 10, hour=12),
+            )
+        self.client.force_authenticate(self.owner)
+
+    def _search(self, text: str, **params):
+        response = self.client.get(self.ISSUE_LIST, {"search": text, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [issue["title"] for issue in response.data["results"]]
+
+    def test_ranked_and_scoped(self):
+        # title matches rank above description matches, prefixes match
+        titles = self._search("logi", ordering="search_rank")
+        self.assertEqual(titles, ["Login fails", "Update docs"])
+        self.assertEqual(self._search("login email"), ["Login fails"])
+        self.assertEqual(self._search("nothing"), [])
+        self.assertEqual(self._search("*"), [])
+
+        titles = self._search("login", ordering="-created_date")
+        self.assertEqual(titles, ["Update docs", "Login fails"])
+        titles = self._search("login", ordering="-search_rank")
+        self.assertEqual(titles, ["Update docs", "Login fails"])
+        # the rank is available only with a search
+        response = self.client.get(self.ISSUE_LIST, {"ordering": "search_rank"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        first_page = self.client.get(
+            self.ISSUE_LIST, {"search": "login", "page_size": 1}
+        ).data
+        second_page = self.client.get(first_page["next"]).data
+        self.assertEqual(
+            [first_page["results"][0]["title"], second_page["results"][0]["title"]],
+            ["Login fails", "Update docs"],
+        )
+
+    def test_index_follows_changes(self):
+        issue = self.issues["Export CSV"]
+        issue.title = "Import CSV"
+        issue.save()
+        self.assertEqual(self._search("import"), ["Import CSV"])
+        self.assertEqual(self._search("export"), ["Import CSV"])
+
+        Issue.objects.filter(pk=issue.pk).update(description="Parse files")
+        self.assertEqual(self._search("export"), [])
+        self.assertEqual(self._search("parse"), ["Import CSV"])
+
+        # saves of other fields do not rewrite the index entry
+        issue.status = Issue.Status.DONE
+        with mock.patch("api_projects.search.index_issues") as index_mock:
+            issue.save(update_fields=["status"])
+            issue.save(update_fields=["status", "title"])
+        self.assertEqual(index_mock.call_count, 1)
+
+        issue.delete()
+        self.assertEqual(self._search("import"), [])
+
+        self.assertEqual(search.rebuild_index(Issue.objects.all()), 3)
+        self.assertEqual(self._search("logi"), ["Login fails", "Update docs"])
+
+    def test_graphql(self):
+        query = """
+        query($text: String!) {
+          searchIssues(text: $text, first: 5) { title project { name } }
+        }
+        """
+        # the GraphQL view authenticates with the session
+        self.client.force_login(self.owner)
+        response = self.client.post(
+            "/graphql/",
+            {"query": query, "variables": {"text": "login"}},
+            format="json",
+        )
+        self.assertEqual(
+            response.json()["data"]["searchIssues"],
+            [
+                {"title": "Login fails", "project": {"name": "Project"}},
+                {"title": "Update docs", "project": {"name": "Project"}},
+            ],
+        )
+
+
+class ProjectAccessTest(TestCase):
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(f"user{i}@example.com", "password000")
+            for i in range(3)
+        ]
+        self.project = Project.objects.create(name="Project", owner=self.users[0])
+
+    def _access(self) -> Dict[int, str]:
+        return dict(
+            ProjectAccess.objects.filter(project=self.project).values_list(
+                "user_id", "role"
+            )
+        )
+
+    def test_access_follows_owner_and_members(self):
+        owner, member, other = self.users
+        self.assertEqual(self._access(), {owner.pk: ProjectAccess.Role.OWNER})
+
+        self.project.members.add(owner, member)
+        other.projects.add(self.project)
+        self.assertEqual(
+            self._access(),
+            {
+                owner.pk: ProjectAccess.Role.OWNER,
+                member.pk: ProjectAccess.Role.MEMBER,
+                other.pk: ProjectAccess.Role.MEMBER,
+            },
+        )
+
+        # former owner is still a member
+        self.project.owner = member
+        self.project.save()
+        self.assertEqual(
+            self._access(),
+            {
+                owner.pk: ProjectAccess.Role.MEMBER,
+                member.pk: ProjectAccess.Role.OWNER,
+                other.pk: ProjectAccess.Role.MEMBER,
+            },
+        )
+
+        self.project.members.remove(member, owner)
+        other.projects.clear()
+        self.assertEqual(self._access(), {member.pk: ProjectAccess.Role.OWNER})
+
+    def test_rebuild(self):
+        owner, member, _ = self.users
+        self.project.members.add(member)
+        expected = self._access()
+
+        ProjectAccess.objects.all().delete()
+        ProjectAccess.rebuild()
+        self.assertEqual(self._access(), expected)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class PermissionQueriesTest(IssueAPITestCase):
+    # authentication, user's project roles, conditional request state,
+    # the object and its relations or version bump
+    MAX_QUERIES = 6
+
+    def _add_projects(self, count: int) -> None:
+        members = [
+            User.objects.create_user(f"member{i}@example.com", "password111")
+            for i in range(count)
+        ]
+        self.project.members.add(*members)
+        for i in range(count):
+            project = Project.objects.create(name=f"Project {i}", owner=self.owner)
+            project.members.add(*members)
+
+    def _count_queries(self, method: str, url: str, expected_status: int) -> int:
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(self.client, method)(url)
+        self.assertEqual(response.status_code, expected_status)
+        self.assertLessEqual(len(context.captured_queries), self.MAX_QUERIES)
+        return len(context.captured_queries)
+
+    def _create_attachment(self) -> IssueAttachment:
+        return IssueAttachment.objects.create(
+            issue=self.issue,
+            file_attachment=SimpleUploadedFile("file.txt", b"content"),
+        )
+
+    def test_detail_queries_count_is_bounded(self):
+        urls = [
+            reverse("api_projects:project-detail", kwargs={"pk": self.project.pk}),
+            reverse("api_projects:issue-detail", kwargs={"pk": self.issue.pk}),
+        ]
+        initial_counts = [
+            self._count_queries("get", url, status.HTTP_200_OK) for url in urls
+        ]
+        self._add_projects(10)
+        counts = [self._count_queries("get", url, status.HTTP_200_OK) for url in urls]
+        self.assertEqual(counts, initial_counts)
+
+    def test_attachment_delete_queries_count_is_bounded(self):
+        url_name = "api_projects:issue_attachment_delete"
+        attachment = self._create_attachment()
+        url = reverse(url_name, kwargs={"pk": attachment.pk})
+        initial_count = self._count_queries("delete", url, status.HTTP_204_NO_CONTENT)
+
+        self._add_projects(10)
+        attachment = self._create_attachment()
+        url = reverse(url_name, kwargs={"pk": attachment.pk})
+        count = self._count_queries("delete", url, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(count, initial_count)
+
+
+class ConditionalRequestTest(IssueAPITestCase):
+
+    def _assert_not_modified_until_change(self, url: str, change) -> None:
+        response = self.client.get(url)
+        etag = response["ETag"]
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        change()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_project_conditional_get(self):
+        member = User.objects.create_user("member@example.com", "password111")
+        url = reverse("api_projects:project-detail", kwargs={"pk": self.project.pk})
+        self._assert_not_modified_until_change(
+            url, lambda: self.project.members.add(member)
+        )
+
+        url = reverse("api_projects:project-list")
+        self._assert_not_modified_until_change(
+            url, lambda: Issue.objects.update(title="Changed")
+        )
+
+    def test_list_last_modified(self):
+        url = reverse("api_projects:project-detail", kwargs={"pk": self.project.pk})
+        self.assertIn("Last-Modified", self.client.get(url))
+
+        # the latest modification of listed projects may move backwards
+        # when one is deleted, lists are versioned by the ETag only
+        url = reverse("api_projects:project-list")
+        response = self.client.get(url)
+        self.assertNotIn("Last-Modified", response)
+        Project.objects.create(name="Other", owner=self.owner).delete()
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60)
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_issue_conditional_get(self):
+        def add_attachment():
+            with override_settings(MEDIA_ROOT=tempfile.mkdtemp()):
+                IssueAttachment.objects.create(
+                    issue=self.issue,
+                    file_attachment=SimpleUploadedFile("file.txt", b"content"),
+                )
+
+        url = reverse("api_projects:issue-detail", kwargs={"pk": self.issue.pk})
+        self._assert_not_modified_until_change(url, add_attachment)
+
+        url = reverse("api_projects:issue-list")
+        self._assert_not_modified_until_change(
+            url, lambda: self.project.issues.first().save()
+        )
+
+    def test_graphql_node_conditional_get(self):
+        self.client.force_login(self.owner)
+        query = '{ project(id: "%s") { name } }' % to_global_id(
+            "ProjectNode", self.project.pk
+        )
+        url = f"/graphql/?query={quote(query)}"
+
+        def rename_project():
+            self.project.name = "New name"
+            self.project.save()
+
+        self._assert_not_modified_until_change(url, rename_project)
+        response = self.client.get(url)
+        self.assertEqual(response.json()["data"]["project"]["name"], "New name")
+
+    def test_graphql_node_outside_project(self):
+        self.client.force_login(self.owner)
+        global_id = to_global_id("ProjectNode", self.project.pk)
+        query = (
+            '{ project(id: "%s") { owner { email } '
+            "issues { edges { node { title assigne { email } } } } } }" % global_id
+        )
+        response = self.client.get(f"/graphql/?query={quote(query)}")
+        self.assertIn("ETag", response)
+
+        # other projects of the owner are not versioned with this one
+        query = (
+            '{ project(id: "%s") { owner { ownProjects { edges { node { name } } } } } }'
+            % global_id
+        )
+        response = self.client.get(f"/graphql/?query={quote(query)}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("ETag", response)
+
+
+class ResponseCacheTest(IssueAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        get_response_cache().clear()
+        self.member = User.objects.create_user("member@example.com", "password111")
+
+    def _get(self, url: str):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json(), len(context.captured_queries)
+
+    def _assert_cached_until_change(self, url: str, change) -> None:
+        get_response_cache().clear()
+        data, queries = self._get(url)
+        cached_data, cached_queries = self._get(url)
+        self.assertEqual(cached_data, data)
+        # authentication and the versions of visible projects
+        self.assertEqual(cached_queries, 2)
+        self.assertLess(cached_queries, queries)
+
+        change()
+        changed_data, changed_queries = self._get(url)
+        self.assertNotEqual(changed_data, data)
+        self.assertGreater(changed_queries, cached_queries)
+
+    def test_project_responses(self):
+        url = reverse("api_projects:project-detail", kwargs={"pk": self.project.pk})
+        self._assert_cached_until_change(
+            url, lambda: self.project.members.add(self.member)
+        )
+
+        def change_member_email():
+            self.member.email = "new-member@example.com"
+            self.member.save()
+
+        url = reverse("api_projects:project-list") + "?expand=members_emails"
+        self._assert_cached_until_change(url, change_member_email)
+
+    def test_issue_responses(self):
+        def delete_issue():
+            self.issue.delete()
+
+        url = reverse("api_projects:issue-list")
+        self._assert_cached_until_change(
+            url, lambda: Issue.objects.update(title="Changed")
+        )
+        self._assert_cached_until_change(url, delete_issue)
+
+    def test_scope_is_per_user(self):
+        url = reverse("api_projects:project-detail", kwargs={"pk": self.project.pk})
+        self._get(url)
+
+        self.client.force_authenticate(self.member)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        self.project.members.add(self.member)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.project.members.remove(self.member)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class GraphQLQueriesTest(TestCase):
+
+    QUERY = """
+    {
+      allProjects(first: 10) {
+        edges { node {
+          name
+          owner { email }
+          members(first: 10) { edges { node { email } } }
+          issues(first: 10) { edges { node {
+            title
+            owner { email }
+            assigne { email }
+            project { name }
+            files(first: 10) { edges { node { filename issue { title } } } }
+          } } }
+        } }
+      }
+    }
+    """
+
+    def setUp(self):
+        self.owner = User.objects.create_user("owner@example.com", "password000")
+        self.member = User.objects.create_user("member@example.com", "password111")
+
+    @override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+    def _add_projects(self, count: int) -> None:
+        for i in range(count):
+            project = Project.objects.create(name=f"Project {i}", owner=self.owner)
+            project.members.add(self.member)
+            for j in range(2):
+                issue = Issue.objects.create(
+                    title=f"Issue {i}-{j}",
+                    owner=self.owner,
+                    assigne=self.member if j else None,
+                    project=project,
+                    due_date=datetime(2030, 10, 10, hour=12),
+                )
+                IssueAttachment.objects.create(
+                    issue=issue,
+                    file_attachment=SimpleUploadedFile("file.txt", b"content"),
+                )
+
+    def _execute(self, query: str) -> list:
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(
+                "/graphql/", {"query": query}, content_type="application/json"
+            )
+        self.assertNotIn("errors", response.json())
+        return context.captured_queries
+
+    def _count_queries(self) -> int:
+        return len(self._execute(self.QUERY))
+
+    def test_nested_relations_are_batched(self):
+        self._add_projects(2)
+        initial_count = self._count_queries()
+        self._add_projects(5)
+        self.assertEqual(self._count_queries(), initial_count)
+
+    def test_user_relations_are_batched(self):
+        query = """
+        {
+          allUsers(first: 20) {
+            edges { node {
+              ownProjects(first: 10) { edges { node { name } } }
+              projects(first: 10) { edges { node { name } } }
+              createdIssues(first: 10) { edges { node { title } } }
+              ownIssues(first: 10) { edges { node { title } } }
+            } }
+          }
+        }
+        """
+
+        def add_users(start: int, count: int) -> None:
+            for i in range(start, start + count):
+                user = User.objects.create_user(f"user{i}@example.com", "password")
+                project = Project.objects.create(name=f"Project {i}", owner=user)
+                project.members.add(self.member)
+                Issue.objects.create(
+                    title=f"Issue {i}",
+                    owner=user,
+                    assigne=self.member,
+                    project=project,
+                    due_date=datetime(2030, 10, 10, hour=12),
+                )
+
+        add_users(0, 2)
+        initial_count = len(self._execute(query))
+        add_users(2, 5)
+        self.assertEqual(len(self._execute(query)), initial_count)
+
+    def test_filtered_relation(self):
+        project = Project.objects.create(name="Project", owner=self.owner)
+        for title in ("First", "Second"):
+            Issue.objects.create(
+                title=title,
+                owner=self.owner,
+                project=project,
+                due_date=datetime(2030, 10, 10, hour=12),
+            )
+        query = (
+            "{ allProjects { edges { node { "
+            'issues(title: "Second") { edges { node { title } } } '
+            "} } } }"
+        )
+        response = self.client.post(
+            "/graphql/", {"query": query}, content_type="application/json"
+        )
+        issues = response.json()["data"]["allProjects"]["edges"][0]["node"]["issues"]
+        self.assertEqual(issues["edges"], [{"node": {"title": "Second"}}])
+
+    def test_connection_loads_selected_fields(self):
+        self._add_projects(2)
+        queries = self._execute(
+            "{ allIssues { edges { node { title assigne { email } } } } }"
+        )
+        # count of the connection and the issues joined with assignees
+        self.assertEqual(len(queries), 2)
+        sql = queries[1]["sql"]
+        self.assertIn("JOIN", sql)
+        self.assertIn('"accounts_user"."email"', sql)
+        self.assertNotIn('"api_projects_issue"."description"', sql)
+        self.assertNotIn('"accounts_user"."password"', sql)
+
+        queries = self._execute(
+            "{ allProjects { edges { node { name issues(first: 10) { edges { node { "
+            "...issueFields } } } } } } } "
+            "fragment issueFields on IssueNode "
+            "{ title files(first: 10) { edges { node { url } } } }"
+        )
+        # count, projects and prefetched issues and attachments
+        self.assertEqual(len(queries), 4)
+        self.assertNotIn('"api_projects_issue"."description"', queries[2]["sql"])
+
+
+class QueryCostTest(TestCase):
+
+    QUERY = """
+    query($projects: Int) {
+      allProjects(first: $projects) {
+        edges { node { name issues(first: 3) { edges { node { title } } } } }
+      }
+    }
+    """
+
+    def _post(self, query: str, variables: dict = None):
+        return self.client.post(
+            "/graphql/",
+            {"query": query, "variables": variables},
+            content_type="application/json",
+        )
+
+    def test_cost_extension(self):
+        response = self._post(self.QUERY, {"projects": 5})
+        self.assertEqual(response.status_code, 200)
+        cost = response.json()["extensions"]["cost"]
+        # allProjects + 5 * issues, scalar fields are free
+        self.assertEqual(cost["requestedQueryCost"], 6)
+        self.assertEqual(cost["depth"], 2)
+
+        weights = {"FIELD_WEIGHTS": {"ProjectNode.name": 10}}
+        with override_settings(GRAPHQL_QUERY_COST=weights):
+            response = self._post(self.QUERY, {"projects": 5})
+        self.assertEqual(
+            response.json()["extensions"]["cost"]["requestedQueryCost"], 56
+        )
+
+    def test_limits(self):
+        nested = "project { issues(first: 1) { edges { node { %s } } } }"
+        query = "{ allIssues(first: 1) { edges { node { %s } } } }" % (
+            nested % (nested % (nested % "title"))
+        )
+        response = self._post(query)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("depth 7 exceeds", response.json()["errors"][0]["message"])
+
+        query = (
+            "{ allProjects { edges { node { issues { edges { node { "
+            "files { edges { node { issue { title } } } } } } } } } } }"
+        )
+        response = self._post(query)
+        self.assertEqual(response.status_code, 400)
+        data = response.json()
+        self.assertIn("maximum cost", data["errors"][0]["message"])
+        self.assertGreater(data["extensions"]["cost"]["requestedQueryCost"], 200000)
+
+
+class PersistedQueryTest(TestCase):
+
+    QUERY = "{ allProjects(first: 1) { edges { node { name } } } }"
+
+    def setUp(self):
+        caches["persisted_queries"].clear()
+        document_backend.documents.clear()
+
+    def _post(self, data: dict):
+        return self.client.post("/graphql/", data, content_type="application/json")
+
+    def _extensions(self, sha256_hash: str) -> dict:
+        return {"persistedQuery": {"version": 1, "sha256Hash": sha256_hash}}
+
+    def test_persisted_query(self):
+        sha256_hash = hashlib.sha256(self.QUERY.encode()).hexdigest()
+        extensions = self._extensions(sha256_hash)
+
+        response = self._post({"extensions": extensions})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()["errors"][0]["message"], "PersistedQueryNotFound"
+        )
+
+        response = self._post({"query": self.QUERY, "extensions": extensions})
+        self.assertEqual(response.json()["data"], {"allProjects": {"edges": []}})
+
+        response = self.client.get(
+            "/graphql/",
+            {"extensions": json.dumps(extensions)},
+            HTTP_ACCEPT="application/json",
+        )
+        self.assertEqual(response.json()["data"], {"allProjects": {"edges": []}})
+
+        response = self._post(
+            {
+                "query": "{ allUsers { edges { node { id } } } }",
+                "extensions": extensions,
+            }
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_documents_are_parsed_and_validated_once(self):
+        with mock.patch(
+            "graphql.backend.core.parse", wraps=graphql_parse
+        ) as parse_mock, mock.patch(
+            "stx_training_program.query_cost.validate", wraps=graphql_validate
+        ) as validate_mock:
+            for _ in range(3):
+                response = self._post({"query": self.QUERY})
+                self.assertNotIn("errors", response.json())
+        self.assertEqual(parse_mock.call_count, 1)
+        self.assertEqual(validate_mock.call_count, 1)
+
+
+class KeysetConnectionTest(TestCase):
+
+    QUERY = """
+    query($first: Int, $last: Int, $after: String, $before: String) {
+      allIssues(
+        keyset: true, first: $first, last: $last, after: $after, before: $before
+      ) {
+        pageInfo { hasNextPage hasPreviousPage startCursor endCursor }
+        edges { node { title } }
+      }
+    }
+    """
+
+    def setUp(self):
+        owner = User.objects.create_user("owner@example.com", "password000")
+        project = Project.objects.create(name="Project", owner=owner)
+        for i in range(7):
+            Issue.objects.create(
+                title=f"Issue {i}",
+                owner=owner,
+                project=project,
+                due_date=datetime(2030, 10, 10, hour=12),
+            )
+
+    def _execute(self, query: str, variables: dict):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(
+                "/graphql/",
+                {"query": query, "variables": variables},
+                content_type="application/json",
+            )
+        data = response.json()
+        self.assertNotIn("errors", data)
+        return data["data"], context.captured_queries
+
+    def _get_page(self, **variables):
+        data, queries = self._execute(self.QUERY, variables)
+        # a single range query, without COUNT or OFFSET
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn("OFFSET", queries[0]["sql"])
+        page = data["allIssues"]
+        return [edge["node"]["title"] for edge in page["edges"]], page["pageInfo"]
+
+    def test_paging(self):
+        titles, page_info = self._get_page(first=3)
+        self.assertEqual(titles, ["Issue 0", "Issue 1", "Issue 2"])
+        self.assertTrue(page_info["hasNextPage"])
+
+        titles, page_info = self._get_page(first=3, after=page_info["endCursor"])
+        self.assertEqual(titles, ["Issue 3", "Issue 4", "Issue 5"])
+        self.assertTrue(page_info["hasPreviousPage"])
+
+        titles, page_info = self._get_page(first=3, after=page_info["endCursor"])
+        self.assertEqual(titles, ["Issue 6"])
+        self.assertFalse(page_info["hasNextPage"])
+
+        titles, page_info = self._get_page(last=2, before=page_info["startCursor"])
+        self.assertEqual(titles, ["Issue 4", "Issue 5"])
+        self.assertTrue(page_info["hasPreviousPage"])
+        self.assertTrue(page_info["hasNextPage"])
+
+    def test_total_count(self):
+        for keyset in ("true", "false"):
+            query = (
+                "{ allProjects { edges { node { "
+                "issues(keyset: %s, first: 2) { totalCount } } } } }" % keyset
+            )
+            data, _ = self._execute(query, {})
+            issues = data["allProjects"]["edges"][0]["node"]["issues"]
+            self.assertEqual(issues["totalCount"], 7)
+
+        query = "{ allIssues(keyset: true, first: 2) { totalCount } }"
+        data, queries = self._execute(query, {})
+        self.assertEqual(data["allIssues"]["totalCount"], 7)
+        self.assertIn("COUNT", queries[-1]["sql"])
+
+    def test_offset_pagination_by_default(self):
+        query = "{ allIssues(offset: 5) { totalCount edges { node { title } } } }"
+        data, queries = self._execute(query, {})
+        titles = [edge["node"]["title"] for edge in data["allIssues"]["edges"]]
+        self.assertEqual(titles, ["Issue 5", "Issue 6"])
+        self.assertEqual(data["allIssues"]["totalCount"], 7)
+        # counted once by the pagination
+        self.assertEqual(len(queries), 2)
+
+        # members are not keyset connections
+        query = (
+            "{ allProjects { edges { node { "
+            "members(keyset: true) { edges { cursor } } } } } }"
+        )
+        response = self.client.post(
+            "/graphql/", {"query": query}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+# events are sent by commit callbacks, which need real commits
+class SubscriptionTest(TransactionTestCase):
+    # seconds to wait for each message
+    TIMEOUT = 5
+
+    SUBSCRIPTION = """
+    subscription($project: ID!) {
+      issuesChanged(project: $project) {
+        action
+        pks
+        issues { title owner { email } files { edges { node { filename } } } }
+      }
+    }
+    """
+
+    def setUp(self):
+        self.owner = User.objects.create_user("owner@example.com", "password000")
+        self.outsider = User.objects.create_user("other@example.com", "password111")
+        User.objects.update(is_active=True)
+        self.project = Project.objects.create(name="Project", owner=self.owner)
+        # batches of committed events, published by `_write` on the test loop
+        self.batches = []
+        self.send_events_patcher = mock.patch(
+            "api_projects.events.send_events", self.batches.append
+        )
+        self.send_events_patcher.start()
+        self.addCleanup(self.send_events_patcher.stop)
+
+    async def _connect(self, user) -> WebsocketCommunicator:
+        from stx_training_program.asgi import application
+
+        communicator = WebsocketCommunicator(
+            application,
+            "/graphql/",
+            headers=[(b"origin", b"http://testserver"), (b"host", b"testserver")],
+            subprotocols=["graphql-ws"],
+        )
+        connected, _ = await communicator.connect(timeout=self.TIMEOUT)
+        self.assertTrue(connected)
+        token = await database_sync_to_async(AccessToken.for_user)(user)
+        await communicator.send_json_to(
+            {"type": "connection_init", "payload": {"authorization": f"Bearer {token}"}}
+        )
+        message = await communicator.receive_json_from(timeout=self.TIMEOUT)
+        self.assertEqual(message["type"], "connection_ack")
+        return communicator
+
+    async def _write(self, func, *args, **kwargs):
+        """
+        Runs the write and sends events of its commit. `send_events` would
+        block the test loop's thread in `async_to_sync`.
+        """
+        result = await database_sync_to_async(func)(*args, **kwargs)
+        channel_layer = get_channel_layer()
+        for batch in self.batches:
+            for group, message in events.get_event_messages(batch):
+                await channel_layer.group_send(group, message)
+        self.batches.clear()
+        return result
+
+    async def _subscribe(self, communicator, query: str = SUBSCRIPTION) -> None:
+        await communicator.send_json_to(
+            {
+                "type": "start",
+                "id": "1",
+                "payload": {"query": query, "variables": {"project": self.project.pk}},
+            }
+        )
+
+    async def test_issue_events(self):
+        communicator = await self._connect(self.owner)
+        await self._subscribe(communicator)
+        # the subscription has joined the project's group
+        self.assertTrue(await communicator.receive_nothing())
+
+        issue = await self._write(
+            Issue.objects.create,
+            title="Issue",
+            owner=self.owner,
+            project=self.project,
+            due_date=datetime(2030, 10, 10, hour=12),
+        )
+        message = await communicator.receive_json_from(timeout=self.TIMEOUT)
+        self.assertEqual(message["id"], "1")
+        self.assertEqual(
+            message["payload"]["data"]["issuesChanged"],
+            {
+                "action": "CREATED",
+                "pks": [issue.pk],
+                "issues": [
+                    {
+                        "title": "Issue",
+                        "owner": {"email": self.owner.email},
+                        "files": {"edges": []},
+                    }
+                ],
+            },
+        )
+
+        await self._write(issue.delete)
+        message = await communicator.receive_json_from(timeout=self.TIMEOUT)
+        event = message["payload"]["data"]["issuesChanged"]
+        self.assertEqual(event["action"], "DELETED")
+        self.assertEqual(event["issues"], [])
+
+        # other projects are not watched
+        other_project = await self._write(
+            Project.objects.create, name="Other", owner=self.owner
+        )
+        await self._write(
+            Issue.objects.create,
+            title="Issue",
+            owner=self.owner,
+            project=other_project,
+            due_date=datetime(2030, 10, 10, hour=12),
+        )
+        self.assertTrue(await communicator.receive_nothing())
+
+        await communicator.send_json_to({"type": "stop", "id": "1"})
+        message = await communicator.receive_json_from(timeout=self.TIMEOUT)
+        self.assertEqual(message, {"type": "complete", "id": "1"})
+        await communicator.disconnect(timeout=self.TIMEOUT)
+
+    async def test_events_sent_on_commit(self):
+        """
+        Events are sent by `send_events` from the commit callback of the
+        worker thread, through `async_to_sync` onto the running loop.
+        """
+        self.send_events_patcher.stop()
+        communicator = await self._connect(self.owner)
+        await self._subscribe(communicator)
+        self.assertTrue(await communicator.receive_nothing())
+
+        create = database_sync_to_async(Issue.objects.create)
+        issue = await asyncio.wait_for(
+            create(
+                title="Issue",
+                owner=self.owner,
+                project=self.project,
+                due_date=datetime(2030, 10, 10, hour=12),
+            ),
+            self.TIMEOUT,
+        )
+        message = await communicator.receive_json_from(timeout=self.TIMEOUT)
+        event = message["payload"]["data"]["issuesChanged"]
+        self.assertEqual((event["action"], event["pks"]), ("CREATED", [issue.pk]))
+        await communicator.disconnect(timeout=self.TIMEOUT)
+
+    async def test_rejected_operations(self):
+        communicator = await self._connect(self.outsider)
+        await self._subscribe(communicator)
+        message = await communicator.receive_json_from(timeout=self.TIMEOUT)
+        self.assertEqual(
+            message["payload"]["errors"][0]["message"], "Project does not exist."
+        )
+        message = await communicator.receive_json_from(timeout=self.TIMEOUT)
+        self.assertEqual(message["type"], "complete")
+
+        await self._subscribe(communicator, "{ allProjects { edges { node { pk } } } }")
+        message = await communicator.receive_json_from(timeout=self.TIMEOUT)
+        self.assertEqual(message["type"], "error")
+        self.assertEqual(
+            message["payload"]["message"],
+            "Only subscriptions are served over WebSocket.",
+        )
+        await communicator.disconnect(timeout=self.TIMEOUT)
+
+
+class GraphQLResultCacheTest(TestCase):
+
+    QUERY = "{ allIssues(first: 10) { edges { node { title } } } }"
+
+    def setUp(self):
+        get_results_cache().clear()
+        self.owner = create_active_user("owner@example.com")
+        project = Project.objects.create(name="Project", owner=self.owner)
+        self.issue = Issue.objects.create(
+            title="Issue",
+            owner=self.owner,
+            project=project,
+            due_date=datetime(2030, 10, 10, hour=12),
+        )
+        self.client.force_login(self.owner)
+
+    def _execute(self, query: str):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(
+                "/graphql/", {"query": query}, content_type="application/json"
+            )
+        self.assertEqual(response.status_code, 200)
+        queries = [q for q in context.captured_queries if "api_projects" in q["sql"]]
+        return response.json(), len(queries)
+
+    def _titles(self, data: dict):
+        return [edge["node"]["title"] for edge in data["data"]["allIssues"]["edges"]]
+
+    def test_cached_until_written(self):
+        data, queries = self._execute(self.QUERY)
+        # count of the connection and the issues
+        self.assertEqual(queries, 2)
+        data, queries = self._execute(self.QUERY)
+        self.assertEqual(queries, 0)
+        self.assertEqual(self._titles(data), ["Issue"])
+        self.assertIn("cost", data["extensions"])
+
+        self.issue.title = "Renamed"
+        self.issue.save()
+        data, queries = self._execute(self.QUERY)
+        self.assertEqual(queries, 2)
+        self.assertEqual(self._titles(data), ["Renamed"])
+
+        Issue.objects.filter(pk=self.issue.pk).update(title="Updated")
+        data, queries = self._execute(self.QUERY)
+        self.assertEqual(self._titles(data), ["Updated"])
+
+    def test_connections_without_nodes(self):
+        query = "{ allIssues { totalCount edges { cursor } } }"
+        self._execute(query)
+        Issue.objects.create(
+            title="Other",
+            owner=self.owner,
+            project=self.issue.project,
+            due_date=datetime(2030, 10, 10, hour=12),
+        )
+        data, queries = self._execute(query)
+        self.assertEqual(data["data"]["allIssues"]["totalCount"], 2)
+
+        # no tables are known to be read
+        with mock.patch("stx_training_program.results.CachedResult.set") as set_mock:
+            self._execute("{ __typename }")
+        set_mock.assert_not_called()
+
+    def test_invalid_documents_not_cached(self):
+        for query in (
+            "{ allProjects { ...F } }",
+            "{ allProjects { ... on Nope { id } } }",
+        ):
+            response = self.client.post(
+                "/graphql/", {"query": query}, content_type="application/json"
+            )
+            self.assertEqual(response.status_code, 400)
+            self.assertIn("errors", response.json())
+
+    def test_scoped_per_user(self):
+        self._execute(self.QUERY)
+        other = create_active_user("other@example.com", "password111")
+        self.client.force_login(other)
+        data, queries = self._execute(self.QUERY)
+        self.assertEqual(queries, 2)
+
+    def test_mutations_not_cached(self):
+        mutation = (
+            'mutation { updateIssue(issueData: {pk: "%d", title: "%s"}) { title } }'
+        )
+        data, _ = self._execute(mutation % (self.issue.pk, "First"))
+        data, _ = self._execute(mutation % (self.issue.pk, "First"))
+        self.assertNotIn("errors", data)
+        self.issue.refresh_from_db()
+        self.assertEqual(self.issue.title, "First")
+        data, queries = self._execute(self.QUERY)
+        self.assertEqual(self._titles(data), ["First"])
@@ -1,5 +1,6 @@
-from django.db.models import Q
 from django.shortcuts import get_object_or_404
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.viewsets import ModelViewSet
@@ -9,12 +10,21 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import action
 
 
-from api_projects.models import Project, Issue, IssueAttachment
+from api_projects import conditional, search
+from api_projects.caching import cache_response
+from api_projects.compiled import (
+    CompiledListMixin,
+    CompiledProjectSerializer,
+    CompiledIssueSerializer,
+)
+from api_projects.models import Project, Issue, IssueAttachment, ProjectAccess
+from api_projects.pagination import ProjectCursorPagination, IssueCursorPagination
 from api_projects.serializers import (
     ProjectSerializer,
     IssueSerializer,
     IssueAttachmentSerializer,
 )
+from api_projects.streaming import StreamingListMixin
 from api_projects.permissions import (
     IsOwner,
     MemberReadOnly,
@@ -22,38 +32,71 @@ from api_projects.permissions import (
 )
 
 
-class ProjectViewSet(ModelViewSet):
+class ProjectViewSet(CompiledListMixin, StreamingListMixin, ModelViewSet):
     queryset = Project.objects.all()
     serializer_class = ProjectSerializer
+    compiled_serializer_class = CompiledProjectSerializer
     permission_classes = [IsAuthenticated, IsOwner | MemberReadOnly]
+    pagination_class = ProjectCursorPagination
 
     def get_queryset(self):
         user = self.request.user
-        query = Q(owner=user) | Q(members=user)
-        return Project.objects.filter(query).distinct()
+        queryset = Project.objects.filter(access__user=user)
+        return self.get_serializer().setup_eager_loading(queryset)
+
+    @method_decorator(condition(etag_func=conditional.project_list_etag))
+    @method_decorator(cache_response(conditional.project_list_etag))
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @method_decorator(
+        condition(
+            etag_func=conditional.project_etag,
+            last_modified_func=conditional.project_last_modified,
+        )
+    )
+    @method_decorator(cache_response(conditional.project_etag))
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
 
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
 
 
-class IssueViewSet(ModelViewSet):
+class IssueViewSet(CompiledListMixin, StreamingListMixin, ModelViewSet):
     queryset = Issue.objects.all()
     serializer_class = IssueSerializer
-    permission_classes = [IsProjectMember]
+    compiled_serializer_class = CompiledIssueSerializer
+    permission_classes = [IsAuthenticated, IsProjectMember]
+    pagination_class = IssueCursorPagination
+    search_query_param = "search"
 
     def get_queryset(self):
         user = self.request.user
-        query = Q(project__in=user.projects.all()) | Q(
-            project__in=user.own_projects.all()
-        )
-        return Issue.objects.filter(query)
+        project_ids = ProjectAccess.objects.project_ids(user)
+        queryset = Issue.objects.filter(project_id__in=project_ids)
+        text = self.request.query_params.get(self.search_query_param)
+        if text is not None and self.action == "list":
+            queryset = search.search_issues(queryset, text)
+        return self.get_serializer().setup_eager_loading(queryset)
+
+    @method_decorator(condition(etag_func=conditional.project_list_etag))
+    @method_decorator(cache_response(conditional.project_list_etag))
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @method_decorator(condition(etag_func=conditional.issue_etag))
+    @method_decorator(cache_response(conditional.issue_etag))
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
 
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
 
 
 class IssueAttachmentDelete(DestroyAPIView):
-    queryset = IssueAttachment.objects.all()
+    # permissions check the issue and its project
+    queryset = IssueAttachment.objects.select_related("issue")
     serializer_class = IssueAttachmentSerializer
     permission_classes = [IsProjectMember | IsOwner]
 
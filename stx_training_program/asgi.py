@@ -2,6 +2,7 @@
 ASGI config for stx_training_program project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Besides HTTP, it serves GraphQL subscriptions over WebSocket at `graphql/`.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.1/howto/deployment/asgi/
@@ -13,4 +14,24 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "stx_training_program.settings")
 
-application = get_asgi_application()
+# initializes Django before the consumers import models
+django_application = get_asgi_application()
+
+from channels.auth import AuthMiddlewareStack  # noqa: E402
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+from channels.security.websocket import AllowedHostsOriginValidator  # noqa: E402
+from django.urls import path  # noqa: E402
+
+from stx_training_program.consumers import GraphQLSubscriptionConsumer  # noqa: E402
+
+
+application = ProtocolTypeRouter(
+    {
+        "http": django_application,
+        "websocket": AllowedHostsOriginValidator(
+            AuthMiddlewareStack(
+                URLRouter([path("graphql/", GraphQLSubscriptionConsumer.as_asgi())])
+            )
+        ),
+    }
+)
@@ -0,0 +1,66 @@
+"""
+Side effects of database changes batched per transaction.
+
+`commit_batch` yields a dict shared by all changes of the current
+transaction, its `dispatch` runs once after the commit, so repeated changes
+of the same rows are merged and sent once. Changes made in a savepoint are
+kept in a batch of their own, which reads through to the batches of the
+enclosing transaction and is dropped together with its commit callback
+when the savepoint is rolled back. Outside of atomic blocks every change
+is dispatched on its own.
+"""
+from collections import ChainMap
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+from django.db import transaction
+
+
+@contextmanager
+def commit_batch(
+    name: str, dispatch: Optional[Callable[[dict], None]] = None, using=None
+):
+    """
+    Yields the batch of the current transaction (or savepoint). Without
+    `dispatch` the batch only keeps state of the transaction, e.g. to merge
+    changes which are written to the database right away.
+    """
+    connection = transaction.get_connection(using)
+    if not connection.in_atomic_block:
+        batch = {}
+        yield batch
+        if dispatch is not None:
+            dispatch(batch)
+        return
+
+    stacks = connection.__dict__.setdefault("commit_batches", {})
+    stack = stacks.setdefault(name, [])
+    # batches of rolled back savepoints were dropped with their callbacks
+    scheduled = {func for _, func in connection.run_on_commit}
+    stack[:] = [layer for layer in stack if layer[2] in scheduled]
+    lower = ChainMap(*(batch for _, batch, _ in reversed(stack)))
+    sids = set(connection.savepoint_ids)
+    if stack and stack[-1][0] == sids:
+        yield lower
+        return
+
+    batch = {}
+
+    def callback():
+        if stacks.get(name) is stack:
+            del stacks[name]
+        if dispatch is not None:
+            # entries of released savepoints equal to the enclosing ones
+            # were already sent by the callbacks of the enclosing batches
+            dispatch(
+                {
+                    key: value
+                    for key, value in batch.items()
+                    if key not in lower or lower[key] != value
+                }
+            )
+
+    stack.append((sids, batch, callback))
+    yield lower.new_child(batch)
+    # registered after the first change, callbacks may run immediately
+    transaction.on_commit(callback, using=using)
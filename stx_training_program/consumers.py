@@ -0,0 +1,175 @@
+"""
+GraphQL subscriptions over WebSocket, with the `graphql-ws` protocol
+of subscriptions-transport-ws (Apollo, GraphiQL clients).
+
+Subscription resolvers join channel layer groups of the watched projects
+(see `api_projects.events`), messages received from the groups are pushed
+into a stream, which is the root value of the subscription resolvers.
+Clients may authenticate with the session cookie or with a JWT
+in the `authorization` field of the `connection_init` payload.
+"""
+from asgiref.sync import async_to_sync
+from channels.generic.websocket import JsonWebsocketConsumer
+from graphene_django.views import GraphQLView
+from graphql import GraphQLError
+from promise import Promise
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rx import Observable
+from rx.subjects import Subject
+
+from stx_training_program.schema import schema
+from stx_training_program.views import document_backend
+
+
+PROTOCOL = "graphql-ws"
+
+
+class SubscriptionContext:
+    """
+    Context of subscription resolvers, the counterpart of the request
+    of queries. Attributes cached by resolvers (e.g. DataLoaders)
+    are dropped for every event, objects are never reused between events.
+    """
+
+    attributes = {"consumer", "user", "META"}
+
+    def __init__(self, consumer, user):
+        self.consumer = consumer
+        self.user = user
+        headers = dict(consumer.scope["headers"])
+        self.META = {}
+        if b"host" in headers:
+            self.META["HTTP_HOST"] = headers[b"host"].decode("latin1")
+
+    def reset(self) -> None:
+        for name in set(self.__dict__) - self.attributes:
+            delattr(self, name)
+
+    def join_group(self, group: str) -> None:
+        self.consumer.join_group(group)
+
+
+class GraphQLSubscriptionConsumer(JsonWebsocketConsumer):
+    def connect(self):
+        if PROTOCOL not in self.scope["subprotocols"]:
+            self.close()
+            return
+        self.joined_groups = set()
+        # operation id -> subscription of the stream
+        self.operations = {}
+        self.stream = Subject()
+        self.context = SubscriptionContext(self, self.scope.get("user"))
+        self.accept(PROTOCOL)
+
+    def disconnect(self, code):
+        for subscription in getattr(self, "operations", {}).values():
+            subscription.dispose()
+        for group in getattr(self, "joined_groups", ()):
+            async_to_sync(self.channel_layer.group_discard)(group, self.channel_name)
+
+    def receive_json(self, content, **kwargs):
+        message_type = content.get("type")
+        operation_id = content.get("id")
+        payload = content.get("payload") or {}
+        if message_type == "connection_init":
+            self.init_connection(payload)
+        elif message_type == "start":
+            self.start(operation_id, payload)
+        elif message_type == "stop":
+            self.stop(operation_id)
+        elif message_type == "connection_terminate":
+            self.close()
+        else:
+            self.send_error(operation_id, GraphQLError("Unknown message type."))
+
+    def init_connection(self, payload: dict) -> None:
+        authorization = payload.get("authorization")
+        if authorization:
+            authentication = JWTAuthentication()
+            try:
+                raw_token = authentication.get_raw_token(authorization.encode())
+                if raw_token is None:
+                    raise InvalidToken()
+                token = authentication.get_validated_token(raw_token)
+                self.context.user = authentication.get_user(token)
+            except (AuthenticationFailed, TokenError) as error:
+                self.send_json(
+                    {"type": "connection_error", "payload": {"message": str(error)}}
+                )
+                self.close()
+                return
+        self.send_json({"type": "connection_ack"})
+
+    def start(self, operation_id, payload: dict) -> None:
+        if operation_id in self.operations:
+            self.operations.pop(operation_id).dispose()
+        operation_name = payload.get("operationName")
+        try:
+            document = document_backend.document_from_string(
+                schema, payload.get("query") or ""
+            )
+        except Exception as error:
+            self.send_error(operation_id, error)
+            return
+        # queries and mutations are served by the HTTP endpoint
+        if document.get_operation_type(operation_name) != "subscription":
+            self.send_error(
+                operation_id,
+                GraphQLError("Only subscriptions are served over WebSocket."),
+            )
+            return
+
+        result = document.execute(
+            root_value=self.stream,
+            context_value=self.context,
+            operation_name=operation_name,
+            variable_values=payload.get("variables"),
+            allow_subscriptions=True,
+        )
+        if not isinstance(result, Observable):
+            # rejected by validation, limits or the resolver
+            self.send_data(operation_id, result)
+            self.send_json({"type": "complete", "id": operation_id})
+            return
+        self.operations[operation_id] = result.subscribe(
+            lambda result: self.send_data(operation_id, result)
+        )
+
+    def stop(self, operation_id) -> None:
+        subscription = self.operations.pop(operation_id, None)
+        if subscription is not None:
+            subscription.dispose()
+        self.send_json({"type": "complete", "id": operation_id})
+
+    def join_group(self, group: str) -> None:
+        if group not in self.joined_groups:
+            async_to_sync(self.channel_layer.group_add)(group, self.channel_name)
+            self.joined_groups.add(group)
+
+    def project_events(self, message: dict) -> None:
+        self.context.reset()
+        self.stream.on_next(message)
+
+    def send_data(self, operation_id, result) -> None:
+        data = result.data
+        if data is not None:
+            # nested fields batched by DataLoaders are resolved lazily
+            data = {
+                name: value.get() if Promise.is_thenable(value) else value
+                for name, value in data.items()
+            }
+        payload = {"data": data}
+        if result.errors:
+            payload["errors"] = [GraphQLView.format_error(e) for e in result.errors]
+        self.send_json({"type": "data", "id": operation_id, "payload": payload})
+
+    def send_error(self, operation_id, error: Exception) -> None:
+        self.send_json(
+            {
+                "type": "error",
+                "id": operation_id,
+                "payload": GraphQLView.format_error(error),
+            }
+        )
@@ -0,0 +1,100 @@
+"""
+Automatic persisted queries and the cache of parsed documents.
+
+Clients may send only the sha256 hash of a query in
+`extensions.persistedQuery.sha256Hash`. An unknown hash is answered with
+`PersistedQueryNotFound`, then the client repeats the request with the
+full query, which is stored under its hash for the next requests.
+
+Parsed and validated documents are kept in a bounded LRU cache,
+so repeated queries skip parsing and validation.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from django.core.cache import caches
+from django.http import HttpResponse, HttpResponseBadRequest
+from graphene_django.views import HttpError
+
+from stx_training_program.query_cost import QueryCostBackend
+
+
+PERSISTED_QUERIES_CACHE_ALIAS = "persisted_queries"
+KEY_PREFIX = "graphql:persisted_query:"
+PERSISTED_QUERY_VERSION = 1
+
+
+def query_hash(query: str) -> str:
+    return hashlib.sha256(query.encode("utf-8")).hexdigest()
+
+
+def get_persisted_query_hash(request, data) -> Optional[str]:
+    """
+    Returns the hash of the persisted query extension of the request, if any.
+    """
+    extensions = request.GET.get("extensions") or data.get("extensions")
+    if not extensions:
+        return None
+    if isinstance(extensions, str):
+        try:
+            extensions = json.loads(extensions)
+        except ValueError:
+            raise HttpError(HttpResponseBadRequest("Extensions are invalid JSON."))
+
+    persisted_query = extensions.get("persistedQuery")
+    if not persisted_query:
+        return None
+    if persisted_query.get("version") != PERSISTED_QUERY_VERSION:
+        raise HttpError(HttpResponseBadRequest("Unsupported persisted query version."))
+    return persisted_query.get("sha256Hash")
+
+
+def resolve_persisted_query(sha256_hash: str, query: Optional[str]) -> str:
+    """
+    Returns the query stored under the hash, or stores the given query.
+    """
+    cache = caches[PERSISTED_QUERIES_CACHE_ALIAS]
+    if query:
+        if query_hash(query) != sha256_hash:
+            raise HttpError(
+                HttpResponseBadRequest("Provided sha256Hash does not match query.")
+            )
+        cache.set(KEY_PREFIX + sha256_hash, query, timeout=None)
+        return query
+
+    query = cache.get(KEY_PREFIX + sha256_hash)
+    if query is None:
+        # clients send the full query after this error
+        raise HttpError(HttpResponse(status=200), "PersistedQueryNotFound")
+    return query
+
+
+class CachedDocumentBackend(QueryCostBackend):
+    """
+    Keeps up to `max_size` recently used documents by sha256 of the query.
+    """
+
+    def __init__(self, max_size: int, executor=None):
+        super().__init__(executor=executor)
+        self.max_size = max_size
+        self.documents = OrderedDict()
+        self.lock = threading.Lock()
+
+    def document_from_string(self, schema, document_string):
+        key = (schema, query_hash(document_string))
+        with self.lock:
+            document = self.documents.get(key)
+            if document is not None:
+                self.documents.move_to_end(key)
+                return document
+
+        # parse errors are raised, so invalid syntax is never cached
+        document = super().document_from_string(schema, document_string)
+        with self.lock:
+            self.documents[key] = document
+            while len(self.documents) > self.max_size:
+                self.documents.popitem(last=False)
+        return document
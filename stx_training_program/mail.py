@@ -0,0 +1,105 @@
+"""
+Email connection pooled per process (and thread).
+
+Mail backends open a new connection (TLS handshake, HTTP session) for every
+`send_mail` call. Celery workers and web processes send through
+`send_messages` instead, which reuses one open connection until it is older
+than `EMAIL_CONNECTION_MAX_AGE` seconds or a send fails. A reused
+connection which fails transiently (e.g. closed by the server while idle)
+is replaced and the messages are sent once more.
+"""
+import smtplib
+import socket
+import threading
+import time
+from typing import List, Optional
+
+from celery.signals import worker_process_shutdown
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+
+class ConnectionPool(threading.local):
+    def __init__(self):
+        self.connection = None
+        self.backend: Optional[str] = None
+        self.opened_at = 0.0
+
+    def acquire(self):
+        """
+        Returns `(connection, reused)`, an expired connection is recycled.
+        """
+        max_age = getattr(settings, "EMAIL_CONNECTION_MAX_AGE", 300)
+        expired = time.monotonic() - self.opened_at > max_age
+        if self.connection is not None and (
+            expired or self.backend != settings.EMAIL_BACKEND
+        ):
+            self.close()
+        if self.connection is not None:
+            return self.connection, True
+
+        self.connection = get_connection(fail_silently=False)
+        self.connection.open()
+        self.backend = settings.EMAIL_BACKEND
+        self.opened_at = time.monotonic()
+        return self.connection, False
+
+    def close(self) -> None:
+        connection, self.connection = self.connection, None
+        if connection is not None:
+            try:
+                connection.close()
+            except Exception:
+                # the connection is dropped anyway
+                pass
+
+
+pool = ConnectionPool()
+
+
+def send_messages(messages: List[EmailMessage]) -> int:
+    """
+    Sends the messages over the pooled connection, returns the number sent.
+    """
+    if not messages:
+        return 0
+    while True:
+        connection, reused = pool.acquire()
+        try:
+            return connection.send_messages(messages)
+        except Exception as exc:
+            pool.close()
+            if not reused or not is_transient_error(exc):
+                raise
+
+
+def is_transient_error(exc: Exception) -> bool:
+    """
+    Returns whether a failed send may succeed later: connection failures,
+    SMTP 4xx replies and 429 or 5xx responses of HTTP API backends (e.g.
+    SendGrid). Refused recipients and other rejected messages are permanent.
+    """
+    if isinstance(exc, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
+        return True
+    if isinstance(exc, smtplib.SMTPResponseException):
+        return 400 <= exc.smtp_code < 500
+    if isinstance(exc, smtplib.SMTPException):
+        # e.g. SMTPRecipientsRefused
+        return False
+    status_code = getattr(exc, "status_code", None)
+    if isinstance(status_code, int):
+        return status_code == 429 or status_code >= 500
+    return isinstance(exc, (ConnectionError, TimeoutError, socket.timeout))
+
+
+@worker_process_shutdown.connect
+def close_pool(**kwargs):
+    pool.close()
+
+
+@receiver(setting_changed)
+def reset_pool(setting, **kwargs):
+    if setting.startswith("EMAIL_"):
+        pool.close()
@@ -0,0 +1,244 @@
+"""
+Static cost analysis and depth limiting of GraphQL documents.
+
+Every selected field costs its weight (`FIELD_WEIGHTS` of the
+`GRAPHQL_QUERY_COST` setting, by default 1 for object fields and 0 for
+scalars) plus the cost of its selections. Selections of connections
+are multiplied by `first`/`last`, selections of other lists by the
+connection limit. Depth counts nested object fields, the `edges`/`node`
+levels of connections are not counted.
+"""
+from collections import namedtuple
+from functools import partial
+from typing import List, Tuple
+
+from django.conf import settings
+from graphene.relay import Connection
+from graphene_django.settings import graphene_settings
+from graphql import GraphQLError
+from graphql.backend.core import GraphQLCoreBackend
+from graphql.execution import ExecutionResult, execute
+from graphql.language import ast
+from graphql.type.definition import (
+    GraphQLList,
+    GraphQLNonNull,
+    get_named_type,
+    is_leaf_type,
+)
+from graphql.validation import validate
+
+
+QueryCost = namedtuple("QueryCost", ["cost", "depth"])
+
+DEFAULT_LIMITS = {"MAX_DEPTH": 6, "MAX_COST": 200000, "FIELD_WEIGHTS": {}}
+
+
+def get_limits() -> dict:
+    return {**DEFAULT_LIMITS, **getattr(settings, "GRAPHQL_QUERY_COST", {})}
+
+
+class QueryCostAnalyzer:
+    def __init__(self, schema, document_ast: ast.Document, variables=None):
+        self.schema = schema
+        self.variables = variables or {}
+        self.weights = get_limits()["FIELD_WEIGHTS"]
+        self.list_size = graphene_settings.RELAY_CONNECTION_MAX_LIMIT or 100
+        self.fragments = {
+            definition.name.value: definition
+            for definition in document_ast.definitions
+            if isinstance(definition, ast.FragmentDefinition)
+        }
+
+    def analyze(self, operation: ast.OperationDefinition) -> QueryCost:
+        root_type = {
+            "query": self.schema.get_query_type(),
+            "mutation": self.schema.get_mutation_type(),
+            "subscription": self.schema.get_subscription_type(),
+        }[operation.operation]
+        return QueryCost(*self._selections_cost(root_type, [operation]))
+
+    def _selections_cost(self, parent_type, parents) -> Tuple[int, int]:
+        cost, depth = 0, 0
+        for field_type, field_ast in self._collect_fields(parent_type, parents):
+            field_cost, field_depth = self._field_cost(field_type, field_ast)
+            cost += field_cost
+            depth = max(depth, field_depth)
+        return cost, depth
+
+    def _field_cost(self, parent_type, field_ast: ast.Field) -> Tuple[int, int]:
+        name = field_ast.name.value
+        fields = getattr(parent_type, "fields", {})
+        if name.startswith("__") or name not in fields:
+            # introspection and unknown fields (reported by validation)
+            return 0, 0
+
+        field_type = fields[name].type
+        named_type = get_named_type(field_type)
+        weight = self.weights.get(f"{parent_type.name}.{name}")
+        if is_leaf_type(named_type):
+            return weight or 0, 0
+        if weight is None:
+            weight = 1
+
+        graphene_type = getattr(named_type, "graphene_type", None)
+        if isinstance(graphene_type, type) and issubclass(graphene_type, Connection):
+            edge_type = get_named_type(named_type.fields["edges"].type)
+            node_type = get_named_type(edge_type.fields["node"].type)
+            edges = self._get_fields(named_type, [field_ast], "edges")
+            nodes = self._get_fields(edge_type, edges, "node")
+            multiplier = self._get_page_size(field_ast)
+            sub_cost, sub_depth = self._selections_cost(node_type, nodes)
+        else:
+            if isinstance(field_type, GraphQLNonNull):
+                field_type = field_type.of_type
+            multiplier = self.list_size if isinstance(field_type, GraphQLList) else 1
+            sub_cost, sub_depth = self._selections_cost(named_type, [field_ast])
+        return weight + multiplier * sub_cost, sub_depth + 1
+
+    def _get_page_size(self, field_ast: ast.Field) -> int:
+        sizes = []
+        for argument in field_ast.arguments:
+            if argument.name.value not in ("first", "last"):
+                continue
+            value = argument.value
+            if isinstance(value, ast.Variable):
+                value = self.variables.get(value.name.value)
+            else:
+                value = getattr(value, "value", None)
+            try:
+                sizes.append(int(value))
+            except (TypeError, ValueError):
+                continue
+        if not sizes:
+            return self.list_size
+        return max(0, min(max(sizes), self.list_size))
+
+    def _get_fields(self, parent_type, parents, name: str) -> List[ast.Field]:
+        return [
+            field_ast
+            for _, field_ast in self._collect_fields(parent_type, parents)
+            if field_ast.name.value == name
+        ]
+
+    def _collect_fields(self, parent_type, parents):
+        """
+        Yields (parent type, field) of selections, fragments are expanded.
+        """
+        for parent in parents:
+            if parent.selection_set is None:
+                continue
+            for selection in parent.selection_set.selections:
+                if isinstance(selection, ast.Field):
+                    yield parent_type, selection
+                    continue
+                if isinstance(selection, ast.FragmentSpread):
+                    selection = self.fragments.get(selection.name.value)
+                    if selection is None:
+                        continue
+                fragment_type = parent_type
+                if selection.type_condition is not None:
+                    fragment_type = self.schema.get_type(
+                        selection.type_condition.name.value
+                    )
+                yield from self._collect_fields(fragment_type, [selection])
+
+
+def get_operation(document_ast: ast.Document, operation_name=None):
+    operations = [
+        definition
+        for definition in document_ast.definitions
+        if isinstance(definition, ast.OperationDefinition)
+    ]
+    if operation_name is None:
+        return operations[0] if len(operations) == 1 else None
+    for operation in operations:
+        if operation.name is not None and operation.name.value == operation_name:
+            return operation
+    return None
+
+
+def check_limits(
+    schema, document_ast, operation_name=None, variable_values=None
+) -> Tuple[List[GraphQLError], dict]:
+    """
+    Returns errors of exceeded limits and the `cost` result extension
+    of the operation.
+    """
+    operation = get_operation(document_ast, operation_name)
+    if operation is None:
+        # reported by the execution
+        return [], {}
+
+    limits = get_limits()
+    analyzer = QueryCostAnalyzer(schema, document_ast, variable_values)
+    query_cost = analyzer.analyze(operation)
+    extensions = {
+        "cost": {
+            "requestedQueryCost": query_cost.cost,
+            "maximumAvailable": limits["MAX_COST"],
+            "depth": query_cost.depth,
+            "maximumDepth": limits["MAX_DEPTH"],
+        }
+    }
+
+    errors = []
+    if query_cost.depth > limits["MAX_DEPTH"]:
+        errors.append(
+            GraphQLError(
+                f"Query depth {query_cost.depth} exceeds "
+                f"the maximum depth of {limits['MAX_DEPTH']}."
+            )
+        )
+    if query_cost.cost > limits["MAX_COST"]:
+        errors.append(
+            GraphQLError(
+                f"Query cost {query_cost.cost} exceeds "
+                f"the maximum cost of {limits['MAX_COST']}."
+            )
+        )
+    return errors, extensions
+
+
+def execute_with_limits(
+    schema, document_ast, validation_errors, **kwargs
+) -> ExecutionResult:
+    """
+    Executes a validated document if it is within the limits.
+    The computed cost is returned in the `cost` extension of the result.
+    """
+    if validation_errors:
+        return ExecutionResult(errors=validation_errors, invalid=True)
+
+    errors, extensions = check_limits(
+        schema,
+        document_ast,
+        kwargs.get("operation_name"),
+        kwargs.get("variable_values"),
+    )
+    if errors:
+        return ExecutionResult(errors=errors, invalid=True, extensions=extensions)
+
+    result = execute(schema, document_ast, **kwargs)
+    if isinstance(result, ExecutionResult):
+        # subscriptions return an observable of results
+        result.extensions.update(extensions)
+    return result
+
+
+class QueryCostBackend(GraphQLCoreBackend):
+    """
+    Backend rejecting documents which are too deep or too expensive.
+    Documents are validated once, when they are created.
+    """
+
+    def document_from_string(self, schema, document_string):
+        document = super().document_from_string(schema, document_string)
+        document.validation_errors = validate(schema, document.document_ast)
+        document.execute = partial(
+            execute_with_limits,
+            schema,
+            document.document_ast,
+            document.validation_errors,
+            **self.execute_params,
+        )
+        return document
@@ -0,0 +1,193 @@
+"""
+Cache of GraphQL query results.
+
+Entries are keyed by the hash of the query, its variables, operation name
+and the user, and record versions of the tables of all models whose types
+are selected by the operation. Every write to a table replaces its version
+(see `bump_table_versions`, called by model signals), so entries which
+read the table are never served again and are culled by the bounded
+cache backend in time. Only data is stored, limits and the cost extension
+are checked again for every request.
+"""
+import hashlib
+import json
+import uuid
+from typing import Dict, Optional, Set
+
+from django.core.cache import caches
+from django.db import transaction
+from graphene.relay import Connection
+from graphene_django import DjangoObjectType
+from graphql.execution import ExecutionResult
+from graphql.language import ast
+from graphql.type.definition import GraphQLObjectType, get_named_type
+
+from stx_training_program.batches import commit_batch
+from stx_training_program.documents import query_hash
+from stx_training_program.query_cost import check_limits, get_operation
+
+
+RESULTS_CACHE_ALIAS = "graphql_results"
+RESULT_KEY_PREFIX = "graphql:result:"
+TABLE_KEY_PREFIX = "graphql:table:"
+# larger results are not worth keeping
+MAX_ENTRY_SIZE = 512 * 1024
+
+
+def get_results_cache():
+    return caches[RESULTS_CACHE_ALIAS]
+
+
+def get_table_key(model) -> str:
+    return TABLE_KEY_PREFIX + model._meta.label_lower
+
+
+def set_table_versions(keys) -> None:
+    get_results_cache().set_many({key: uuid.uuid4().hex for key in keys}, timeout=None)
+
+
+def bump_table_versions(*models, using=None) -> None:
+    """
+    Invalidates results which read the models. Inside a transaction
+    versions are replaced now and once more after the commit, results
+    computed meanwhile from the former rows are never served as fresh.
+    """
+    keys = [get_table_key(model) for model in models]
+    if transaction.get_connection(using).in_atomic_block:
+        set_table_versions(keys)
+    with commit_batch("table_versions", set_table_versions, using) as batch:
+        batch.update(dict.fromkeys(keys))
+
+
+def get_table_versions(keys: Set[str]) -> Dict[str, str]:
+    cache = get_results_cache()
+    versions = cache.get_many(keys)
+    for key in keys - set(versions):
+        # versions are created on demand, e.g. after they were culled
+        cache.add(key, uuid.uuid4().hex, timeout=None)
+        versions[key] = cache.get(key)
+    return versions
+
+
+def get_selected_models(schema, document_ast, operation) -> Set:
+    """
+    Returns models of Django object types selected anywhere in the operation,
+    abstract types stand for all of their possible types and connections
+    for the type of their nodes (e.g. only `totalCount` is selected).
+    """
+    fragments = {
+        definition.name.value: definition
+        for definition in document_ast.definitions
+        if isinstance(definition, ast.FragmentDefinition)
+    }
+    models = set()
+
+    def add_models(named_type) -> None:
+        types = [named_type]
+        if not isinstance(named_type, GraphQLObjectType):
+            types = schema.get_possible_types(named_type)
+        for graphql_type in types:
+            graphene_type = getattr(graphql_type, "graphene_type", None)
+            if not isinstance(graphene_type, type):
+                continue
+            if issubclass(graphene_type, Connection):
+                graphene_type = graphene_type._meta.node
+            if issubclass(graphene_type, DjangoObjectType):
+                models.add(graphene_type._meta.model)
+
+    def visit(parent_type, selection_set) -> None:
+        for selection in selection_set.selections:
+            if isinstance(selection, ast.FragmentSpread):
+                selection = fragments[selection.name.value]
+            if not isinstance(selection, ast.Field):
+                fragment_type = parent_type
+                if selection.type_condition is not None:
+                    fragment_type = schema.get_type(selection.type_condition.name.value)
+                    add_models(fragment_type)
+                visit(fragment_type, selection.selection_set)
+                continue
+
+            field = getattr(parent_type, "fields", {}).get(selection.name.value)
+            if field is None or selection.selection_set is None:
+                continue
+            named_type = get_named_type(field.type)
+            add_models(named_type)
+            visit(named_type, selection.selection_set)
+
+    visit(schema.get_query_type(), operation.selection_set)
+    return models
+
+
+class CachedResult:
+    """
+    Cache entry of a query operation, see `for_request`.
+    """
+
+    def __init__(
+        self, key: str, table_keys: Set[str], document, variables, operation_name
+    ):
+        self.key = key
+        self.document = document
+        self.variables = variables
+        self.operation_name = operation_name
+        # versions are read before the execution, so rows written meanwhile
+        # make the stored entry stale
+        self.table_versions = get_table_versions(table_keys)
+
+    @classmethod
+    def for_request(
+        cls, request, schema, document, query: str, variables, operation_name
+    ) -> Optional["CachedResult"]:
+        """
+        Returns the entry of a query operation, None if it is not cacheable.
+        """
+        if getattr(document, "validation_errors", None):
+            # e.g. unknown fragments or types, reported by the execution
+            return None
+        operation = get_operation(document.document_ast, operation_name)
+        if operation is None or operation.operation != "query":
+            return None
+
+        user = getattr(request, "user", None)
+        scope = user.pk if user is not None and user.is_authenticated else None
+        try:
+            key = json.dumps(
+                [query_hash(query), operation_name, variables, scope],
+                sort_keys=True,
+            )
+        except TypeError:
+            # e.g. uploaded files in variables
+            return None
+        models = get_selected_models(schema, document.document_ast, operation)
+        if not models:
+            # tables read by the operation are unknown
+            return None
+        return cls(
+            RESULT_KEY_PREFIX + hashlib.sha256(key.encode("utf-8")).hexdigest(),
+            {get_table_key(model) for model in models},
+            document,
+            variables,
+            operation_name,
+        )
+
+    def get(self, schema) -> Optional[ExecutionResult]:
+        entry = get_results_cache().get(self.key)
+        if entry is None:
+            return None
+        table_versions, data = entry
+        if table_versions != self.table_versions:
+            return None
+
+        errors, extensions = check_limits(
+            schema, self.document.document_ast, self.operation_name, self.variables
+        )
+        if errors:
+            return ExecutionResult(errors=errors, invalid=True, extensions=extensions)
+        return ExecutionResult(data=data, extensions=extensions)
+
+    def set(self, result: ExecutionResult) -> None:
+        if result.errors or result.invalid:
+            return
+        entry = (self.table_versions, result.data)
+        if len(json.dumps(entry)) <= MAX_ENTRY_SIZE:
+            get_results_cache().set(self.key, entry)
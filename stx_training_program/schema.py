@@ -12,4 +12,8 @@ class Mutation(projects_schema.Mutation):
     pass
 
 
-schema = graphene.Schema(query=Query, mutation=Mutation)
+class Subscription(projects_schema.Subscription):
+    pass
+
+
+schema = graphene.Schema(query=Query, mutation=Mutation, subscription=Subscription)
@@ -40,9 +40,10 @@ INSTALLED_APPS = [
     "django.contrib.staticfiles",
     "rest_framework",
     "graphene_django",
+    "channels",
     "accounts",
     "api_accounts",
-    "api_projects",
+    "api_projects.apps.ApiProjectsConfig",
     "django_celery_beat",
 ]
 
@@ -66,6 +67,7 @@ REST_FRAMEWORK = {
         "rest_framework.permissions.IsAuthenticated",
     ],
     "DATETIME_FORMAT": "iso-8601",
+    "DEFAULT_THROTTLE_RATES": {"verification_email": "5/hour"},
 }
 
 # settings from https://django-rest-framework-simplejwt.readthedocs.io/en/latest/settings.html
@@ -111,6 +113,8 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "stx_training_program.wsgi.application"
+# HTTP and GraphQL subscriptions over WebSocket
+ASGI_APPLICATION = "stx_training_program.asgi.application"
 
 
 AUTH_USER_MODEL = "accounts.User"
@@ -150,6 +154,63 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Cache
+# https://docs.djangoproject.com/en/3.1/topics/cache/
+
+REDIS_CACHE_URL = os.environ.get("REDIS_CACHE_URL")
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    # project and issue reads, see api_projects.caching
+    "responses": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "responses",
+        "TIMEOUT": 60 * 60,
+        # least recently used entries are culled when the limit is reached
+        "OPTIONS": {"MAX_ENTRIES": 1000},
+    },
+    # GraphQL queries by hash, see stx_training_program.documents
+    "persisted_queries": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "persisted_queries",
+        "TIMEOUT": None,
+        "OPTIONS": {"MAX_ENTRIES": 1000},
+    },
+    # GraphQL query results and table versions, see stx_training_program.results
+    "graphql_results": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "graphql_results",
+        "TIMEOUT": 60 * 60,
+        "OPTIONS": {"MAX_ENTRIES": 1000},
+    },
+}
+if REDIS_CACHE_URL:
+    # shared by all processes, the server should be configured
+    # with `maxmemory-policy allkeys-lru`
+    for alias in ("responses", "persisted_queries", "graphql_results"):
+        CACHES[alias].update(
+            BACKEND="django_redis.cache.RedisCache",
+            LOCATION=REDIS_CACHE_URL,
+            KEY_PREFIX=alias,
+            OPTIONS={},
+        )
+
+# Groups of GraphQL subscriptions, see api_projects.events.
+# The in-memory layer works within a single process only.
+REDIS_CHANNEL_LAYER_URL = os.environ.get("REDIS_CHANNEL_LAYER_URL")
+
+CHANNEL_LAYERS = {
+    "default": {"BACKEND": "channels.layers.InMemoryChannelLayer"},
+}
+if REDIS_CHANNEL_LAYER_URL:
+    CHANNEL_LAYERS["default"] = {
+        "BACKEND": "channels_redis.core.RedisChannelLayer",
+        "CONFIG": {"hosts": [REDIS_CHANNEL_LAYER_URL]},
+    }
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/3.1/topics/i18n/
 
@@ -178,6 +239,8 @@ SENDGRID_API_KEY = os.environ.get("SENDGRID_API_KEY")
 DEFAULT_FROM_EMAIL = os.environ.get("SENDGRID_FROM_EMAIL")
 # Email will be sent in debug mode
 SENDGRID_SANDBOX_MODE_IN_DEBUG = False
+# seconds a pooled connection is reused, see stx_training_program.mail
+EMAIL_CONNECTION_MAX_AGE = int(os.environ.get("EMAIL_CONNECTION_MAX_AGE", 300))
 
 
 # Celery config #
@@ -187,9 +250,34 @@ CELERY_ACCEPT_CONTENT = ["application/json"]
 CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_SERIALIZER = "json"
 CELERY_TIMEZONE = "UTC"
+# installed into the database by the django_celery_beat scheduler
+CELERY_BEAT_SCHEDULE = {
+    "send-notification-digests": {
+        "task": "api_projects.tasks.send_notification_digests",
+        # seconds between drains of the notification outbox
+        "schedule": float(os.environ.get("NOTIFICATION_DIGEST_INTERVAL", 60)),
+    },
+    "sweep-issue-deadlines": {
+        "task": "api_projects.tasks.sweep_issue_deadlines",
+        # seconds between searches for overdue issues
+        "schedule": float(os.environ.get("DEADLINE_SWEEP_INTERVAL", 60)),
+    },
+}
 
 
 GRAPHENE = {
     "SCHEMA": "stx_training_program.schema.schema",
     "ATOMIC_MUTATIONS": True,
 }
+
+# Limits of GraphQL documents, see stx_training_program.query_cost
+GRAPHQL_QUERY_COST = {
+    "MAX_DEPTH": 6,
+    "MAX_COST": 200000,
+    # "Type.field": cost of resolving the field once,
+    # by default 1 for object fields and 0 for scalar fields
+    "FIELD_WEIGHTS": {},
+}
+
+# parsed and validated documents kept by each process
+GRAPHQL_DOCUMENT_CACHE_SIZE = 500
@@ -18,9 +18,9 @@ from django.urls import path, include, re_path
 from django.views.static import serve
 from django.conf import settings
 from django.views.decorators.csrf import csrf_exempt
-from graphene_file_upload.django import FileUploadGraphQLView
 
 from stx_training_program.schema import schema
+from stx_training_program.views import GraphQLView
 
 urlpatterns = [
     path("admin/", admin.site.urls),
@@ -34,5 +34,5 @@ urlpatterns = [
         },
     ),
     path(r"graphql/",
-         csrf_exempt(FileUploadGraphQLView.as_view(graphiql=True, schema=schema))),
+         csrf_exempt(GraphQLView.as_view(graphiql=True, schema=schema))),
 ]
@@ -0,0 +1,202 @@
+from typing import Optional
+
+from django.conf import settings
+from django.utils.cache import get_conditional_response
+from graphene_django import DjangoObjectType
+from graphene_file_upload.django import FileUploadGraphQLView
+from graphql.language import ast
+from graphql.type.definition import get_named_type
+from graphql_relay import from_global_id
+
+from api_projects.conditional import get_projects_state
+from stx_training_program.documents import (
+    CachedDocumentBackend,
+    get_persisted_query_hash,
+    resolve_persisted_query,
+)
+from stx_training_program.results import CachedResult
+
+
+# single-node query fields: (expected node type, project lookup on the node's pk)
+NODE_FIELDS = {
+    "project": ("ProjectNode", "project_id"),
+    "issue": ("IssueNode", "project__issues"),
+    "issueAttachment": ("IssueAttachmentNode", "project__issues__files"),
+}
+# object fields of nodes whose data is versioned with the node's project,
+# fields of users are, their relations (e.g. other projects) are not
+PROJECT_FIELDS = {
+    "ProjectNode": {"owner", "members", "issues"},
+    "IssueNode": {"owner", "assigne", "project", "files"},
+    "IssueAttachmentNode": {"issue"},
+}
+
+document_backend = CachedDocumentBackend(settings.GRAPHQL_DOCUMENT_CACHE_SIZE)
+
+
+class GraphQLView(FileUploadGraphQLView):
+    """
+    GraphQL endpoint which answers repeated single-node GET queries,
+    e.g. `{ project(id: "...") { name } }`, with 304 Not Modified
+    based on the version of the node's project. Queries which select data
+    outside of the project (e.g. other projects of the owner) are not
+    answered conditionally.
+
+    Documents are checked against depth and cost limits before execution,
+    see `query_cost`, result extensions are included in responses.
+    Persisted queries and parsed documents are handled by `documents`,
+    results of queries are cached per user by `results`.
+    """
+
+    extensions = None
+
+    def get_backend(self, request):
+        return document_backend
+
+    def get_graphql_params(self, request, data):
+        query, variables, operation_name, id = super().get_graphql_params(request, data)
+        sha256_hash = get_persisted_query_hash(request, data)
+        if sha256_hash is not None:
+            query = resolve_persisted_query(sha256_hash, query)
+        return query, variables, operation_name, id
+
+    def execute_graphql_request(
+        self, request, data, query, variables, operation_name, show_graphiql=False
+    ):
+        cached_result = None
+        if query and not show_graphiql:
+            try:
+                document = self.get_backend(request).document_from_string(
+                    self.schema, query
+                )
+            except Exception:
+                # reported by the regular execution
+                document = None
+            if document is not None:
+                cached_result = CachedResult.for_request(
+                    request, self.schema, document, query, variables, operation_name
+                )
+
+        result = None
+        if cached_result is not None:
+            result = cached_result.get(self.schema)
+        if result is None:
+            result = super().execute_graphql_request(
+                request, data, query, variables, operation_name, show_graphiql
+            )
+            if cached_result is not None and result is not None:
+                cached_result.set(result)
+        if result is not None:
+            self.extensions = result.extensions
+        return result
+
+    def json_encode(self, request, d, pretty=False):
+        if self.extensions and ("data" in d or "errors" in d):
+            d = {**d, "extensions": self.extensions}
+        return super().json_encode(request, d, pretty=pretty)
+
+    def dispatch(self, request, *args, **kwargs):
+        etag = None
+        if request.method == "GET" and not (
+            self.graphiql and self.can_display_graphiql(request, {})
+        ):
+            etag = self.get_node_etag(request)
+        if etag is None:
+            return super().dispatch(request, *args, **kwargs)
+
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = super().dispatch(request, *args, **kwargs)
+            if response.status_code == 200:
+                response.setdefault("ETag", etag)
+        return response
+
+    def get_node_etag(self, request) -> Optional[str]:
+        try:
+            query, variables, _, _ = self.get_graphql_params(request, {})
+            backend = self.get_backend(request)
+            document = backend.document_from_string(self.schema, query).document_ast
+        except Exception:
+            # invalid requests are reported by the regular execution
+            return None
+
+        operations = [
+            definition
+            for definition in document.definitions
+            if isinstance(definition, ast.OperationDefinition)
+        ]
+        if len(operations) != 1 or operations[0].operation != "query":
+            return None
+        selections = operations[0].selection_set.selections
+        if len(selections) != 1 or not isinstance(selections[0], ast.Field):
+            return None
+
+        field = selections[0]
+        if field.name.value not in NODE_FIELDS:
+            return None
+        node_type, lookup = NODE_FIELDS[field.name.value]
+
+        global_id = self._get_argument(field, "id", variables or {})
+        try:
+            type_name, pk = from_global_id(global_id)
+            pk = int(pk)
+        except Exception:
+            return None
+        if type_name != node_type:
+            return None
+        if not self._stays_within_project(document, node_type, field):
+            return None
+
+        return get_projects_state(request, **{lookup: pk})[0]
+
+    def _stays_within_project(self, document, node_type: str, field) -> bool:
+        """
+        Returns whether all object fields selected on the node are listed
+        in PROJECT_FIELDS, connections and their edges are followed.
+        """
+        fragments = {
+            definition.name.value: definition
+            for definition in document.definitions
+            if isinstance(definition, ast.FragmentDefinition)
+        }
+
+        def visit(parent_type, selection_set) -> bool:
+            for selection in selection_set.selections:
+                if isinstance(selection, ast.FragmentSpread):
+                    selection = fragments.get(selection.name.value)
+                    if selection is None:
+                        return False
+                if not isinstance(selection, ast.Field):
+                    if not visit(parent_type, selection.selection_set):
+                        return False
+                    continue
+                if selection.selection_set is None:
+                    continue
+
+                graphene_type = getattr(parent_type, "graphene_type", None)
+                name = selection.name.value
+                if isinstance(graphene_type, type) and issubclass(
+                    graphene_type, DjangoObjectType
+                ):
+                    if name not in PROJECT_FIELDS.get(parent_type.name, ()):
+                        return False
+                field_def = getattr(parent_type, "fields", {}).get(name)
+                if field_def is None:
+                    return False
+                if not visit(get_named_type(field_def.type), selection.selection_set):
+                    return False
+            return True
+
+        if field.selection_set is None:
+            return True
+        return visit(self.schema.get_type(node_type), field.selection_set)
+
+    @staticmethod
+    def _get_argument(field: ast.Field, name: str, variables: dict):
+        for argument in field.arguments:
+            if argument.name.value != name:
+                continue
+            if isinstance(argument.value, ast.Variable):
+                return variables.get(argument.value.name.value)
+            return getattr(argument.value, "value", None)
+        return None